@@ -0,0 +1,66 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "paint_app"))
+
+from CanvasManager import CanvasManager  # noqa: E402
+from DrawingTools import DrawingTools  # noqa: E402
+
+
+def legacy_segment(tools, x1, y1, x2, y2):
+    # Прежняя кисть: отрезок ImageDraw.line без сглаживания и скруглений
+    layer = tools.canvas_manager.layers[0]
+    points = [x1, y1, x2, y2]
+    layer.draw(tools._shape_bbox(*points), lambda draw, dx, dy: draw.line(
+        tools._shift(points, dx, dy), fill=tools.current_color, width=tools.current_size))
+
+
+def segment_ms(callback, segments, segment_length):
+    samples = []
+    for index in range(segments):
+        x = 100 + index * segment_length % 1600
+        started = time.perf_counter()
+        callback(x, x + segment_length)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Стоимость одного отрезка мазка в зависимости от размера кисти")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2, 5, 15, 40, 100])
+    parser.add_argument("--segment", type=int, default=20, help="длина отрезка между событиями мыши, px")
+    parser.add_argument("--segments", type=int, default=60)
+    parser.add_argument("--batch", type=int, default=4, help="отрезков в одной пачке кадра")
+    args = parser.parse_args()
+
+    print(f"segment {args.segment} px, times in ms per segment")
+    print(f"{'size':>6}{'legacy line':>14}{'dabs':>10}{'dabs, batched':>16}")
+    for size in args.sizes:
+        canvas_manager = CanvasManager(None, 2000, 400, "white")
+        tools = DrawingTools(canvas_manager)
+        tools.set_color("#3366cc")
+        tools.set_size(size)
+        legacy = segment_ms(lambda x1, x2: legacy_segment(tools, x1, 200, x2, 200), args.segments, args.segment)
+
+        tools.on_button_press(100, 200)
+        single = segment_ms(lambda x1, x2: tools.on_mouse_drag(x2, 200), args.segments, args.segment)
+        tools.on_button_release(100, 200)
+
+        def batched(x1, x2):
+            canvas_manager.begin_batch()
+            step = (x2 - x1) / args.batch
+            for index in range(1, args.batch + 1):
+                tools.on_mouse_drag(x1 + step * index, 200)
+            canvas_manager.end_batch()
+
+        tools.on_button_press(100, 200)
+        batch = segment_ms(batched, args.segments, args.segment * args.batch) / args.batch
+        tools.on_button_release(100, 200)
+        print(f"{size:>6}{legacy:>14.3f}{single:>10.3f}{batch:>16.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "paint_app"))
+
+from CanvasManager import CanvasManager  # noqa: E402
+from BlendEngine import BLEND_MODES  # noqa: E402
+
+
+def make_document(size, layer_count):
+    manager = CanvasManager(None, size, size, "white")
+    for index in range(1, layer_count):
+        manager.add_layer()
+        offset = index * 7 % size
+        manager.layers[index].paste(Image.new("RGBA", (size // 4, size // 4), (index * 5 % 256, 0, 200, 128)),
+                                    (offset, offset))
+    manager.switch_layer(layer_count // 2)
+    return manager
+
+
+def full_recomposite(manager):
+    # Прежняя схема: каждый вызов заново накладывает все слои
+    base = Image.new("RGBA", (manager.width, manager.height), (0, 0, 0, 0))
+    for layer in manager.layers:
+        base = Image.alpha_composite(base, layer.to_image())
+    return base.convert("RGB")
+
+
+def measure(callback, repeats):
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        callback()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Стоимость кадра при кэшированном сведении слоёв")
+    parser.add_argument("--size", type=int, default=1000)
+    parser.add_argument("--layers", type=int, nargs="+", default=[2, 10, 50])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    tile = (0, 0, CanvasManager.DISPLAY_TILE_SIZE, CanvasManager.DISPLAY_TILE_SIZE)
+    full = (0, 0, args.size, args.size)
+
+    print(f"canvas {args.size}x{args.size}, times in ms")
+    print(f"{'layers':>7}{'recomposite':>14}{'cached frame':>15}{'cached tile':>14}{'cache rebuild':>16}")
+    for layer_count in args.layers:
+        manager = make_document(args.size, layer_count)
+        old = measure(lambda: full_recomposite(manager), args.repeats)
+
+        manager.get_composited_image()
+        frame = measure(lambda: manager._composite_region(full), args.repeats)
+        tile_ms = measure(lambda: manager._composite_region(tile), args.repeats * 10)
+
+        def rebuild():
+            manager.invalidate_composite()
+            manager.get_composited_image()
+
+        rebuild_ms = measure(rebuild, args.repeats)
+        print(f"{layer_count:>7}{old:>14.2f}{frame:>15.2f}{tile_ms:>14.3f}{rebuild_ms:>16.2f}")
+
+    # Режимы наложения: все слои, кроме фона, в одном режиме; затем половина из них скрыта
+    layer_count = args.layers[-1]
+    print(f"\n{layer_count} layers, full composite without cache, times in ms")
+    print(f"{'mode':>10}{'all shown':>12}{'half hidden':>14}")
+    for mode in BLEND_MODES:
+        manager = make_document(args.size, layer_count)
+        for index in range(1, layer_count):
+            manager.set_layer_properties(index, blend_mode=mode, opacity=0.8)
+
+        def rebuild():
+            manager.invalidate_composite()
+            manager.get_composited_image()
+
+        shown = measure(rebuild, args.repeats)
+        for index in range(1, layer_count, 2):
+            manager.set_layer_properties(index, visible=False)
+        hidden = measure(rebuild, args.repeats)
+        print(f"{mode:>10}{shown:>12.2f}{hidden:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
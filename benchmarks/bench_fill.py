@@ -0,0 +1,79 @@
+import argparse
+import os
+import random
+import sys
+import time
+from functools import reduce
+
+from PIL import Image, ImageChops, ImageColor, ImageDraw
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "paint_app"))
+
+from CanvasManager import CanvasManager  # noqa: E402
+from DrawingTools import DrawingTools  # noqa: E402
+
+
+def make_document(size, pattern):
+    manager = CanvasManager(None, size, size, "white")
+    if pattern == "maze":
+        # Много коротких штрихов: область заливки рвётся на тысячи отрезков строк
+        rng = random.Random(7)
+        image = Image.new("RGBA", (size, size), "white")
+        draw = ImageDraw.Draw(image)
+        for _ in range(size):
+            x, y = rng.randrange(size), rng.randrange(size)
+            draw.line([x, y, x + rng.randrange(-60, 60), y + rng.randrange(-60, 60)], fill="black", width=2)
+        manager.load_image(image)
+    return manager
+
+
+def legacy_fill(manager, x, y, color):
+    # Прежняя заливка: ImageDraw.floodfill по всему слою и поиск изменившегося прямоугольника
+    layer = manager.layers[manager.active_layer_index]
+    before = layer.to_image()
+    filled = before.copy()
+    ImageDraw.floodfill(filled, (x, y), ImageColor.getcolor(color, "RGBA"))
+    bbox = reduce(ImageChops.lighter, ImageChops.difference(before, filled).split()).getbbox()
+    if bbox:
+        layer.paste(filled.crop(bbox), bbox[:2])
+    return bbox
+
+
+def timed(callback):
+    started = time.perf_counter()
+    result = callback()
+    return (time.perf_counter() - started) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Заливка по отрезкам строк против ImageDraw.floodfill")
+    parser.add_argument("--size", type=int, default=4000)
+    parser.add_argument("--patterns", nargs="+", default=["open", "maze"])
+    parser.add_argument("--skip-legacy", action="store_true", help="не замерять медленную прежнюю заливку")
+    args = parser.parse_args()
+
+    center = args.size // 2
+    print(f"canvas {args.size}x{args.size}, times in ms")
+    print(f"{'pattern':<10}{'mode':<16}{'new':>10}{'legacy':>12}{'speedup':>10}  bbox")
+    for pattern in args.patterns:
+        cases = [("contiguous", {}), ("tolerance 32", {"tolerance": 32}), ("all matching", {"contiguous": False})]
+        for mode, options in cases:
+            manager = make_document(args.size, pattern)
+            tools = DrawingTools(manager)
+            tools.set_color("#3366cc")
+            tools.set_fill_options(**options)
+            new_ms, bbox = timed(lambda: tools.flood_fill(center, center))
+
+            legacy = "-"
+            speedup = "-"
+            if mode == "contiguous" and not args.skip_legacy:
+                legacy_manager = make_document(args.size, pattern)
+                legacy_ms, legacy_bbox = timed(lambda: legacy_fill(legacy_manager, center, center, "#3366cc"))
+                assert legacy_bbox == bbox, (legacy_bbox, bbox)
+                legacy = f"{legacy_ms:.0f}"
+                speedup = f"{legacy_ms / new_ms:.0f}x"
+            print(f"{pattern:<10}{mode:<16}{new_ms:>10.0f}{legacy:>12}{speedup:>10}  {bbox}")
+
+
+if __name__ == "__main__":
+    main()
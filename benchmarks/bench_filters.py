@@ -0,0 +1,136 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+from unittest.mock import Mock
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "paint_app"))
+
+from CanvasManager import CanvasManager  # noqa: E402
+from DrawingTools import DrawingTools  # noqa: E402
+
+
+# Прежние попиксельные фильтры — для сравнения задержки одного события мыши
+def legacy_grayscale(region):
+    region = region.copy()
+    pixels = region.load()
+    for i in range(region.width):
+        for j in range(region.height):
+            r, g, b, a = pixels[i, j]
+            gray = int(0.299 * r + 0.587 * g + 0.114 * b)
+            pixels[i, j] = (gray, gray, gray, a)
+    return region
+
+
+def legacy_sharpen(region, amount=1.5):
+    pixels = region.convert("RGB").load()
+    width, height = region.size
+    result = Image.new("RGB", (width, height))
+    result_pixels = result.load()
+    for i in range(width):
+        for j in range(height):
+            r, g, b = pixels[i, j]
+            neighbors = []
+            if i > 0:
+                neighbors.append(pixels[i - 1, j])
+            if i < width - 1:
+                neighbors.append(pixels[i + 1, j])
+            if j > 0:
+                neighbors.append(pixels[i, j - 1])
+            if j < height - 1:
+                neighbors.append(pixels[i, j + 1])
+            nr = sum(n[0] for n in neighbors) / len(neighbors)
+            ng = sum(n[1] for n in neighbors) / len(neighbors)
+            nb = sum(n[2] for n in neighbors) / len(neighbors)
+            result_pixels[i, j] = (max(0, min(255, int(r + amount * (r - nr)))),
+                                   max(0, min(255, int(g + amount * (g - ng)))),
+                                   max(0, min(255, int(b + amount * (b - nb)))))
+    return result
+
+
+def make_tools(canvas_size):
+    layer = Image.new("RGBA", (canvas_size, canvas_size), "white")
+    draw = ImageDraw.Draw(layer)
+    for i in range(0, canvas_size, 16):
+        draw.line([0, i, canvas_size, canvas_size - i], fill=(i % 256, 80, 200), width=3)
+
+    canvas_manager = Mock()
+    canvas_manager.layers = [layer]
+    canvas_manager.active_layer_index = 0
+    canvas_manager.draw = draw
+    return DrawingTools(canvas_manager)
+
+
+def time_event(callback, repeats):
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        callback()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def legacy_event(tools, x, y, region_size, legacy_filter):
+    layer = tools.canvas_manager.layers[0]
+    box = tools._filter_region(x, y, region_size)
+    layer.paste(legacy_filter(layer.crop(box)), box[:2])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Задержка одного события для фильтров-кистей")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[40, 80, 160, 240, 320, 400])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--stroke-size", type=int, default=40, help="размер гауссовой кисти для замера мазка")
+    parser.add_argument("--sigma", type=float, default=3.0)
+    parser.add_argument("--legacy-limit", type=int, default=160,
+                        help="максимальный размер области для медленной прежней реализации")
+    args = parser.parse_args()
+
+    tools = make_tools(max(args.sizes) * 2)
+    center = max(args.sizes)
+
+    cases = [
+        ("grayscale", lambda size: tools.apply_grayscale_at(center, center, size),
+         lambda size: legacy_event(tools, center, center, size, legacy_grayscale)),
+        ("sharpen", lambda size: tools.apply_sharpen_at(center, center, size),
+         lambda size: legacy_event(tools, center, center, size, legacy_sharpen)),
+    ]
+
+    print(f"{'filter':<10}{'region':>8}{'new, ms':>12}{'legacy, ms':>14}{'speedup':>10}")
+    for name, new_event, old_event in cases:
+        for size in args.sizes:
+            new_ms = time_event(lambda: new_event(size), args.repeats)
+            if size <= args.legacy_limit:
+                old_ms = time_event(lambda: old_event(size), 1)
+                print(f"{name:<10}{size:>8}{new_ms:>12.2f}{old_ms:>14.2f}{old_ms / new_ms:>9.0f}x")
+            else:
+                print(f"{name:<10}{size:>8}{new_ms:>12.2f}{'-':>14}{'-':>10}")
+
+    # Гауссова кисть размывает каждый пиксель один раз за мазок: время мазка
+    # почти не зависит от того, сколькими событиями мыши он пройден
+    print()
+    print(f"gauss stroke, 300 px, size {args.stroke_size}, sigma {args.sigma}")
+    print(f"{'events':>8}{'stroke, ms':>12}")
+    for events in [5, 30, 150, 300]:
+        canvas_manager = CanvasManager(None, 600, 600, "white")
+        canvas_manager.layers[0].paste(make_tools(600).canvas_manager.layers[0])
+        stroke_tools = DrawingTools(canvas_manager)
+        stroke_tools.set_tool("gauss")
+        stroke_tools.set_size(args.stroke_size)
+        stroke_tools.set_blur_sigma(args.sigma)
+        points = [(150 + 300 * i // events, 300) for i in range(events + 1)]
+
+        def stroke():
+            stroke_tools.on_button_press(*points[0])
+            for x, y in points[1:]:
+                stroke_tools.on_mouse_drag(x, y)
+            stroke_tools.on_button_release(*points[-1])
+
+        print(f"{events:>8}{time_event(stroke, 1):>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
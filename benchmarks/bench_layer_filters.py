@@ -0,0 +1,89 @@
+import argparse
+import os
+import sys
+import time
+
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "paint_app"))
+
+from CanvasManager import CanvasManager  # noqa: E402
+from DrawingTools import DrawingTools  # noqa: E402
+from FilterExecutor import FilterExecutor, filter_region  # noqa: E402
+from HistoryManager import HistoryManager  # noqa: E402
+from TiledLayer import TiledLayer  # noqa: E402
+
+FILTER_PARAMS = {"gauss": {"sigma": 3.0}, "grayscale": {}, "sharpen": {}}
+
+
+def make_layer(size):
+    layer = TiledLayer(size, size, "white")
+    layer.paste(Image.effect_noise((size, size), 64).convert("RGBA"), (0, 0))
+    return layer
+
+
+def run_tiled(executor, layer, name, params, box):
+    job = executor.submit(layer, name, params, box)
+    job.finished.wait()
+    return job
+
+
+def run_command(size, name):
+    # Как команда меню: фильтр на весь слой одним проходом и шаг отмены; возвращает время первого
+    # (с построением таблиц) и медиану следующих запусков
+    manager = CanvasManager(None, size, size, "white")
+    manager.load_image(Image.effect_noise((size, size), 64).convert("RGB"))
+    history = HistoryManager(manager, background=False)
+    tools = DrawingTools(manager)
+
+    def command():
+        history.save_state()
+        tools.filter_area(name)
+        history.commit()
+
+    samples = [timed(command)[0] for _ in range(4)]
+    return samples[0], sorted(samples[1:])[1]
+
+
+def timed(callback):
+    started = time.perf_counter()
+    result = callback()
+    return (time.perf_counter() - started) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Фильтр на весь слой: один проход против тайлов в пуле процессов")
+    parser.add_argument("--size", type=int, default=4000)
+    parser.add_argument("--filters", nargs="+", default=list(FILTER_PARAMS))
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--command-only", action="store_true", help="только команда «Черно-белый» на весь слой")
+    args = parser.parse_args()
+
+    first, median = run_command(args.size, "grayscale")
+    status = "ok" if median < 1000 else "SLOW"
+    print(f"grayscale command {args.size}x{args.size}: first {first:.0f} ms, median {median:.0f} ms "
+          f"(target < 1000 ms) {status}")
+    if args.command_only:
+        sys.exit(0 if median < 1000 else 1)
+
+    layer = make_layer(args.size)
+    box = (0, 0, args.size, args.size)
+    print(f"layer {args.size}x{args.size}, {os.cpu_count()} cores, times in ms")
+    print(f"{'filter':<12}{'single pass':>12}" + "".join(f"{f'{count} proc':>10}" for count in args.workers))
+    for name in args.filters:
+        params = FILTER_PARAMS[name]
+        single, expected = timed(lambda: filter_region(layer, name, params, box))
+        row = f"{name:<12}{single:>12.0f}"
+        for count in args.workers:
+            executor = FilterExecutor(workers=count)
+            # Первый запуск поднимает процессы пула; замеряется второй
+            run_tiled(executor, layer, name, params, box)
+            elapsed, job = timed(lambda: run_tiled(executor, layer, name, params, box))
+            executor.shutdown()
+            assert job.result.tobytes() == expected.tobytes()
+            row += f"{elapsed:>10.0f}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tkinter as tk
+from unittest.mock import patch
+
+from PIL import Image, ImageTk
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "paint_app"))
+
+from CanvasManager import CanvasManager  # noqa: E402
+from DrawingTools import DrawingTools  # noqa: E402
+from HistoryManager import HistoryManager  # noqa: E402
+from OperationLog import OperationLog, LogReplayer  # noqa: E402
+from OverlayManager import OverlayManager  # noqa: E402
+
+# Набор замеров горячих путей без окна. Результаты пишутся в JSON (медиана, минимум, пик памяти)
+# и сравниваются с сохранённой базой: рост медианы больше порога — ошибка (код возврата 1)
+RESULTS_VERSION = 1
+
+
+class OffscreenCanvas:
+    # Заменяет tk.Canvas, когда нет дисплея: update_canvas проходит весь путь, кроме самого Tk
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+class OffscreenPhoto:
+    # Вместо ImageTk.PhotoImage: копирует пиксели, как это делает передача кадра в Tk
+    def __init__(self, image):
+        self.data = image.tobytes()
+
+    def paste(self, image):
+        self.data = image.tobytes()
+
+
+def open_display():
+    try:
+        root = tk.Tk()
+        root.withdraw()
+        return root
+    except tk.TclError:
+        return None
+
+
+def reset_peak_memory():
+    # В Linux пик RSS процесса можно обнулить; иначе пик считается с начала запуска
+    try:
+        with open("/proc/self/clear_refs", "w") as file:
+            file.write("5")
+    except OSError:
+        pass
+
+
+def peak_memory_mb():
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def measure(callback, repeats, setup=None):
+    reset_peak_memory()
+    samples = []
+    for index in range(repeats):
+        if setup is not None:
+            setup(index)
+        started = time.perf_counter()
+        callback(index)
+        samples.append((time.perf_counter() - started) * 1000)
+    return {"median_ms": statistics.median(samples), "min_ms": min(samples),
+            "peak_rss_mb": round(peak_memory_mb(), 1)}
+
+
+def make_document(root, size, layer_count):
+    manager = CanvasManager(root, size, size, "white")
+    if root is None:
+        manager.canvas = OffscreenCanvas()
+        manager.overlay = OverlayManager(manager.canvas)
+    for index in range(1, layer_count):
+        manager.add_layer()
+        offset = index * 37 % size
+        manager.layers[index].paste(Image.new("RGBA", (size // 3, size // 3), (index * 50 % 256, 90, 200, 140)),
+                                    (offset, offset))
+    manager.switch_layer(layer_count // 2)
+    manager.update_canvas()
+    return manager
+
+
+def stroke_points(size, index, count=20):
+    # Диагональный мазок, каждый повтор немного сдвинут, чтобы не рисовать поверх того же
+    start = size // 8 + index * 3 % (size // 4)
+    step = (size // 2) // count
+    return [(start + i * step, start + (i * step) // 2) for i in range(count + 1)]
+
+
+def stroke(tools, points):
+    tools.on_button_press(*points[0])
+    for x, y in points[1:]:
+        tools.on_mouse_drag(x, y)
+    tools.on_button_release(*points[-1])
+
+
+def document_cases(root, size, layer_count, repeats):
+    manager = make_document(root, size, layer_count)
+    tools = DrawingTools(manager)
+    history = HistoryManager(manager, background=False)
+    center = size // 2
+    results = {}
+
+    def full_redraw(_):
+        manager.update_canvas()
+
+    def dirty_redraw(_):
+        # Прямоугольник внутри окна просмотра: задетые плитки за окном не рисуются
+        spot = min(center, 256)
+        manager.update_canvas((spot, spot, spot + 32, spot + 32))
+
+    results["update_canvas_full"] = measure(full_redraw, repeats)
+    results["update_canvas_dirty"] = measure(dirty_redraw, repeats * 4)
+    results["get_composited_image"] = measure(lambda _: manager.get_composited_image(), repeats)
+
+    def pan(index):
+        manager.pan(128 if index % 2 == 0 else -128, 64 if index % 2 == 0 else -64)
+
+    def zoom_out(_):
+        # Первый повтор строит мипмап, следующие берут плитки из него
+        manager.set_zoom(1 / 4)
+        manager.set_zoom(1)
+
+    results["view_pan"] = measure(pan, repeats)
+    results["view_zoom_out"] = measure(zoom_out, repeats)
+
+    tools.set_tool("fill")
+    colors = ["#ff0000", "#00ff00"]
+    manager.switch_layer(0)
+
+    def fill(index):
+        tools.set_color(colors[index % 2])
+        tools.on_button_press(center, center)
+
+    results["fill"] = measure(fill, repeats)
+    manager.switch_layer(layer_count // 2)
+
+    tools.set_color("black")
+    results["text"] = measure(lambda index: tools.draw_text(10, 10 + index * 12 % (size - 30), "Benchmark 123"),
+                              repeats)
+
+    tools.set_tool("brush")
+    tools.set_size(9)
+
+    def commit(_):
+        history.commit()
+
+    results["history_save_state"] = measure(commit, repeats,
+                                            setup=lambda index: stroke(tools, stroke_points(size, index)))
+    for _ in range(repeats):
+        stroke(tools, stroke_points(size, 0))
+        history.commit()
+
+    def undo_redo(_):
+        history.undo()
+        history.redo()
+
+    results["history_undo_redo"] = measure(undo_redo, repeats)
+
+    def resize(_):
+        manager.resize_canvas(size + 64, size + 64)
+        manager.update_canvas()
+
+    def restore_size(_):
+        manager.resize_canvas(size, size)
+
+    results["resize_canvas"] = measure(resize, repeats, setup=restore_size)
+    manager.resize_canvas(size, size)
+
+    # Рост слева и сверху: сдвигается сетка тайлов, пиксели слоёв не копируются
+    def resize_top_left(_):
+        manager.resize_canvas(size + 64, size + 64, 64, 64)
+        manager.update_canvas()
+
+    def restore_top_left(_):
+        if manager.origin != (0, 0):
+            manager.resize_canvas(size, size, -64, -64)
+
+    results["resize_canvas_top_left"] = measure(resize_top_left, repeats, setup=restore_top_left)
+    restore_top_left(None)
+
+    # Всё, что сохранение стоит потоку Tk: дальше сведение и кодирование идут в фоне
+    results["save_snapshot"] = measure(lambda _: manager.snapshot(), repeats)
+    for extension in ("png", "jpeg"):
+        def save(_):
+            # Работа фонового потока сохранения без диалога: сведение и кодирование
+            manager.get_composited_image().save(io.BytesIO(), extension)
+
+        results[f"save_image_{extension}"] = measure(save, max(repeats // 2, 1))
+    return results
+
+
+def brush_cases(root, size, layer_count, brush_size, repeats):
+    manager = make_document(root, size, layer_count)
+    tools = DrawingTools(manager)
+    tools.set_size(brush_size)
+    tools.set_color("#3366cc")
+    center = size // 2
+    results = {}
+
+    for tool in ("brush", "eraser"):
+        tools.set_tool(tool)
+        results[f"tool_{tool}_stroke"] = measure(lambda index: stroke(tools, stroke_points(size, index)), repeats)
+
+    for tool in ("circle", "rectangle", "straight_line", "ellipse"):
+        tools.set_tool(tool)
+
+        def shape(index):
+            tools.on_button_press(center, center)
+            tools.on_mouse_drag(center + 40 + index, center + 30)
+            tools.on_button_release(center + 80 + index, center + 60)
+
+        results[f"tool_{tool}"] = measure(shape, repeats)
+
+    for tool in ("gauss", "grayscale", "sharpen"):
+        tools.set_tool(tool)
+        results[f"filter_{tool}_stroke"] = measure(lambda index: stroke(tools, stroke_points(size, index)), repeats)
+    return results
+
+
+def session_case(root, path, repeats):
+    log = OperationLog.load(path)
+    return {"replay": measure(lambda _: LogReplayer(log).run(), repeats)}
+
+
+def run_suite(args, root):
+    results = {}
+    for size in args.sizes:
+        for layer_count in args.layers:
+            prefix = f"{size}px/{layer_count}l"
+            for name, value in document_cases(root, size, layer_count, args.repeats).items():
+                results[f"{name}/{prefix}"] = value
+            for brush_size in args.brush_sizes:
+                for name, value in brush_cases(root, size, layer_count, brush_size, args.repeats).items():
+                    results[f"{name}/{prefix}/b{brush_size}"] = value
+            print(f"  {prefix} готово", file=sys.stderr)
+    for path in args.session:
+        for name, value in session_case(root, path, args.repeats).items():
+            results[f"{name}/{os.path.basename(path)}"] = value
+    return results
+
+
+def compare(results, baseline, threshold, noise_ms):
+    # Регрессия — медиана выросла больше чем на threshold (доля) и больше чем на noise_ms
+    regressions = []
+    for name, value in sorted(results.items()):
+        old = baseline.get(name)
+        if old is None:
+            continue
+        new_ms, old_ms = value["median_ms"], old["median_ms"]
+        if new_ms > old_ms * (1 + threshold) and new_ms - old_ms > noise_ms:
+            regressions.append((name, old_ms, new_ms))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замеры горячих путей редактора со сравнением с базой")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[512, 1024, 2048])
+    parser.add_argument("--layers", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--brush-sizes", type=int, nargs="+", default=[5, 40])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--session", nargs="*", default=[],
+                        help="журналы действий (OperationLog) для замера воспроизведения")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="файл с результатами прошлого запуска")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="записать текущие результаты как базу (в --baseline)")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="допустимый рост медианы, доля (0.2 = 20%%)")
+    parser.add_argument("--noise-ms", type=float, default=0.5,
+                        help="рост меньше этого числа миллисекунд не считается регрессией")
+    args = parser.parse_args()
+
+    root = open_display()
+    display = "tk" if root is not None else "offscreen"
+    print(f"Замеры ({display})...", file=sys.stderr)
+    if root is None:
+        with patch.object(ImageTk, "PhotoImage", OffscreenPhoto):
+            results = run_suite(args, root)
+    else:
+        results = run_suite(args, root)
+
+    report = {"version": RESULTS_VERSION, "display": display, "python": platform.python_version(),
+              "machine": platform.machine(), "results": results}
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+
+    print(f"{'case':<48}{'median, ms':>12}{'min, ms':>10}{'peak RSS, MB':>14}")
+    for name, value in sorted(results.items()):
+        print(f"{name:<48}{value['median_ms']:>12.2f}{value['min_ms']:>10.2f}{value['peak_rss_mb']:>14.1f}")
+
+    if not args.baseline:
+        return 0
+    if args.save_baseline or not os.path.exists(args.baseline):
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+        print(f"База сохранена: {args.baseline}")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as file:
+        baseline = json.load(file)
+    if baseline.get("display") != display:
+        print(f"База снята в режиме {baseline.get('display')}, сейчас {display}: update_canvas не сравним",
+              file=sys.stderr)
+        results = {name: value for name, value in results.items() if not name.startswith("update_canvas")}
+
+    regressions = compare(results, baseline["results"], args.threshold, args.noise_ms)
+    for name, old_ms, new_ms in regressions:
+        print(f"РЕГРЕССИЯ {name}: {old_ms:.2f} -> {new_ms:.2f} ms (+{(new_ms / old_ms - 1) * 100:.0f}%)")
+    if regressions:
+        return 1
+    print(f"Регрессий нет (порог {args.threshold * 100:.0f}%)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+import json
+import os
+from multiprocessing import Pool
+
+from PIL import Image
+from CanvasManager import CanvasManager
+from DrawingTools import DrawingTools
+
+STROKE_TOOLS = ["brush", "eraser", "gauss", "grayscale", "sharpen"]
+SHAPE_TOOLS = {"circle": "circle", "rectangle": "rectangle", "line": "straight_line", "ellipse": "ellipse"}
+
+
+def load_operations(path):
+    with open(path, encoding="utf-8") as file:
+        operations = json.load(file)
+    if not isinstance(operations, list):
+        raise ValueError("Файл операций должен содержать список")
+    return operations
+
+
+def apply_operation(tools, operation):
+    # Операция — словарь {"op": ..., параметры}. Цвет и размер, если заданы,
+    # остаются выбранными для следующих операций, как в редакторе
+    canvas_manager = tools.canvas_manager
+    name = operation["op"]
+    if "color" in operation:
+        tools.set_color(operation["color"])
+    if "size" in operation:
+        tools.set_size(operation["size"])
+    if any(key in operation for key in ("hardness", "spacing", "opacity")):
+        tools.set_brush_options(operation.get("hardness"), operation.get("spacing"), operation.get("opacity"))
+    if "sigma" in operation:
+        tools.set_blur_sigma(operation["sigma"])
+
+    if name in STROKE_TOOLS:
+        tools.set_tool(name)
+        points = operation["points"]
+        tools.on_button_press(*points[0])
+        for x, y in points[1:]:
+            tools.on_mouse_drag(x, y)
+        tools.on_button_release(*points[-1])
+
+    elif name in SHAPE_TOOLS:
+        tools.set_tool(SHAPE_TOOLS[name])
+        tools.on_button_press(*operation["start"])
+        tools.on_button_release(*operation["end"])
+
+    elif name == "fill":
+        tools.set_tool("fill")
+        tools.set_fill_options(operation.get("tolerance"), operation.get("contiguous"), operation.get("sample_merged"))
+        tools.on_button_press(*operation["point"])
+
+    elif name == "text":
+        tools.current_text_size = operation.get("text_size", tools.current_text_size)
+        tools.current_font = operation.get("font", tools.current_font)
+        tools.draw_text(*operation["position"], operation["text"])
+
+    elif name == "filter":
+        # Фильтр на весь слой или на прямоугольник "box"
+        tools.filter_area(operation["filter"], operation.get("box"))
+
+    elif name == "resize":
+        canvas_manager.resize_canvas(operation["width"], operation["height"],
+                                     operation.get("left", 0), operation.get("top", 0))
+
+    elif name == "add_layer":
+        canvas_manager.add_layer()
+
+    elif name == "switch_layer":
+        canvas_manager.switch_layer(operation["index"])
+
+    elif name == "layer_properties":
+        # Свойства активного слоя; "opacity" занят непрозрачностью кисти, поэтому здесь "layer_opacity"
+        canvas_manager.set_layer_properties(canvas_manager.active_layer_index, operation.get("name"),
+                                            operation.get("visible"), operation.get("layer_opacity"),
+                                            operation.get("blend_mode"))
+
+    else:
+        raise ValueError(f"Неизвестная операция: {name}")
+
+
+def process_image(image, operations, bg_color="white"):
+    canvas_manager = CanvasManager(None, image.width, image.height, bg_color)
+    canvas_manager.load_image(image)
+    tools = DrawingTools(canvas_manager)
+    for operation in operations:
+        apply_operation(tools, operation)
+    return canvas_manager.get_composited_image()
+
+
+def process_file(job):
+    # Выполняется в процессе пула; ошибки возвращаются, а не роняют весь запуск
+    input_path, output_path, operations = job
+    try:
+        with Image.open(input_path) as image:
+            result = process_image(image, operations)
+        result.save(output_path)
+        return input_path, output_path, None
+    except Exception as error:
+        return input_path, output_path, f"{type(error).__name__}: {error}"
+
+
+def output_path_for(input_path, output_dir, extension=None):
+    name, original_extension = os.path.splitext(os.path.basename(input_path))
+    return os.path.join(output_dir, name + (extension or original_extension))
+
+
+def run_batch(input_paths, operations, output_dir, workers=None, extension=None, chunksize=4):
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = [(path, output_path_for(path, output_dir, extension), operations) for path in input_paths]
+    if workers == 1:
+        return [process_file(job) for job in jobs]
+
+    with Pool(processes=workers) as pool:
+        return list(pool.imap_unordered(process_file, jobs, chunksize=chunksize))
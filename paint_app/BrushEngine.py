@@ -0,0 +1,149 @@
+import math
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image, ImageColor
+
+# Дробная часть центра отпечатка округляется до 1/SUBPIXEL пикселя, чтобы штампы можно было кэшировать
+SUBPIXEL = 4
+
+
+@lru_cache(maxsize=512)
+def dab_stamp(size, hardness, phase_x=0, phase_y=0):
+    # Сглаженная круглая маска отпечатка (float32, 0..1). Центр — в (half + phase / SUBPIXEL)
+    # по каждой оси; hardness — доля радиуса с полной непрозрачностью, дальше плавный спад
+    radius = size / 2
+    half = int(math.ceil(radius)) + 1
+    offsets = np.arange(-half, half + 1, dtype=np.float32)
+    xs = offsets - phase_x / SUBPIXEL
+    ys = offsets - phase_y / SUBPIXEL
+    distance = np.sqrt(xs[None, :] ** 2 + ys[:, None] ** 2)
+
+    falloff = max(radius * (1 - hardness), 1.0)
+    alpha = np.clip((radius + 0.5 - distance) / falloff, 0, 1)
+    # smoothstep: мягкий край без ступенек
+    stamp = alpha * alpha * (3 - 2 * alpha)
+    stamp.flags.writeable = False
+    return stamp
+
+
+def block_slices(bbox, size):
+    # Блоки size x size (в координатах документа), задетые bbox: ключ блока,
+    # срез его части в массиве размером с bbox и срез той же части в массиве блока
+    left, upper, right, lower = bbox
+    blocks = []
+    for block_y in range(upper // size, (lower - 1) // size + 1):
+        for block_x in range(left // size, (right - 1) // size + 1):
+            block_left, block_upper = block_x * size, block_y * size
+            x_from, x_to = max(left, block_left), min(right, block_left + size)
+            y_from, y_to = max(upper, block_upper), min(lower, block_upper + size)
+            blocks.append(((block_x, block_y),
+                           (slice(y_from - upper, y_to - upper), slice(x_from - left, x_to - left)),
+                           (slice(y_from - block_upper, y_to - block_upper),
+                            slice(x_from - block_left, x_to - block_left))))
+    return blocks
+
+
+class BrushStroke:
+    # Мазок кисти или ластика из отпечатков, расставленных вдоль пути через spacing * size.
+    # Покрытие мазка копится как максимум масок отпечатков, и пиксели каждый раз
+    # пересчитываются от снимка слоя на начало мазка: повторные отпечатки не
+    # накладываются друг на друга, и opacity — это непрозрачность всего мазка.
+    # Покрытие хранится блоками COVERAGE_BLOCK x COVERAGE_BLOCK только там, где прошёл мазок
+    COVERAGE_BLOCK = 128
+
+    def __init__(self, layer, color, size, hardness=0.8, spacing=0.15, opacity=1.0, erase=False):
+        self.layer = layer
+        self.source = layer.copy()
+        # (блок x, блок y) -> покрытие блока (float32)
+        self.coverage = {}
+        self.color = np.array(ImageColor.getcolor(color, "RGBA")[:3], dtype=np.float32) / 255
+        self.size = size
+        self.hardness = hardness
+        self.step = max(spacing * size, 0.5)
+        self.opacity = opacity
+        self.erase = erase
+        self.pending = []
+        self.previous = None
+        # Расстояние вдоль пути от последнего отпечатка
+        self.travelled = 0.0
+
+    def add_point(self, x, y):
+        if self.previous is None:
+            self.pending.append((x, y))
+            self.previous = (x, y)
+            return
+
+        x0, y0 = self.previous
+        length = math.hypot(x - x0, y - y0)
+        self.previous = (x, y)
+        if length == 0:
+            return
+        distance = self.step - self.travelled
+        while distance <= length:
+            t = distance / length
+            self.pending.append((x0 + (x - x0) * t, y0 + (y - y0) * t))
+            distance += self.step
+        self.travelled = length - (distance - self.step)
+
+    def finish(self):
+        # Последний отпечаток точно в конце пути, чтобы мазок не обрывался раньше
+        if self.previous is not None and self.travelled > 0:
+            self.pending.append(self.previous)
+            self.travelled = 0.0
+        return self.flush()
+
+    def flush(self):
+        # Все накопленные отпечатки кладутся за один раз; возвращает изменённый прямоугольник
+        if not self.pending:
+            return None
+        dabs, self.pending = self.pending, []
+        half = int(math.ceil(self.size / 2)) + 1
+        xs = [x for x, _ in dabs]
+        ys = [y for _, y in dabs]
+        bbox = self.layer.clip((math.floor(min(xs)) - half, math.floor(min(ys)) - half,
+                                math.floor(max(xs)) + half + 2, math.floor(max(ys)) + half + 2))
+        if bbox is None:
+            return None
+        left, upper, right, lower = bbox
+
+        blocks = block_slices(bbox, self.COVERAGE_BLOCK)
+        coverage = np.zeros((lower - upper, right - left), dtype=np.float32)
+        for key, part, block_part in blocks:
+            if key in self.coverage:
+                coverage[part] = self.coverage[key][block_part]
+        for x, y in dabs:
+            center_x, center_y = round(x * SUBPIXEL), round(y * SUBPIXEL)
+            stamp = dab_stamp(self.size, self.hardness, center_x % SUBPIXEL, center_y % SUBPIXEL)
+            stamp_left = center_x // SUBPIXEL - half - left
+            stamp_upper = center_y // SUBPIXEL - half - upper
+            target = coverage[max(stamp_upper, 0):stamp_upper + stamp.shape[0],
+                              max(stamp_left, 0):stamp_left + stamp.shape[1]]
+            part = stamp[max(-stamp_upper, 0):max(-stamp_upper, 0) + target.shape[0],
+                         max(-stamp_left, 0):max(-stamp_left, 0) + target.shape[1]]
+            np.maximum(target, part, out=target)
+        for key, part, block_part in blocks:
+            if key in self.coverage:
+                self.coverage[key][block_part] = coverage[part]
+            elif coverage[part].any():
+                block = self.coverage[key] = np.zeros((self.COVERAGE_BLOCK,) * 2, dtype=np.float32)
+                block[block_part] = coverage[part]
+
+        self.layer.paste(self._blend(self.source.crop(bbox), coverage), bbox[:2])
+        return bbox
+
+    def _blend(self, source, coverage):
+        pixels = np.asarray(source, dtype=np.float32) / 255
+        rgb, alpha = pixels[..., :3], pixels[..., 3:]
+        amount = (coverage * self.opacity)[..., None]
+
+        if self.erase:
+            result_alpha = alpha * (1 - amount)
+            result_rgb = rgb
+        else:
+            # Наложение цвета кисти поверх снимка (оператор over)
+            result_alpha = amount + alpha * (1 - amount)
+            result_rgb = (self.color * amount + rgb * alpha * (1 - amount)) / np.maximum(result_alpha, 1e-6)
+
+        result = np.concatenate([result_rgb, result_alpha], axis=2)
+        return Image.fromarray(np.rint(np.clip(result, 0, 1) * 255).astype(np.uint8), "RGBA")
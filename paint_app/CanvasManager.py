@@ -1,8 +1,23 @@
+import math
 import tkinter as tk
-from PIL import Image, ImageDraw, ImageTk, ImageColor
+from PIL import Image, ImageTk, ImageColor
+from TiledLayer import TiledLayer, uniform_tile
+from OverlayManager import OverlayManager
+from BlendEngine import BlendEngine, BLEND_MODES
 
 
 class CanvasManager:
+    # Холст показывается сеткой постоянных PhotoImage-плиток: при рисовании
+    # перерисовываются только плитки, задетые изменённым прямоугольником.
+    # Плитки лежат в координатах увеличенного документа, а существуют только видимые в окне:
+    # цена отрисовки зависит от размера окна, а не документа
+    DISPLAY_TILE_SIZE = 128
+    VIEW_MAX_WIDTH = 1200
+    VIEW_MAX_HEIGHT = 800
+    VIEW_BG = "#808080"
+    # Уменьшение — только степенями двойки: каждому масштабу соответствует уровень мипмапа
+    ZOOM_LEVELS = (1 / 16, 1 / 8, 1 / 4, 1 / 2, 1, 2, 3, 4, 6, 8)
+
     def __init__(self, root, width, height, bg_color):
         self.width = width
         self.height = height
@@ -18,64 +33,470 @@ class CanvasManager:
 
         self.bg_color = rgba_color
         self.tk_bg_color = hex_color
-        self.canvas = tk.Canvas(root, width=width, height=height, bg=self.tk_bg_color)
-        self.canvas.pack()
+        # Без root холст работает без окна (пакетный режим, замеры): слои и кэши есть, отрисовки нет
+        self.canvas = None
+        # Масштаб и окно просмотра: view_x, view_y — сдвиг окна в пикселях увеличенного документа
+        self.zoom = 1
+        self.view_x = 0
+        self.view_y = 0
+        self.view_width = min(width, self.VIEW_MAX_WIDTH)
+        self.view_height = min(height, self.VIEW_MAX_HEIGHT)
+        if root is not None:
+            self.canvas = tk.Canvas(root, width=self.view_width, height=self.view_height, bg=self.VIEW_BG,
+                                    highlightthickness=0, bd=0, xscrollincrement=1, yscrollincrement=1,
+                                    scrollregion=(0, 0, width, height))
+            self.canvas.pack(fill=tk.BOTH, expand=True)
+            self.canvas.bind("<Configure>", lambda e: self.set_view_size(e.width, e.height))
+        # Предпросмотры и рамки поверх растра; они не трогают плитки холста
+        self.overlay = OverlayManager(self.canvas)
 
-        base_layer = Image.new("RGBA", (width, height), self.bg_color)
+        base_layer = TiledLayer(width, height, self.bg_color, name="Фон")
         self.layers = [base_layer]
         self.active_layer_index = 0
-        self.draw = ImageDraw.Draw(self.layers[self.active_layer_index])
-        self.photo_image = None
+        self.display_tiles = {}
+        self.display_items = {}
+        # Уменьшенные копии сведённого изображения: уровень -> {плитка: RGB-картинка}.
+        # Уровень n уменьшен в 2**n раз; плитка уровня собирается из четырёх плиток уровнем ниже
+        self.mipmaps = {}
+        # Внутри begin_batch()/end_batch() задетые плитки копятся и рисуются один раз
+        self.batch_depth = 0
+        self.batch_damage = set()
+        self.batch_tasks = []
 
-    def get_composited_image(self):
-        base = Image.new("RGBA", (self.width, self.height), (0, 0, 0, 0))
-        for layer in self.layers:
-            base = Image.alpha_composite(base, layer)
-        return base.convert("RGB")
+        # Слои под активным (вместе с фоном) и над ним, сведённые заранее по тайлам.
+        # Пока рисуют только в активном слое, кадр стоит два наложения
+        self.below_cache = {}
+        self.above_cache = {}
+
+    def get_composited_image(self, box=None):
+        # Сведённое изображение документа или его части box (RGB)
+        return self._composite_region(box or (0, 0, self.width, self.height))
+
+    def iter_composited_bands(self, band_height):
+        # Сведённое изображение полосами сверху вниз: (верх полосы, RGB-картинка)
+        for top in range(0, self.height, band_height):
+            yield top, self._composite_region((0, top, self.width, min(top + band_height, self.height)))
+
+    def snapshot(self):
+        # Копия документа без окна для работы в другом потоке: тайлы общие (copy-on-write),
+        # кэши сведения свои, поэтому дальнейшее рисование снимок не меняет.
+        # Не прочитанные слои читаются уже в том потоке, а скрытые в снимок попадают пустыми
+        document = CanvasManager(None, self.width, self.height, self.bg_color)
+        layers = [layer.copy(tiles=not BlendEngine.is_skipped(layer), lazy=True) for layer in self.layers]
+        document.restore_layers(layers, (self.width, self.height), self.active_layer_index)
+        return document
+
+    def invalidate_composite(self, keys=None):
+        # Вызывается, когда меняется неактивный слой, порядок или число слоёв;
+        # keys — только эти тайлы
+        if keys is None:
+            self.below_cache = {}
+            self.above_cache = {}
+            return
+        for key in keys:
+            self.below_cache.pop(key, None)
+            self.above_cache.pop(key, None)
+
+    @staticmethod
+    def _stack_tile(base, layers, key):
+        # Накладывает тайл key каждого слоя на base; None — пока ничего не наложено.
+        # Скрытые и полностью прозрачные слои пропускаются
+        for layer in layers:
+            if BlendEngine.is_skipped(layer):
+                continue
+            plain = BlendEngine.is_plain(layer)
+            tile = layer.tiles.get(key)
+            if tile is None:
+                if layer.fill[3] == 0:
+                    continue
+                if layer.fill[3] == 255 and plain:
+                    base = uniform_tile(layer.tile_size, layer.fill)
+                    continue
+                tile = uniform_tile(layer.tile_size, layer.fill)
+            if plain:
+                base = tile if base is None else Image.alpha_composite(base, tile)
+            else:
+                if base is None:
+                    base = uniform_tile(layer.tile_size, (0, 0, 0, 0))
+                base = BlendEngine.composite(base, tile, opacity=layer.opacity, mode=layer.blend_mode)
+        return base
+
+    def _below_tile(self, key):
+        tile = self.below_cache.get(key)
+        if tile is None:
+            background = uniform_tile(TiledLayer.TILE_SIZE, self.bg_color)
+            tile = self._stack_tile(background, self.layers[:self.active_layer_index], key)
+            self.below_cache[key] = tile
+        return tile
+
+    def _above_tile(self, key):
+        if key not in self.above_cache:
+            self.above_cache[key] = self._stack_tile(None, self.layers[self.active_layer_index + 1:], key)
+        return self.above_cache[key]
+
+    def update_canvas(self, bbox=None):
+        # bbox — в координатах изображения
+        box = self.clip_box(bbox)
+        if box is None:
+            return
+        self._invalidate_mipmaps(box)
+        if self.canvas is None:
+            return
+
+        view_box = self._visible_box()
+        if view_box is None:
+            return
+        zoom = self.zoom
+        left = max(math.floor(box[0] * zoom), view_box[0])
+        upper = max(math.floor(box[1] * zoom), view_box[1])
+        right = min(math.ceil(box[2] * zoom), view_box[2])
+        lower = min(math.ceil(box[3] * zoom), view_box[3])
+        if left >= right or upper >= lower:
+            return
+
+        size = self.DISPLAY_TILE_SIZE
+        for tile_y in range(upper // size, (lower - 1) // size + 1):
+            for tile_x in range(left // size, (right - 1) // size + 1):
+                if self.batch_depth:
+                    self.batch_damage.add((tile_x, tile_y))
+                else:
+                    self._render_tile(tile_x, tile_y)
+
+    def begin_batch(self):
+        self.batch_depth += 1
+
+    def defer(self, callback):
+        # Внутри пачки callback выполнится один раз в end_batch, перед перерисовкой; вне пачки — сразу
+        if not self.batch_depth:
+            callback()
+        elif callback not in self.batch_tasks:
+            self.batch_tasks.append(callback)
+
+    def end_batch(self):
+        if self.batch_depth == 1:
+            tasks, self.batch_tasks = self.batch_tasks, []
+            for task in tasks:
+                task()
+        self.batch_depth -= 1
+        if self.batch_depth == 0:
+            damage, self.batch_damage = self.batch_damage, set()
+            visible = self._visible_tiles()
+            for tile_x, tile_y in sorted(damage & visible):
+                self._render_tile(tile_x, tile_y)
+
+    def clip_box(self, bbox=None):
+        if bbox is None:
+            return 0, 0, self.width, self.height
+
+        left, upper, right, lower = bbox
+        left = max(int(math.floor(left)), 0)
+        upper = max(int(math.floor(upper)), 0)
+        right = min(int(math.ceil(right)), self.width)
+        lower = min(int(math.ceil(lower)), self.height)
+        if left >= right or upper >= lower:
+            return None
+        return left, upper, right, lower
+
+    def _render_tile(self, tile_x, tile_y):
+        size = self.DISPLAY_TILE_SIZE
+        scaled_width, scaled_height = self.scaled_size()
+        box = (tile_x * size, tile_y * size,
+               min((tile_x + 1) * size, scaled_width), min((tile_y + 1) * size, scaled_height))
+        self._show_tile((tile_x, tile_y), box, self._view_region(box))
+
+    def _show_tile(self, key, box, image):
+        # Передача готовой плитки в Tk (отдельно, чтобы профайлер видел стоимость PhotoImage)
+        photo = self.display_tiles.get(key)
+        if photo is None:
+            photo = ImageTk.PhotoImage(image)
+            self.display_tiles[key] = photo
+            self.display_items[key] = self.canvas.create_image(box[0], box[1], image=photo, anchor=tk.NW,
+                                                               tags="image")
+            self.canvas.tag_lower("image")
+        else:
+            photo.paste(image)
+
+    def _view_region(self, box):
+        # box — в координатах увеличенного документа
+        zoom = self.zoom
+        if zoom == 1:
+            return self._composite_region(box)
+        if zoom < 1:
+            level = round(math.log2(1 / zoom))
+            size = self.DISPLAY_TILE_SIZE
+            return self._mip_tile(level, (box[0] // size, box[1] // size))
+
+        # Увеличение: сводится только попавшая в плитку часть изображения и растягивается без сглаживания
+        source = (box[0] // zoom, box[1] // zoom,
+                  min(-(-box[2] // zoom), self.width), min(-(-box[3] // zoom), self.height))
+        image = self._composite_region(source)
+        image = image.resize((image.width * zoom, image.height * zoom), Image.NEAREST)
+        left, upper = source[0] * zoom, source[1] * zoom
+        return image.crop((box[0] - left, box[1] - upper, box[2] - left, box[3] - upper))
+
+    def _level_size(self, level):
+        scale = 2 ** level
+        return -(-self.width // scale), -(-self.height // scale)
+
+    def _mip_tile(self, level, key):
+        tiles = self.mipmaps.setdefault(level, {})
+        tile = tiles.get(key)
+        if tile is not None:
+            return tile
+
+        size = self.DISPLAY_TILE_SIZE
+        tile_x, tile_y = key
+        if level == 1:
+            source = self._composite_region(self.clip_box((tile_x * 2 * size, tile_y * 2 * size,
+                                                           (tile_x + 1) * 2 * size, (tile_y + 1) * 2 * size)))
+        else:
+            child_width, child_height = self._level_size(level - 1)
+            source = Image.new("RGB", (min(2 * size, child_width - tile_x * 2 * size),
+                                       min(2 * size, child_height - tile_y * 2 * size)))
+            for dy in range(2):
+                for dx in range(2):
+                    if dx * size < source.width and dy * size < source.height:
+                        child = self._mip_tile(level - 1, (tile_x * 2 + dx, tile_y * 2 + dy))
+                        source.paste(child, (dx * size, dy * size))
+        tile = source.reduce(2)
+        tiles[key] = tile
+        return tile
+
+    def seed_mipmaps(self, images):
+        # images: уровень -> готовое уменьшенное сведённое изображение (превью или пирамида,
+        # посчитанная при импорте). Плитки этих уровней заменяются, видимые плитки перерисовываются
+        size = self.DISPLAY_TILE_SIZE
+        for level, image in images.items():
+            width, height = self._level_size(level)
+            if image.size != (width, height):
+                image = image.resize((width, height), Image.BILINEAR)
+            image = image.convert("RGB")
+            self.mipmaps[level] = {(tile_x, tile_y): image.crop((tile_x * size, tile_y * size,
+                                                                 min((tile_x + 1) * size, width),
+                                                                 min((tile_y + 1) * size, height)))
+                                   for tile_y in range(-(-height // size))
+                                   for tile_x in range(-(-width // size))}
+        self.redraw_view()
 
-    def update_canvas(self):
-        self.canvas.delete("all")
+    def redraw_view(self):
+        # Перерисовка видимых плиток без сброса мипмапа
+        if self.canvas is None:
+            return
+        for tile_x, tile_y in sorted(self._visible_tiles()):
+            self._render_tile(tile_x, tile_y)
+
+    def _invalidate_mipmaps(self, box):
+        # Сбрасываются только плитки уровней, задетые изменённым прямоугольником (box — в пикселях изображения)
+        left, upper, right, lower = box
+        for level, tiles in self.mipmaps.items():
+            if not tiles:
+                continue
+            span = self.DISPLAY_TILE_SIZE * 2 ** level
+            for tile_y in range(upper // span, (lower - 1) // span + 1):
+                for tile_x in range(left // span, (right - 1) // span + 1):
+                    tiles.pop((tile_x, tile_y), None)
+
+    def scaled_size(self):
+        return math.ceil(self.width * self.zoom), math.ceil(self.height * self.zoom)
+
+    def _visible_box(self):
+        # Видимая часть увеличенного документа
+        scaled_width, scaled_height = self.scaled_size()
+        right = min(self.view_x + self.view_width, scaled_width)
+        lower = min(self.view_y + self.view_height, scaled_height)
+        if self.view_x >= right or self.view_y >= lower:
+            return None
+        return self.view_x, self.view_y, right, lower
+
+    def _visible_tiles(self):
+        view_box = self._visible_box()
+        if view_box is None:
+            return set()
+        left, upper, right, lower = view_box
+        size = self.DISPLAY_TILE_SIZE
+        return {(tile_x, tile_y)
+                for tile_y in range(upper // size, (lower - 1) // size + 1)
+                for tile_x in range(left // size, (right - 1) // size + 1)}
+
+    def to_image(self, x, y):
+        # Координаты события в окне холста -> координаты изображения
+        return math.floor((x + self.view_x) / self.zoom), math.floor((y + self.view_y) / self.zoom)
+
+    def _sync_view(self):
+        # Плитки, ушедшие из окна, удаляются, открывшиеся — рисуются; остальные не трогаются
+        if self.canvas is None:
+            return
+        visible = self._visible_tiles()
+        for key in list(self.display_tiles):
+            if key not in visible:
+                del self.display_tiles[key]
+                self.canvas.delete(self.display_items.pop(key))
+        for tile_x, tile_y in sorted(visible):
+            if (tile_x, tile_y) not in self.display_tiles:
+                self._render_tile(tile_x, tile_y)
+
+    def _clamp_view(self):
+        scaled_width, scaled_height = self.scaled_size()
+        self.view_x = int(max(0, min(self.view_x, scaled_width - self.view_width)))
+        self.view_y = int(max(0, min(self.view_y, scaled_height - self.view_height)))
+        if self.canvas is not None:
+            self.canvas.xview_moveto(self.view_x / scaled_width)
+            self.canvas.yview_moveto(self.view_y / scaled_height)
+            self.overlay.follow_view()
+
+    def scroll_to(self, x, y):
+        self.view_x, self.view_y = x, y
+        self._clamp_view()
+        self._sync_view()
+
+    def pan(self, dx, dy):
+        self.scroll_to(self.view_x + dx, self.view_y + dy)
+
+    def set_view_size(self, width, height):
+        if (width, height) == (self.view_width, self.view_height):
+            return
+        self.view_width, self.view_height = width, height
+        self.scroll_to(self.view_x, self.view_y)
+
+    def set_zoom(self, zoom, anchor_x=None, anchor_y=None):
+        # Точка изображения под (anchor_x, anchor_y) в окне остаётся на месте; по умолчанию — центр окна
+        if zoom == self.zoom:
+            return
+        if anchor_x is None:
+            anchor_x, anchor_y = self.view_width / 2, self.view_height / 2
+        image_x = (anchor_x + self.view_x) / self.zoom
+        image_y = (anchor_y + self.view_y) / self.zoom
+        self.zoom = zoom
+        self.overlay.set_scale(zoom)
+        self.view_x = round(image_x * zoom - anchor_x)
+        self.view_y = round(image_y * zoom - anchor_y)
+        self._configure_view()
+        self._sync_view()
+
+    def fit_zoom(self):
+        # Наибольший масштаб не крупнее 1:1, при котором документ целиком помещается в окне
+        for zoom in reversed(self.ZOOM_LEVELS):
+            if zoom <= 1 and self.width * zoom <= self.view_width and self.height * zoom <= self.view_height:
+                return zoom
+        return self.ZOOM_LEVELS[0]
+
+    def zoom_step(self, step, anchor_x=None, anchor_y=None):
+        index = self.ZOOM_LEVELS.index(self.zoom) + step
+        self.set_zoom(self.ZOOM_LEVELS[max(0, min(index, len(self.ZOOM_LEVELS) - 1))], anchor_x, anchor_y)
+
+    def _configure_view(self):
+        # Новый размер увеличенного документа: область прокрутки, положение окна, пустая сетка плиток
+        if self.canvas is not None:
+            scaled_width, scaled_height = self.scaled_size()
+            self.canvas.config(scrollregion=(0, 0, scaled_width, scaled_height))
+        self._clamp_view()
+        self._reset_display()
+
+    def _composite_region(self, box):
         active_layer = self.layers[self.active_layer_index]
-        background = Image.new("RGBA", (self.width, self.height), self.bg_color)
-        combined = Image.alpha_composite(background, active_layer)
-        image = combined.convert("RGB")
+        active_shown = not BlendEngine.is_skipped(active_layer)
+        above_layers = [layer for layer in self.layers[self.active_layer_index + 1:]
+                        if not BlendEngine.is_skipped(layer)]
+        # Обычное наложение ассоциативно, и слои над активным можно свести заранее;
+        # с другими режимами они накладываются по очереди на уже готовый результат
+        above_cached = all(layer.blend_mode == "normal" for layer in above_layers)
+        left, upper, right, lower = box
+        result = Image.new("RGB", (right - left, lower - upper))
+
+        for key in active_layer.tile_keys(box):
+            tile_left, tile_upper, tile_right, tile_lower = active_layer.tile_box(key)
+            part = (max(left, tile_left) - tile_left, max(upper, tile_upper) - tile_upper,
+                    min(right, tile_right) - tile_left, min(lower, tile_lower) - tile_upper)
 
-        self.photo_image = ImageTk.PhotoImage(image)
-        self.canvas.create_image(0, 0, image=self.photo_image, anchor=tk.NW)
+            combined = self._below_tile(key).crop(part)
+            if active_shown and active_layer.has_content(key):
+                combined = BlendEngine.composite(combined, active_layer.get_tile(key), part,
+                                                 active_layer.opacity, active_layer.blend_mode)
+            if above_cached:
+                above = self._above_tile(key)
+                if above is not None:
+                    combined.alpha_composite(above, source=part)
+            else:
+                for layer in above_layers:
+                    if layer.has_content(key):
+                        combined = BlendEngine.composite(combined, layer.get_tile(key), part,
+                                                         layer.opacity, layer.blend_mode)
+            result.paste(combined.convert("RGB"), (tile_left + part[0] - left, tile_upper + part[1] - upper))
+        return result
 
-    def update_draw(self):
-        self.draw = ImageDraw.Draw(self.layers[self.active_layer_index])
+    def _reset_display(self):
+        if self.canvas is None:
+            return
+        self.canvas.delete("image")
+        self.display_tiles = {}
+        self.display_items = {}
+        self.batch_damage = set()
 
     def switch_layer(self, index):
         if 0 <= index < len(self.layers):
             self.active_layer_index = index
-            self.update_draw()
+            self.invalidate_composite()
             self.update_canvas()
 
     def add_layer(self):
-        new_layer = Image.new("RGBA", (self.width, self.height), (0, 0, 0, 0))
+        new_layer = TiledLayer(self.width, self.height, name=f"Слой {len(self.layers) + 1}")
+        new_layer.origin = self.origin
         self.layers.append(new_layer)
         self.switch_layer(len(self.layers) - 1)
-        self.update_canvas()
+
+    def set_layer_properties(self, index, name=None, visible=None, opacity=None, blend_mode=None):
+        layer = self.layers[index]
+        if blend_mode is not None and blend_mode not in BLEND_MODES:
+            raise ValueError(f"Неизвестный режим наложения: {blend_mode}")
+        before = layer.properties()
+        layer.set_properties((before[0] if name is None else name,
+                              before[1] if visible is None else visible,
+                              before[2] if opacity is None else min(max(opacity, 0.0), 1.0),
+                              before[3] if blend_mode is None else blend_mode))
+        # Имя на изображение не влияет
+        if layer.properties()[1:] != before[1:]:
+            self.invalidate_composite()
+            self.update_canvas()
 
     def delete_layer(self, index):
         if 0 <= index < len(self.layers) and len(self.layers) > 1:
             del self.layers[index]
             self.active_layer_index = max(0, index - 1)
-            self.update_draw()
+            self.invalidate_composite()
             self.update_canvas()
 
-    def resize_canvas(self, width, height):
-        old_layers = self.layers.copy()
-        self.width = width
-        self.height = height
-        self.layers = []
+    def restore_layers(self, layers, size, active_index):
+        resized = size != (self.width, self.height)
+        self.layers = list(layers)
+        self.width, self.height = size
+        self.active_layer_index = active_index
+        self.invalidate_composite()
+        if resized:
+            self.mipmaps = {}
+            self._configure_view()
+        self.update_canvas()
+
+    def load_image(self, image):
+        # Документ из готового изображения: оно становится единственным (нижним) слоем
+        image = image.convert("RGBA")
+        base_layer = TiledLayer(image.width, image.height, self.bg_color, name="Фон")
+        base_layer.paste(image)
+        self.restore_layers([base_layer], image.size, 0)
 
-        for layer in old_layers:
-            new_layer = Image.new("RGBA", (width, height), (0, 0, 0, 0))
-            new_layer.paste(layer, (0, 0))
-            self.layers.append(new_layer)
+    @property
+    def origin(self):
+        # Сетка тайлов общая для всех слоёв, иначе тайлы с одним ключом не совпали бы при сведении
+        return self.layers[0].origin
 
+    def resize_canvas(self, width, height, left=0, top=0):
+        # Старый угол документа встаёт в точку (left, top) нового, отрицательные значения обрезают
+        # слева и сверху. Меняются только границы слоёв и сдвиг сетки тайлов: тайлы за новой
+        # границей отбрасываются, новая область выделится при рисовании
+        self.width = width
+        self.height = height
+        for layer in self.layers:
+            layer.resize(width, height, left, top)
+        self.invalidate_composite()
+        self.mipmaps = {}
+        self._configure_view()
         self.switch_layer(min(self.active_layer_index, len(self.layers) - 1))
-        self.canvas.config(width=width, height=height)
-        self.update_canvas()
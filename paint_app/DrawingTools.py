@@ -1,14 +1,26 @@
-from PIL import ImageDraw, ImageColor, ImageFont, Image
+import numpy as np
+from PIL import Image, ImageColor
 import tkinter as tk
+from FilterEngine import FilterEngine, gaussian_kernel
+from FilterExecutor import filter_region
+from FloodFill import FloodFill
+from BrushEngine import BrushStroke, block_slices
+from FontCache import FONT_CACHE
 
 
 class DrawingTools:
+    # Размытый снимок слоя считается блоками такого размера по мере продвижения мазка
+    BLUR_BLOCK_SIZE = 64
+
     def __init__(self, canvas_manager):
         self.canvas_manager = canvas_manager
         self.current_tool = "brush"
         self.current_color = "black"
         self.current_size = 5
         self.current_text_size = 12
+        # Гарнитура надписей (путь к .ttf); None — первый найденный шрифт из FontCache.font_paths
+        self.current_font = None
+        self.font_cache = FONT_CACHE
         self.last_x = None
         self.last_y = None
         self.start_x = None
@@ -16,32 +28,79 @@ class DrawingTools:
         self.text_entry = None
         self.text_start_pos = None
         self.text_active = False
+        # Заливка: допуск по каналам RGBA, все похожие пиксели вместо связной области,
+        # образец цвета со сведённого изображения вместо активного слоя
+        self.fill_tolerance = 0
+        self.fill_contiguous = True
+        self.fill_sample_merged = False
+        # Кисть и ластик: жёсткость края, шаг отпечатков (доля размера), непрозрачность мазка
+        self.brush_hardness = 0.8
+        self.brush_spacing = 0.15
+        self.brush_opacity = 1.0
+        self.brush_stroke = None
+        # Размытие кистью: sigma гауссова ядра и состояние текущего мазка
+        self.blur_sigma = 3.0
+        self.blur_stroke = None
+        # OperationLog, если действия нужно записывать для воспроизведения
+        self.operation_log = None
+
+    def _record(self, kind, *args):
+        if self.operation_log is not None:
+            self.operation_log.record(kind, *args)
 
     def set_tool(self, tool):
         if self.text_entry:
             self.finish_text_input()
+        self.finish_brush_stroke()
         self.current_tool = tool
         self.text_active = False
+        self.blur_stroke = None
+        self._record("tool", tool)
 
     def set_color(self, color):
         self.current_color = color
+        self._record("color", color)
 
     def set_size(self, size):
         self.current_size = size
+        self._record("size", size)
+
+    def set_brush_options(self, hardness=None, spacing=None, opacity=None):
+        if hardness is not None:
+            self.brush_hardness = hardness
+        if spacing is not None:
+            self.brush_spacing = spacing
+        if opacity is not None:
+            self.brush_opacity = opacity
+        self._record("brush_options", self.brush_hardness, self.brush_spacing, self.brush_opacity)
+
+    def set_blur_sigma(self, sigma):
+        self.blur_sigma = sigma
+        self._record("blur_sigma", sigma)
+
+    def set_fill_options(self, tolerance=None, contiguous=None, sample_merged=None):
+        if tolerance is not None:
+            self.fill_tolerance = tolerance
+        if contiguous is not None:
+            self.fill_contiguous = contiguous
+        if sample_merged is not None:
+            self.fill_sample_merged = sample_merged
+        self._record("fill_options", self.fill_tolerance, self.fill_contiguous, self.fill_sample_merged)
 
     def on_button_press(self, x, y):
         self.start_x, self.start_y = x, y
         self.last_x, self.last_y = x, y
 
-        active_layer = self.canvas_manager.layers[self.canvas_manager.active_layer_index]
-
         if self.current_tool == "fill":
-            fill_color = ImageColor.getrgb(self.current_color)
-            try:
-                ImageDraw.floodfill(active_layer, (x, y), fill_color)
-            except Exception:
-                print("Ошибка")
-            self.canvas_manager.update_canvas()
+            self.flood_fill(x, y)
+
+        elif self.current_tool in ["brush", "eraser"]:
+            self.finish_brush_stroke()
+            self.brush_point(x, y)
+
+        elif self.current_tool == "gauss":
+            self.blur_stroke = None
+            self.blur_segment(x, y, x, y)
 
         elif self.current_tool == "text" and not self.text_active:
             self.start_text_input(x, y)
@@ -50,7 +109,54 @@ class DrawingTools:
         elif self.text_active:
             self.finish_text_input()
 
-    def apply_gaussian_blur_at(self, x, y, radius=1, region_size=40):
+    def flood_fill(self, x, y):
+        # Возвращает прямоугольник залитой области (перерисовывается только он) или None.
+        # Область ищется по тайлам слоя: документ целиком в одно изображение не собирается
+        canvas_manager = self.canvas_manager
+        active_layer = canvas_manager.layers[canvas_manager.active_layer_index]
+        fill_color = ImageColor.getcolor(self.current_color, "RGBA")
+        size = active_layer.tile_size
+        origin_x, origin_y = active_layer.origin
+        if self.fill_sample_merged:
+            def read_tile(key):
+                tile = np.zeros((size, size, 4), dtype=np.uint8)
+                box = active_layer.clip(active_layer.tile_box(key))
+                if box is not None:
+                    tile_left, tile_upper = active_layer.tile_box(key)[:2]
+                    part = np.asarray(canvas_manager.get_composited_image(box).convert("RGBA"))
+                    tile[box[1] - tile_upper:box[3] - tile_upper, box[0] - tile_left:box[2] - tile_left] = part
+                return tile
+        else:
+            if (self.fill_contiguous and self.fill_tolerance == 0 and 0 <= x < active_layer.width
+                    and 0 <= y < active_layer.height and active_layer.getpixel((x, y)) == fill_color):
+                return None
+
+            # Пустые тайлы слоя — один и тот же одноцветный тайл: его массив строится один раз
+            blank = []
+
+            def read_tile(key):
+                if key in active_layer.tiles:
+                    return np.asarray(active_layer.tiles[key])
+                if not blank:
+                    blank.append(np.asarray(active_layer.get_tile(key)))
+                return blank[0]
+
+        area = (-origin_x, -origin_y, active_layer.width - origin_x, active_layer.height - origin_y)
+        found = FloodFill.tiled_region(read_tile, size, area, int(x) - origin_x, int(y) - origin_y,
+                                       self.fill_tolerance, self.fill_contiguous)
+        if found is None:
+            return None
+        masks, bbox = found
+        for key, mask in masks.items():
+            if mask.all():
+                active_layer.fill_tile(key, fill_color)
+            else:
+                active_layer.fill_tile(key, fill_color, Image.fromarray(mask.view(np.uint8) * np.uint8(255), "L"))
+        bbox = (bbox[0] + origin_x, bbox[1] + origin_y, bbox[2] + origin_x, bbox[3] + origin_y)
+        canvas_manager.update_canvas(bbox)
+        return bbox
+
+    def _filter_region(self, x, y, region_size):
         active_layer = self.canvas_manager.layers[self.canvas_manager.active_layer_index]
 
         left = max(x - region_size // 2, 0)
@@ -59,116 +165,128 @@ class DrawingTools:
         lower = min(y + region_size // 2, active_layer.height)
 
         if left >= right or upper >= lower:
-            return
-
-        region = active_layer.crop((left, upper, right, lower)).convert("RGB")
-        pixels = region.load()
-        width, height = region.size
-        result = Image.new("RGB", (width, height))
-        result_pixels = result.load()
+            return None
+        return left, upper, right, lower
 
-        for i in range(width):
-            for j in range(height):
-                r_sum, g_sum, b_sum = 0, 0, 0
-                count = 0
-
-                for dx in range(-radius, radius + 1):
-                    for dy in range(-radius, radius + 1):
-                        nx, ny = i + dx, j + dy
-                        if 0 <= nx < width and 0 <= ny < height:
-                            pr, pg, pb = pixels[nx, ny]
-                            r_sum += pr
-                            g_sum += pg
-                            b_sum += pb
-                            count += 1
-
-                r_avg = int(r_sum / count)
-                g_avg = int(g_sum / count)
-                b_avg = int(b_sum / count)
-
-                result_pixels[i, j] = (r_avg, g_avg, b_avg)
-
-        active_layer.paste(result, (left, upper))
-        self.canvas_manager.update_canvas()
-
-    def apply_grayscale_at(self, x, y, region_size=40):
-        active_layer = self.canvas_manager.layers[self.canvas_manager.active_layer_index]
-
-        left = max(x - region_size // 2, 0)
-        right = min(x + region_size // 2, active_layer.width)
-        upper = max(y - region_size // 2, 0)
-        lower = min(y + region_size // 2, active_layer.height)
-
-        if left >= right or upper >= lower:
+    def _apply_filter_at(self, x, y, region_size, apply_filter):
+        box = self._filter_region(x, y, region_size)
+        if box is None:
             return
 
-        region = active_layer.crop((left, upper, right, lower))
-        pixels = region.load()
-
-        for i in range(region.width):
-            for j in range(region.height):
-                pixel = pixels[i, j]
-                r, g, b = pixel[:3]  # Берём первые три канала
-                a = pixel[3] if len(pixel) == 4 else 255  # Альфа, если есть
-
-                gray = int(0.299 * r + 0.587 * g + 0.114 * b)
-                pixels[i, j] = (gray, gray, gray, a)
-
-        active_layer.paste(region, (left, upper))
-        self.canvas_manager.update_canvas()
-
-    def apply_sharpen_at(self, x, y, region_size=40):
         active_layer = self.canvas_manager.layers[self.canvas_manager.active_layer_index]
+        region = active_layer.crop(box)
+        active_layer.paste(apply_filter(region), box[:2])
+        self.canvas_manager.update_canvas(box)
 
-        left = max(x - region_size // 2, 0)
-        right = min(x + region_size // 2, active_layer.width)
-        upper = max(y - region_size // 2, 0)
-        lower = min(y + region_size // 2, active_layer.height)
-
-        if left >= right or upper >= lower:
-            return
-
-        region = active_layer.crop((left, upper, right, lower)).convert("RGB")
-        pixels = region.load()
-
-        width, height = region.size
-        result = Image.new("RGB", (width, height))
-        result_pixels = result.load()
+    def filter_params(self, name):
+        return {"sigma": self.blur_sigma} if name == "gauss" else {}
 
-        amount = 1.5
-        for i in range(width):
-            for j in range(height):
-                r, g, b = pixels[i, j]
-
-                neighbors = []
-                if i > 0:
-                    neighbors.append(pixels[i - 1, j])
-                if i < width - 1:
-                    neighbors.append(pixels[i + 1, j])
-                if j > 0:
-                    neighbors.append(pixels[i, j - 1])
-                if j < height - 1:
-                    neighbors.append(pixels[i, j + 1])
-
-                if neighbors:
-                    nr = sum(n[0] for n in neighbors) / len(neighbors)
-                    ng = sum(n[1] for n in neighbors) / len(neighbors)
-                    nb = sum(n[2] for n in neighbors) / len(neighbors)
-                else:
-                    nr, ng, nb = r, g, b
-
-                sr = int(r + amount * (r - nr))
-                sg = int(g + amount * (g - ng))
-                sb = int(b + amount * (b - nb))
-
-                sr = max(0, min(255, sr))
-                sg = max(0, min(255, sg))
-                sb = max(0, min(255, sb))
+    def filter_area(self, name, box=None):
+        # Фильтр gauss, grayscale или sharpen одним векторным проходом по области box
+        # активного слоя (по умолчанию — весь слой)
+        active_layer = self.canvas_manager.layers[self.canvas_manager.active_layer_index]
+        box = active_layer.clip(box or (0, 0, active_layer.width, active_layer.height))
+        if box is None:
+            return None
+        active_layer.paste(filter_region(active_layer, name, self.filter_params(name), box), box[:2])
+        self.canvas_manager.update_canvas(box)
+        return box
+
+    def brush_point(self, x, y):
+        # Добавляет точку пути к мазку кисти или ластика. Отпечатки кладутся в конце
+        # пачки событий кадра (или сразу, если пачки нет) — одним наложением
+        if self.brush_stroke is None:
+            active_layer = self.canvas_manager.layers[self.canvas_manager.active_layer_index]
+            self.brush_stroke = BrushStroke(active_layer, self.current_color, self.current_size,
+                                            self.brush_hardness, self.brush_spacing, self.brush_opacity,
+                                            erase=self.current_tool == "eraser")
+        self.brush_stroke.add_point(x, y)
+        self.canvas_manager.defer(self.flush_brush_stroke)
+
+    def flush_brush_stroke(self):
+        if self.brush_stroke is None:
+            return None
+        bbox = self.brush_stroke.flush()
+        if bbox is not None:
+            self.canvas_manager.update_canvas(bbox)
+        return bbox
+
+    def finish_brush_stroke(self):
+        if self.brush_stroke is None:
+            return None
+        stroke, self.brush_stroke = self.brush_stroke, None
+        bbox = stroke.finish()
+        if bbox is not None:
+            self.canvas_manager.update_canvas(bbox)
+        return bbox
+
+    def blur_segment(self, x1, y1, x2, y2):
+        # Размывает след кисти на отрезке (x1, y1)-(x2, y2). Пиксели берутся из снимка слоя
+        # на начало мазка, и каждый размывается один раз за мазок: результат не зависит
+        # от скорости мыши, а стоимость — от длины мазка, а не от числа событий
+        active_layer = self.canvas_manager.layers[self.canvas_manager.active_layer_index]
+        stroke = self.blur_stroke
+        if (stroke is None or stroke[0] is not active_layer
+                or (stroke[1].size, stroke[1].origin) != (active_layer.size, active_layer.origin)):
+            # Уже размытые пиксели отмечаются масками блоков BLUR_BLOCK_SIZE — только там, где прошёл мазок
+            stroke = self.blur_stroke = (active_layer, active_layer.copy(), {}, {})
+        _, source, done_blocks, blurred_blocks = stroke
+
+        bbox = active_layer.clip(self._shape_bbox(x1, y1, x2, y2))
+        if bbox is None:
+            return None
+        left, upper, right, lower = bbox
+        block_size = self.BLUR_BLOCK_SIZE
+        blocks = block_slices(bbox, block_size)
+
+        # След кисти — пиксели не дальше половины размера кисти от отрезка. Из таких
+        # следов ломаная складывается одинаково при любом делении на отрезки
+        ys, xs = np.mgrid[upper:lower, left:right].astype(np.float64)
+        dx, dy = x2 - x1, y2 - y1
+        length = dx * dx + dy * dy
+        t = np.clip(((xs - x1) * dx + (ys - y1) * dy) / length, 0, 1) if length else 0
+        distance = (xs - x1 - t * dx) ** 2 + (ys - y1 - t * dy) ** 2
+        footprint = distance <= (self.current_size / 2) ** 2
+        done = np.zeros_like(footprint)
+        for key, part, block_part in blocks:
+            if key in done_blocks:
+                done[part] = done_blocks[key][block_part]
+        new = footprint & ~done
+        if not new.any():
+            return None
+
+        blurred = Image.new("RGBA", (right - left, lower - upper))
+        for key, part, block_part in blocks:
+            if not new[part].any():
+                continue
+            if key not in done_blocks:
+                done_blocks[key] = np.zeros((block_size, block_size), dtype=bool)
+            done_blocks[key][block_part] |= new[part]
+            block = blurred_blocks.get(key)
+            if block is None:
+                block = blurred_blocks[key] = self._blur_block(source, *key)
+            blurred.paste(block, (key[0] * block_size - left, key[1] * block_size - upper))
+
+        region = active_layer.crop(bbox)
+        region.paste(blurred, mask=Image.fromarray(new.view(np.uint8) * np.uint8(255), "L"))
+        active_layer.paste(region, bbox[:2])
+        self.canvas_manager.update_canvas(bbox)
+        return bbox
+
+    def _blur_block(self, source, block_x, block_y):
+        # Блок размывается с запасом в радиус ядра, чтобы края видели настоящих соседей
+        size = self.BLUR_BLOCK_SIZE
+        block = source.clip((block_x * size, block_y * size, (block_x + 1) * size, (block_y + 1) * size))
+        margin = len(gaussian_kernel(float(self.blur_sigma))) // 2
+        outer = source.clip((block[0] - margin, block[1] - margin, block[2] + margin, block[3] + margin))
+        blurred = FilterEngine.gaussian_blur(source.crop(outer), self.blur_sigma)
+        return blurred.crop((block[0] - outer[0], block[1] - outer[1], block[2] - outer[0], block[3] - outer[1]))
 
-                result_pixels[i, j] = (sr, sg, sb)
+    def apply_grayscale_at(self, x, y, region_size=40):
+        self._apply_filter_at(x, y, region_size, FilterEngine.grayscale)
 
-        active_layer.paste(result, (left, upper))
-        self.canvas_manager.update_canvas()
+    def apply_sharpen_at(self, x, y, region_size=40):
+        self._apply_filter_at(x, y, region_size, FilterEngine.sharpen)
 
     def start_text_input(self, x, y):
         self.text_start_pos = (x, y)
@@ -183,12 +301,7 @@ class DrawingTools:
             relief=tk.SOLID
         )
 
-        self.canvas_manager.canvas.create_window(
-            x, y,
-            window=self.text_entry,
-            anchor=tk.NW,
-            tags="text_input"
-        )
+        self.canvas_manager.overlay.show("text_input", "window", (x, y), window=self.text_entry, anchor=tk.NW)
 
         self.text_entry.focus_set()
         self.text_entry.bind("<Return>", lambda e: self.finish_text_input())
@@ -199,42 +312,44 @@ class DrawingTools:
 
             if text.strip():
                 x, y = self.text_start_pos
-
-                try:
-                    font = ImageFont.truetype("arial.ttf", self.current_text_size)
-                except Exception:
-                    font = ImageFont.load_default()
-
-                self.canvas_manager.draw.text(
-                    (x, y),
-                    text,
-                    fill=self.current_color,
-                    font=font
-                )
-
-                self.canvas_manager.update_canvas()
+                self._record("text", x, y, text, self.current_text_size)
+                self.draw_text(x, y, text)
 
             self.text_entry.destroy()
             self.text_entry = None
-            self.canvas_manager.canvas.delete("text_input")
+            self.canvas_manager.overlay.remove("text_input")
             self.text_start_pos = None
             self.text_active = False
 
-    def on_mouse_drag(self, x, y):
+    def draw_text(self, x, y, text):
+        # Строка растеризуется один раз (FontCache), надпись — вклейка готовой маски цветом
+        mask, (left, upper, right, lower) = self.font_cache.layout(text, self.current_text_size, self.current_font)
+        left, upper, right, lower = x + left, y + upper, x + right, y + lower
         active_layer = self.canvas_manager.layers[self.canvas_manager.active_layer_index]
+        bbox = active_layer.draw((left, upper, right, lower), lambda draw, dx, dy: draw.bitmap(
+            (left + dx, upper + dy),
+            mask,
+            fill=self.current_color
+        ))
+
+        self.canvas_manager.update_canvas(bbox)
+        return bbox
 
+    def on_mouse_drag(self, x, y):
         if self.current_tool in ["brush", "eraser"]:
-            color = self.current_color if self.current_tool == "brush" else (0, 0, 0, 0)
-            self.canvas_manager.draw.line(
-                [self.last_x, self.last_y, x, y], fill=color, width=self.current_size)
+            if self.brush_stroke is None and self.last_x is not None:
+                self.brush_point(self.last_x, self.last_y)
+            self.brush_point(x, y)
             self.last_x, self.last_y = x, y
-            self.canvas_manager.update_canvas()
 
         elif self.current_tool in ["circle", "rectangle", "straight_line", "ellipse"]:
             self.draw_temp_shape(x, y)
 
         elif self.current_tool == "gauss":
-            self.apply_gaussian_blur_at(x, y, self.current_size)
+            if self.last_x is None:
+                self.last_x, self.last_y = x, y
+            self.blur_segment(self.last_x, self.last_y, x, y)
+            self.last_x, self.last_y = x, y
 
         elif self.current_tool == "grayscale":
             self.apply_grayscale_at(x, y, self.current_size)
@@ -243,61 +358,77 @@ class DrawingTools:
             self.apply_sharpen_at(x, y, self.current_size)
 
     def on_button_release(self, x, y):
+        bbox = None
+        self.blur_stroke = None
+        self.finish_brush_stroke()
         if self.current_tool == "circle":
-            self.draw_circle(x, y)
+            bbox = self.draw_circle(x, y)
         elif self.current_tool == "rectangle":
-            self.draw_rectangle(x, y)
+            bbox = self.draw_rectangle(x, y)
         elif self.current_tool == "straight_line":
-            self.draw_line(x, y)
+            bbox = self.draw_line(x, y)
         elif self.current_tool == "ellipse":
-            self.draw_ellipse(x, y)
+            bbox = self.draw_ellipse(x, y)
 
-        self.canvas_manager.update_canvas()
-        self.canvas_manager.canvas.delete("temp_shape")
+        if bbox is not None:
+            self.canvas_manager.update_canvas(bbox)
+        self.canvas_manager.overlay.hide("temp_shape")
 
-    def draw_temp_shape(self, x, y):
-        self.canvas_manager.canvas.delete("temp_shape")
+    @staticmethod
+    def _shift(points, dx, dy):
+        return [value + (dx if index % 2 == 0 else dy) for index, value in enumerate(points)]
 
+    def _draw_shape(self, points, paint):
+        # paint(draw, points) рисует фигуру по сдвинутым в координаты тайла точкам
+        active_layer = self.canvas_manager.layers[self.canvas_manager.active_layer_index]
+        return active_layer.draw(self._shape_bbox(*points),
+                                 lambda draw, dx, dy: paint(draw, self._shift(points, dx, dy)))
+
+    def _shape_bbox(self, x1, y1, x2, y2):
+        # Прямоугольник, задетый фигурой по точкам (x1, y1)-(x2, y2) с учётом толщины линии
+        pad = self.current_size // 2 + 2
+        return (min(x1, x2) - pad, min(y1, y2) - pad,
+                max(x1, x2) + pad + 1, max(y1, y2) + pad + 1)
+
+    def draw_temp_shape(self, x, y):
+        # Предпросмотр — один постоянный элемент оверлея, на каждое движение меняются только его координаты
+        overlay = self.canvas_manager.overlay
         if self.current_tool == "circle":
             radius = ((x - self.start_x) ** 2 + (y - self.start_y) ** 2) ** 0.5
-            self.canvas_manager.canvas.create_oval(
-                self.start_x - radius, self.start_y - radius,
-                self.start_x + radius, self.start_y + radius,
-                outline=self.current_color, width=self.current_size, tags="temp_shape")
+            overlay.show("temp_shape", "oval",
+                         (self.start_x - radius, self.start_y - radius,
+                          self.start_x + radius, self.start_y + radius),
+                         outline=self.current_color, width=self.current_size)
 
         elif self.current_tool == "rectangle":
-            self.canvas_manager.canvas.create_rectangle(
-                self.start_x, self.start_y, x, y,
-                outline=self.current_color, width=self.current_size, tags="temp_shape")
+            overlay.show("temp_shape", "rectangle", (self.start_x, self.start_y, x, y),
+                         outline=self.current_color, width=self.current_size)
 
         elif self.current_tool == "straight_line":
-            self.canvas_manager.canvas.create_line(
-                self.start_x, self.start_y, x, y,
-                fill=self.current_color, width=self.current_size, tags="temp_shape")
+            overlay.show("temp_shape", "line", (self.start_x, self.start_y, x, y),
+                         fill=self.current_color, width=self.current_size)
 
         elif self.current_tool == "ellipse":
-            self.canvas_manager.canvas.create_oval(
-                self.start_x, self.start_y, x, y,
-                outline=self.current_color, width=self.current_size, tags="temp_shape")
+            overlay.show("temp_shape", "oval", (self.start_x, self.start_y, x, y),
+                         outline=self.current_color, width=self.current_size)
 
     def draw_circle(self, x, y):
         radius = ((x - self.start_x) ** 2 + (y - self.start_y) ** 2) ** 0.5
-        self.canvas_manager.draw.ellipse([
-            self.start_x - radius, self.start_y - radius,
-            self.start_x + radius, self.start_y + radius],
-            outline=self.current_color, width=self.current_size)
+        return self._draw_shape(
+            [self.start_x - radius, self.start_y - radius, self.start_x + radius, self.start_y + radius],
+            lambda draw, points: draw.ellipse(points, outline=self.current_color, width=self.current_size))
 
     def draw_rectangle(self, x, y):
-        self.canvas_manager.draw.rectangle([
-            self.start_x, self.start_y, x, y],
-            outline=self.current_color, width=self.current_size)
+        return self._draw_shape(
+            [self.start_x, self.start_y, x, y],
+            lambda draw, points: draw.rectangle(points, outline=self.current_color, width=self.current_size))
 
     def draw_line(self, x, y):
-        self.canvas_manager.draw.line([
-            self.start_x, self.start_y, x, y],
-            fill=self.current_color, width=self.current_size)
+        return self._draw_shape(
+            [self.start_x, self.start_y, x, y],
+            lambda draw, points: draw.line(points, fill=self.current_color, width=self.current_size))
 
     def draw_ellipse(self, x, y):
-        self.canvas_manager.draw.ellipse([
-            self.start_x, self.start_y, x, y],
-            outline=self.current_color, width=self.current_size)
+        return self._draw_shape(
+            [self.start_x, self.start_y, x, y],
+            lambda draw, points: draw.ellipse(points, outline=self.current_color, width=self.current_size))
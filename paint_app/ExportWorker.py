@@ -0,0 +1,107 @@
+import os
+import threading
+
+from PIL import Image
+
+
+class ExportJob:
+    # Одно сохранение: снимок документа, путь и ход работы. state — queued, running, done,
+    # cancelled или failed; progress — доля от 0 до 1. Меняется только потоком сохранения
+    def __init__(self, document, path):
+        self.document = document
+        self.path = path
+        self.state = "queued"
+        self.progress = 0.0
+        self.error = None
+        self.cancelled = threading.Event()
+        self.finished = threading.Event()
+
+    @property
+    def active(self):
+        return self.state in ("queued", "running")
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+class ExportWorker:
+    # Сводит и кодирует документ в фоновом потоке, чтобы окно не замирало на больших холстах.
+    # Снимок документа дешёвый (тайлы общие, copy-on-write), поэтому рисовать можно сразу.
+    # Новое сохранение в тот же файл отменяет ещё не законченное: нужен только последний снимок
+    BAND_HEIGHT = 256
+    # Доля прогресса на сведение; остальное — кодирование и запись
+    COMPOSITE_SHARE = 0.8
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.queue = []
+        self.current = None
+        self.thread = threading.Thread(target=self._run, name="export-worker", daemon=True)
+        self.thread.start()
+
+    def submit(self, document, path):
+        job = ExportJob(document, path)
+        with self.condition:
+            for queued in self.queue:
+                if queued.path == path:
+                    self._finish(queued, "cancelled")
+            self.queue = [queued for queued in self.queue if queued.path != path]
+            if self.current is not None and self.current.path == path:
+                self.current.cancel()
+            self.queue.append(job)
+            self.condition.notify()
+        return job
+
+    def wait(self, timeout=None):
+        # Ждёт, пока очередь опустеет (например, перед выходом из программы)
+        with self.condition:
+            return self.condition.wait_for(lambda: not self.queue and self.current is None, timeout)
+
+    def _run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.queue)
+                job = self.current = self.queue.pop(0)
+            try:
+                self._export(job)
+            except Exception as error:
+                job.error = error
+                self._finish(job, "failed")
+            with self.condition:
+                self.current = None
+                self.condition.notify_all()
+
+    @staticmethod
+    def _finish(job, state):
+        job.state = state
+        job.document = None
+        job.finished.set()
+
+    def _export(self, job):
+        job.state = "running"
+        document = job.document
+        image = Image.new("RGB", (document.width, document.height))
+        for top, band in document.iter_composited_bands(self.BAND_HEIGHT):
+            if job.cancelled.is_set():
+                self._finish(job, "cancelled")
+                return
+            image.paste(band, (0, top))
+            job.progress = self.COMPOSITE_SHARE * (top + band.height) / document.height
+
+        # Запись во временный файл и замена: отменённое или упавшее сохранение не портит старый файл
+        extension = os.path.splitext(job.path)[1].lower()
+        image_format = Image.registered_extensions().get(extension, "PNG")
+        temporary_path = job.path + ".part"
+        try:
+            image.save(temporary_path, image_format)
+            if job.cancelled.is_set():
+                os.remove(temporary_path)
+                self._finish(job, "cancelled")
+                return
+            os.replace(temporary_path, job.path)
+        except Exception:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+        job.progress = 1.0
+        self._finish(job, "done")
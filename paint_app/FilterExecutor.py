@@ -0,0 +1,219 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+
+import numpy as np
+from PIL import Image
+
+from FilterEngine import FilterEngine, gaussian_kernel
+
+FILTERS = ("gauss", "grayscale", "sharpen")
+
+
+def filter_halo(name, params):
+    # Сколько соседних пикселей фильтр видит с каждой стороны: столько запаса нужно тайлу
+    if name == "gauss":
+        return len(gaussian_kernel(float(params["sigma"]))) // 2
+    if name == "sharpen":
+        return 1
+    return 0
+
+
+def apply_filter(name, region, params):
+    # region — RGBA; альфа сохраняется и у фильтров, которые считают только RGB
+    if name == "gauss":
+        return FilterEngine.gaussian_blur(region, params["sigma"])
+    if name == "grayscale":
+        return FilterEngine.grayscale(region)
+    if name == "sharpen":
+        result = FilterEngine.sharpen(region, params.get("amount", 1.5)).convert("RGBA")
+        result.putalpha(region.getchannel("A"))
+        return result
+    raise ValueError(f"Неизвестный фильтр: {name}")
+
+
+def filter_region(layer, name, params, box):
+    # Один проход по всей области: box слоя с запасом под ядро, результат — ровно box
+    halo = filter_halo(name, params)
+    outer = layer.clip((box[0] - halo, box[1] - halo, box[2] + halo, box[3] + halo))
+    result = apply_filter(name, layer.crop(outer), params)
+    return result.crop((box[0] - outer[0], box[1] - outer[1], box[2] - outer[0], box[3] - outer[1]))
+
+
+def _filter_tile(source_buffer, target_buffer, shape, name, params, tile, outer):
+    source = np.ndarray(shape, np.uint8, source_buffer)
+    target = np.ndarray(shape, np.uint8, target_buffer)
+    left, upper, right, lower = outer
+    result = np.asarray(apply_filter(name, Image.fromarray(source[upper:lower, left:right], "RGBA"), params))
+    target[tile[1]:tile[3], tile[0]:tile[2]] = result[tile[1] - upper:tile[3] - upper, tile[0] - left:tile[2] - left]
+
+
+def _run_tile(source_name, target_name, shape, name, params, tile, outer):
+    # Выполняется в процессе пула: пиксели не передаются, процесс читает и пишет общую память
+    source_memory = shared_memory.SharedMemory(name=source_name)
+    target_memory = shared_memory.SharedMemory(name=target_name)
+    error = None
+    try:
+        _filter_tile(source_memory.buf, target_memory.buf, shape, name, params, tile, outer)
+    except Exception as exception:
+        # Трассировка держит ссылки на буферы, и общую память нельзя было бы закрыть
+        error = f"{type(exception).__name__}: {exception}"
+    finally:
+        source_memory.close()
+        target_memory.close()
+    if error is not None:
+        raise RuntimeError(error)
+    return tile
+
+
+class FilterJob:
+    # Один фильтр на области слоя. state — queued, running, done, cancelled или failed;
+    # progress — доля готовых тайлов. result — отфильтрованная область box (RGBA), когда done
+    def __init__(self, layer, name, params, box):
+        self.layer = layer
+        self.name = name
+        self.params = params
+        self.box = box
+        self.state = "queued"
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.cancelled = threading.Event()
+        self.finished = threading.Event()
+
+    @property
+    def active(self):
+        return self.state in ("queued", "running")
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+class FilterExecutor:
+    # Фильтр на большой области считается тайлами с запасом под ядро в пуле процессов.
+    # Область слоя один раз копируется в общую память (multiprocessing.shared_memory), процессы
+    # получают только имена буферов и прямоугольники и пишут результат в общий выходной буфер.
+    # Задания идут по очереди в потоке-распорядителе, как сохранения в ExportWorker;
+    # отмена снимает ещё не начатые тайлы и ждёт только считающиеся
+    TILE_SIZE = 512
+    POLL_SECONDS = 0.05
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        # Пул создаётся при первом фильтре в вызывающем потоке и дальше держит процессы готовыми
+        self.pool = None
+        self.condition = threading.Condition()
+        self.queue = []
+        self.current = None
+        self.thread = threading.Thread(target=self._run, name="filter-executor", daemon=True)
+        self.thread.start()
+
+    def submit(self, layer, name, params, box):
+        # Вызывается в потоке Tk: слой снимается копией (тайлы общие), дальше его можно менять
+        if name not in FILTERS:
+            raise ValueError(f"Неизвестный фильтр: {name}")
+        job = FilterJob(layer.copy(), name, dict(params), box)
+        if self.pool is None:
+            # Процессы не форкаются из процесса с потоками Tk, истории и сохранения (их замки
+            # достались бы потомку запертыми): forkserver, а где его нет — spawn
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            self.pool = ProcessPoolExecutor(self.workers, mp_context=context)
+        with self.condition:
+            self.queue.append(job)
+            self.condition.notify()
+        return job
+
+    def wait(self, timeout=None):
+        with self.condition:
+            return self.condition.wait_for(lambda: not self.queue and self.current is None, timeout)
+
+    def shutdown(self):
+        with self.condition:
+            for job in self.queue:
+                self._finish(job, "cancelled")
+            self.queue = []
+            if self.current is not None:
+                self.current.cancel()
+        self.wait()
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def _run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.queue)
+                job = self.current = self.queue.pop(0)
+            try:
+                self._execute(job)
+            except Exception as error:
+                job.error = error
+                self._finish(job, "failed")
+            with self.condition:
+                self.current = None
+                self.condition.notify_all()
+
+    @staticmethod
+    def _finish(job, state):
+        job.state = state
+        job.layer = None
+        job.finished.set()
+
+    def _tiles(self, box, outer, halo):
+        # Тайлы области box и их прямоугольники с запасом — в координатах буфера outer
+        size = self.TILE_SIZE
+        width, height = outer[2] - outer[0], outer[3] - outer[1]
+        for upper in range(box[1] - outer[1], box[3] - outer[1], size):
+            for left in range(box[0] - outer[0], box[2] - outer[0], size):
+                tile = (left, upper, min(left + size, box[2] - outer[0]), min(upper + size, box[3] - outer[1]))
+                yield tile, (max(tile[0] - halo, 0), max(tile[1] - halo, 0),
+                             min(tile[2] + halo, width), min(tile[3] + halo, height))
+
+    def _execute(self, job):
+        if job.cancelled.is_set():
+            self._finish(job, "cancelled")
+            return
+        job.state = "running"
+        box = job.box
+        halo = filter_halo(job.name, job.params)
+        outer = job.layer.clip((box[0] - halo, box[1] - halo, box[2] + halo, box[3] + halo))
+        region = np.asarray(job.layer.crop(outer))
+        shape = region.shape
+
+        source_memory = shared_memory.SharedMemory(create=True, size=region.nbytes)
+        target_memory = shared_memory.SharedMemory(create=True, size=region.nbytes)
+        pending = set()
+        try:
+            np.ndarray(shape, np.uint8, source_memory.buf)[:] = region
+            del region
+            pending = {self.pool.submit(_run_tile, source_memory.name, target_memory.name, shape,
+                                        job.name, job.params, tile, tile_outer)
+                       for tile, tile_outer in self._tiles(box, outer, halo)}
+            total = len(pending)
+            while pending:
+                done, pending = wait(pending, self.POLL_SECONDS, FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+                job.progress = (total - len(pending)) / total
+                if job.cancelled.is_set():
+                    self._finish(job, "cancelled")
+                    return
+
+            target = np.ndarray(shape, np.uint8, target_memory.buf)
+            inner = target[box[1] - outer[1]:box[3] - outer[1], box[0] - outer[0]:box[2] - outer[0]]
+            job.result = Image.fromarray(inner.copy(), "RGBA")
+            del target, inner
+        finally:
+            # После отмены или ошибки считающиеся тайлы ещё пишут в общую память: освобождается она после них
+            for future in pending:
+                future.cancel()
+            wait(pending)
+            source_memory.close()
+            source_memory.unlink()
+            target_memory.close()
+            target_memory.unlink()
+        job.progress = 1.0
+        self._finish(job, "done")
@@ -0,0 +1,210 @@
+from bisect import bisect_right
+from collections import deque
+
+import numpy as np
+
+# Строк за один проход при сравнении с цветом затравки: ограничивает временные массивы
+MATCH_CHUNK_ROWS = 256
+
+
+class FloodFill:
+    # Заливка по отрезкам строк (scanline): совпадающие с затравкой пиксели каждой строки
+    # собираются в отрезки одним векторным проходом, затем обходятся связанные отрезки
+    # соседних строк. Стоимость растёт с числом отрезков, а не пикселей области
+    @staticmethod
+    def match_mask(pixels, color, tolerance=0):
+        # Пиксель подходит, если каждый канал RGBA отличается от color не больше чем на tolerance
+        if tolerance == 0:
+            # Точное совпадение: пиксель RGBA сравнивается как одно 32-битное число
+            packed = np.ascontiguousarray(pixels).view(np.uint32)[..., 0]
+            return packed == np.asarray(color, dtype=np.uint8).view(np.uint32)[0]
+
+        height = pixels.shape[0]
+        mask = np.empty(pixels.shape[:2], dtype=bool)
+        color = np.asarray(color, dtype=np.int16)
+        for top in range(0, height, MATCH_CHUNK_ROWS):
+            difference = np.abs(pixels[top:top + MATCH_CHUNK_ROWS].astype(np.int16) - color).max(axis=2)
+            mask[top:top + MATCH_CHUNK_ROWS] = difference <= tolerance
+        return mask
+
+    @staticmethod
+    def _runs(mask):
+        # Отрезки подряд идущих True: строка, начало и конец (не включая) — в порядке строк
+        height, width = mask.shape
+        padded = np.zeros((height, width + 2), dtype=np.int8)
+        padded[:, 1:-1] = mask
+        edges = np.diff(padded, axis=1)
+        rows, starts = np.nonzero(edges == 1)
+        ends = np.nonzero(edges == -1)[1]
+        return rows, starts, ends
+
+    @staticmethod
+    def _seed_runs(rows, starts, ends, width, xs, ys):
+        # Номера отрезков, в которые попали точки (xs, ys), без повторов
+        keys = rows * (width + 1) + starts
+        index = np.searchsorted(keys, ys * (width + 1) + xs, side="right") - 1
+        inside = index >= 0
+        index, xs, ys = index[inside], xs[inside], ys[inside]
+        return np.unique(index[(rows[index] == ys) & (ends[index] > xs)])
+
+    @staticmethod
+    def _connected_runs(rows, starts, ends, height, seed_runs):
+        # Отрезки, связанные с отрезками seed_runs; None — затравок нет
+        if not len(seed_runs):
+            return None
+        offsets = np.searchsorted(rows, np.arange(height + 1)).tolist()
+        starts_list = starts.tolist()
+        ends_list = ends.tolist()
+        rows_list = rows.tolist()
+
+        visited = bytearray(len(starts_list))
+        found = seed_runs.tolist()
+        for seed in found:
+            visited[seed] = 1
+        stack = [(seed, rows_list[seed]) for seed in found]
+        while stack:
+            index, y = stack.pop()
+            start, end = starts_list[index], ends_list[index]
+            for next_y in (y - 1, y + 1):
+                if next_y < 0 or next_y >= height:
+                    continue
+                # Отрезки соседней строки, пересекающиеся с [start, end) (4-связность)
+                lo, hi = offsets[next_y], offsets[next_y + 1]
+                other = bisect_right(ends_list, start, lo, hi)
+                while other < hi and starts_list[other] < end:
+                    if not visited[other]:
+                        visited[other] = 1
+                        stack.append((other, next_y))
+                        found.append(other)
+                    other += 1
+        return np.array(found, dtype=np.int64)
+
+    @staticmethod
+    def _runs_mask(rows, starts, ends, bbox):
+        # Отрезки в строке не пересекаются, поэтому маску даёт накопленная сумма +1/-1 на их концах
+        left, upper, right, lower = bbox
+        delta = np.zeros((lower - upper, right - left + 1), dtype=np.int8)
+        np.add.at(delta, (rows - upper, starts - left), 1)
+        np.add.at(delta, (rows - upper, ends - left), -1)
+        return np.cumsum(delta, axis=1, dtype=np.int8)[:, :-1] > 0
+
+    @staticmethod
+    def region(pixels, x, y, tolerance=0, contiguous=True):
+        # pixels — массив HxWx4. Возвращает (маска, bbox) области заливки, маска — в пределах bbox;
+        # contiguous=False — все подходящие пиксели изображения, а не только связанные с (x, y)
+        height, width = pixels.shape[:2]
+        if not (0 <= x < width and 0 <= y < height):
+            return None
+
+        mask = FloodFill.match_mask(pixels, pixels[y, x], tolerance)
+        if not contiguous:
+            rows_any = np.flatnonzero(mask.any(axis=1))
+            cols_any = np.flatnonzero(mask.any(axis=0))
+            bbox = (int(cols_any[0]), int(rows_any[0]), int(cols_any[-1]) + 1, int(rows_any[-1]) + 1)
+            return mask[bbox[1]:bbox[3], bbox[0]:bbox[2]], bbox
+
+        rows, starts, ends = FloodFill._runs(mask)
+        seed_runs = FloodFill._seed_runs(rows, starts, ends, width, np.array([x]), np.array([y]))
+        found = FloodFill._connected_runs(rows, starts, ends, height, seed_runs)
+        if found is None:
+            return None
+        rows, starts, ends = rows[found], starts[found], ends[found]
+        bbox = (int(starts.min()), int(rows.min()), int(ends.max()), int(rows.max()) + 1)
+        return FloodFill._runs_mask(rows, starts, ends, bbox), bbox
+
+    @staticmethod
+    def tiled_region(read_tile, tile_size, area, x, y, tolerance=0, contiguous=True):
+        # То же по тайлам, без сборки изображения целиком: read_tile(key) — массив тайла
+        # tile_size x tile_size x 4, area — доступная часть сетки тайлов, (x, y) — в координатах сетки.
+        # Связная область растёт от тайла к тайлу через пиксели на их краях.
+        # Возвращает ({ключ тайла: маска tile_size x tile_size}, bbox в координатах сетки) или None
+        left, upper, right, lower = area
+        if not (left <= x < right and upper <= y < lower):
+            return None
+        size = tile_size
+        color = read_tile((x // size, y // size))[y % size, x % size].copy()
+        key_range = (left // size, upper // size, (right - 1) // size, (lower - 1) // size)
+
+        def inside(key):
+            # Пиксели тайла, лежащие в area
+            mask = np.zeros((size, size), dtype=bool)
+            tile_left, tile_upper = key[0] * size, key[1] * size
+            mask[max(upper - tile_upper, 0):min(lower - tile_upper, size),
+                 max(left - tile_left, 0):min(right - tile_left, size)] = True
+            return mask
+
+        masks = {}
+        if not contiguous:
+            for tile_y in range(key_range[1], key_range[3] + 1):
+                for tile_x in range(key_range[0], key_range[2] + 1):
+                    key = (tile_x, tile_y)
+                    mask = FloodFill.match_mask(read_tile(key), color, tolerance) & inside(key)
+                    if mask.any():
+                        masks[key] = mask
+        else:
+            # Тайл, подходящий целиком (обычно пустой тайл слоя), делит одну маску с остальными такими.
+            # Подходящие пиксели тайла считаются один раз: путь заливки может вернуться в тайл не раз
+            full = np.ones((size, size), dtype=bool)
+            matches = {}
+            # Ключ тайла -> списки затравок [(xs, ys)] в координатах тайла
+            pending = {(x // size, y // size): [(np.array([x % size]), np.array([y % size]))]}
+            queue = deque(pending)
+            while queue:
+                key = queue.popleft()
+                seeds = pending.pop(key)
+                xs = np.concatenate([seed[0] for seed in seeds])
+                ys = np.concatenate([seed[1] for seed in seeds])
+                filled = masks.get(key)
+                if filled is not None:
+                    fresh = ~filled[ys, xs]
+                    xs, ys = xs[fresh], ys[fresh]
+                    if not len(xs):
+                        continue
+                candidates = matches.get(key)
+                if candidates is None:
+                    candidates = FloodFill.match_mask(read_tile(key), color, tolerance) & inside(key)
+                    candidates = matches[key] = full if candidates.all() else candidates
+                if filled is not None:
+                    candidates = candidates & ~filled
+                if not candidates[ys, xs].any():
+                    continue
+                if candidates is full:
+                    new = full
+                else:
+                    rows, starts, ends = FloodFill._runs(candidates)
+                    seed_runs = FloodFill._seed_runs(rows, starts, ends, size, xs, ys)
+                    found = FloodFill._connected_runs(rows, starts, ends, size, seed_runs)
+                    new = FloodFill._runs_mask(rows[found], starts[found], ends[found], (0, 0, size, size))
+                masks[key] = new if filled is None else filled | new
+
+                # Пиксели на краях новой части — затравки соседних тайлов
+                tile_x, tile_y = key
+                last = np.full(size, size - 1)
+                first = np.zeros(size, dtype=np.int64)
+                edges = (((tile_x - 1, tile_y), new[:, 0], lambda i: (last[:len(i)], i)),
+                         ((tile_x + 1, tile_y), new[:, -1], lambda i: (first[:len(i)], i)),
+                         ((tile_x, tile_y - 1), new[0], lambda i: (i, last[:len(i)])),
+                         ((tile_x, tile_y + 1), new[-1], lambda i: (i, first[:len(i)])))
+                for neighbour, edge, seed in edges:
+                    if not (key_range[0] <= neighbour[0] <= key_range[2]
+                            and key_range[1] <= neighbour[1] <= key_range[3]):
+                        continue
+                    points = np.flatnonzero(edge)
+                    if not len(points):
+                        continue
+                    if neighbour not in pending:
+                        pending[neighbour] = []
+                        queue.append(neighbour)
+                    pending[neighbour].append(seed(points))
+
+        if not masks:
+            return None
+        boxes = []
+        for (tile_x, tile_y), mask in masks.items():
+            rows_any = np.flatnonzero(mask.any(axis=1))
+            cols_any = np.flatnonzero(mask.any(axis=0))
+            boxes.append((tile_x * size + int(cols_any[0]), tile_y * size + int(rows_any[0]),
+                          tile_x * size + int(cols_any[-1]) + 1, tile_y * size + int(rows_any[-1]) + 1))
+        bbox = (min(box[0] for box in boxes), min(box[1] for box in boxes),
+                max(box[2] for box in boxes), max(box[3] for box in boxes))
+        return masks, bbox
@@ -0,0 +1,96 @@
+import os
+from collections import OrderedDict
+
+from PIL import Image, ImageDraw, ImageFont
+
+# Где искать шрифт, если гарнитура не указана явно: первый найденный. Переменная окружения
+# PAINT_FONTS (пути через os.pathsep) добавляется в начало списка — так шрифт задаётся пакетному режиму
+FONT_PATHS = [
+    "arial.ttf",
+    "DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
+    "/usr/share/fonts/TTF/DejaVuSans.ttf",
+    "/Library/Fonts/Arial.ttf",
+    "/System/Library/Fonts/Supplemental/Arial.ttf",
+]
+
+
+class FontCache:
+    # Загруженные шрифты и отрисованные строки. Шрифт открывается один раз на (гарнитуру, размер),
+    # строка растеризуется один раз на (гарнитуру, размер, текст) в маску "L" с готовой рамкой;
+    # дальше надпись — это вклейка маски цветом. Оба кэша вытесняют давно не использованное (LRU)
+    def __init__(self, font_paths=None, max_fonts=32, max_layouts=1024):
+        if font_paths is None:
+            font_paths = [path for path in os.environ.get("PAINT_FONTS", "").split(os.pathsep) if path] + FONT_PATHS
+        self.font_paths = list(font_paths)
+        self.max_fonts = max_fonts
+        self.max_layouts = max_layouts
+        # Гарнитура по умолчанию: первый путь из font_paths, который открылся (None — встроенный шрифт)
+        self.default_face = None
+        self.default_resolved = False
+        self.fonts = OrderedDict()
+        self.layouts = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _resolve_default(self):
+        if not self.default_resolved:
+            self.default_resolved = True
+            for path in self.font_paths:
+                try:
+                    ImageFont.truetype(path, 12)
+                except OSError:
+                    continue
+                self.default_face = path
+                break
+        return self.default_face
+
+    @staticmethod
+    def _touch(cache, key, limit, value):
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > limit:
+            cache.popitem(last=False)
+
+    def font(self, size, face=None):
+        face = face or self._resolve_default()
+        key = (face, size)
+        font = self.fonts.get(key)
+        if font is not None:
+            self.fonts.move_to_end(key)
+            return font
+        if face is None:
+            font = ImageFont.load_default(size)
+        else:
+            font = ImageFont.truetype(face, size)
+        self._touch(self.fonts, key, self.max_fonts, font)
+        return font
+
+    def layout(self, text, size, face=None):
+        # (маска, рамка относительно точки привязки текста); рамка пустой строки — нулевая
+        face = face or self._resolve_default()
+        key = (face, size, text)
+        layout = self.layouts.get(key)
+        if layout is not None:
+            self.hits += 1
+            self.layouts.move_to_end(key)
+            return layout
+
+        self.misses += 1
+        font = self.font(size, face)
+        left, upper, right, lower = ImageDraw.Draw(Image.new("L", (1, 1))).textbbox((0, 0), text, font=font)
+        mask = Image.new("L", (max(right - left, 1), max(lower - upper, 1)))
+        ImageDraw.Draw(mask).text((-left, -upper), text, fill=255, font=font)
+        layout = (mask, (left, upper, right, lower))
+        self._touch(self.layouts, key, self.max_layouts, layout)
+        return layout
+
+    def text_bbox(self, x, y, text, size, face=None):
+        # Прямоугольник, который займёт надпись в точке (x, y): только он и перерисовывается
+        left, upper, right, lower = self.layout(text, size, face)[1]
+        return x + left, y + upper, x + right, y + lower
+
+
+# Общий на процесс: пакетный режим штампует одну и ту же подпись на тысячах изображений
+FONT_CACHE = FontCache()
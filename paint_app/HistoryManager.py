@@ -1,19 +1,397 @@
+import mmap
+import tempfile
+import threading
+import zlib
+
+from PIL import Image
+
+
+class PackedTile:
+    # Тайл старого шага истории, сжатый zlib: данные в памяти (data)
+    # или в файле подкачки (offset, length), если data is None
+    __slots__ = ("size", "data", "offset", "length")
+
+    def __init__(self, size, data):
+        self.size = size
+        self.data = data
+        self.offset = None
+        self.length = len(data)
+
+
+class ScratchFile:
+    # Файл подкачки: дописывается в конец, читается через mmap.
+    # dead — байты забытых или распакованных шагов, которые больше никто не прочитает
+    def __init__(self):
+        self.file = tempfile.TemporaryFile()
+        self.size = 0
+        self.dead = 0
+        self._map = None
+
+    def write(self, data):
+        offset = self.size
+        self.file.seek(offset)
+        self.file.write(data)
+        self.file.flush()
+        self.size += len(data)
+        return offset
+
+    def read(self, offset, length):
+        if self._map is None or len(self._map) < offset + length:
+            if self._map is not None:
+                self._map.close()
+            self._map = mmap.mmap(self.file.fileno(), self.size, access=mmap.ACCESS_READ)
+        return self._map[offset:offset + length]
+
+    def clear(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self.file.truncate(0)
+        self.size = 0
+        self.dead = 0
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self.file.close()
+
+
+class HistoryEntry:
+    # Одно действие: изменённые тайлы слоёв и, если было, изменение набора слоёв, их свойств
+    # (имя, видимость, непрозрачность, режим наложения) или размера холста
+    def __init__(self, tile_changes, layers_before, layers_after, size_before, size_after,
+                 active_before, active_after, property_changes=(), origin_before=(0, 0), origin_after=(0, 0)):
+        self.tile_changes = tile_changes
+        self.property_changes = property_changes
+        self.layers_before = layers_before
+        self.layers_after = layers_after
+        self.size_before = size_before
+        self.size_after = size_after
+        # Сдвиг сетки тайлов (CanvasManager.origin): меняется при росте и обрезке холста слева и сверху
+        self.origin_before = origin_before
+        self.origin_after = origin_after
+        self.active_before = active_before
+        self.active_after = active_after
+        # hot — тайлы как есть, compressed — сжаты в памяти, spilled — в файле подкачки
+        self.state = "hot"
+        self.nbytes = 0
+        self.hot_bytes = 0
+        self.compressed_bytes = 0
+        self.spilled_bytes = 0
+        self.count_bytes()
+
+    def tiles(self):
+        for _, changes in self.tile_changes:
+            for old_tile, new_tile in changes.values():
+                yield old_tile
+                yield new_tile
+
+    def count_bytes(self):
+        # nbytes — сколько шаг занимает в памяти; файл подкачки в бюджет не входит
+        seen = set()
+        self.hot_bytes = self.compressed_bytes = self.spilled_bytes = 0
+        for tile in self.tiles():
+            if tile is None or id(tile) in seen:
+                continue
+            seen.add(id(tile))
+            if isinstance(tile, PackedTile):
+                if tile.data is None:
+                    self.spilled_bytes += tile.length
+                else:
+                    self.compressed_bytes += tile.length
+            else:
+                self.hot_bytes += tile.width * tile.height * 4
+        # Удалённые слои живут только в истории
+        for layer in self.layers_before:
+            if all(layer is not kept for kept in self.layers_after):
+                self.hot_bytes += layer.nbytes
+        self.nbytes = self.hot_bytes + self.compressed_bytes
+
+
 class HistoryManager:
-    def __init__(self, canvas_manager, max_history=50):
+    # Запись идёт транзакциями: между двумя commit() слои ведут журнал изменённых тайлов,
+    # и в историю попадают только они, а не копии всех слоёв.
+    # Шаги старше hot_entries сжимаются в фоне, а сжатые данные сверх spill_bytes
+    # уходят в файл подкачки; при отмене они распаковываются по требованию.
+    # Когда мёртвые байты превышают SCRATCH_DEAD_RATIO файла, он переписывается заново
+    SCRATCH_DEAD_RATIO = 0.5
+
+    def __init__(self, canvas_manager, max_bytes=512 * 1024 * 1024, hot_entries=8,
+                 spill_bytes=64 * 1024 * 1024, background=True):
         self.canvas_manager = canvas_manager
         self.history = []
-        self.max_history = max_history
+        self.redo_history = []
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+        self.hot_entries = hot_entries
+        self.spill_bytes = spill_bytes
+        self.pending = None
+        self.scratch = None
+        self.lock = threading.RLock()
+        self._wakeup = threading.Event()
+        if background:
+            threading.Thread(target=self._compact_loop, name="history-compactor", daemon=True).start()
+        self._begin()
 
     def save_state(self):
-        state = [layer.copy() for layer in self.canvas_manager.layers]
-        self.history.append(state)
-        if len(self.history) > self.max_history:
-            self.history.pop(0)
+        # Всё, что изменилось с прошлого вызова, становится отдельным шагом отмены
+        self.commit()
+
+    def commit(self):
+        with self.lock:
+            entry = self._finish()
+            self._begin()
+            if entry is None:
+                return
+
+            self.history.append(entry)
+            self.used_bytes += entry.nbytes
+            dropped, self.redo_history = self.redo_history, []
+            for item in dropped:
+                self._forget(item)
+            self._evict()
+        if len(self.history) > self.hot_entries:
+            self._wakeup.set()
 
     def undo(self):
-        if self.history:
-            previous_state = self.history.pop()
-            self.canvas_manager.layers = [layer.copy() for layer in previous_state]
+        with self.lock:
+            self.commit()
+            if self.history:
+                entry = self.history.pop()
+                self.redo_history.append(entry)
+                self._apply(entry, undo=True)
+
+    def redo(self):
+        with self.lock:
+            self.commit()
+            if self.redo_history:
+                entry = self.redo_history.pop()
+                self.history.append(entry)
+                self._apply(entry, undo=False)
+
+    def reset(self):
+        # Открыт другой документ: прежние шаги к нему не относятся
+        with self.lock:
+            self.history = []
+            self.redo_history = []
+            self.used_bytes = 0
+            if self.scratch is not None:
+                self.scratch.clear()
+            for layer in self.pending[0]:
+                layer.end_journal()
+            self._begin()
+
+    def memory_report(self):
+        with self.lock:
+            entries = self.history + self.redo_history
+            return {
+                "entries": len(entries),
+                "hot_bytes": sum(entry.hot_bytes for entry in entries),
+                "compressed_bytes": sum(entry.compressed_bytes for entry in entries),
+                "spilled_bytes": sum(entry.spilled_bytes for entry in entries),
+                "scratch_file_bytes": self.scratch.size if self.scratch else 0,
+            }
+
+    def compact(self):
+        # Сжимает шаги старше hot_entries и выгружает лишнее в файл подкачки.
+        # Сжатие идёт без блокировки: тайлы в истории никогда не меняются на месте
+        with self.lock:
+            old_entries = self.history[:max(len(self.history) - self.hot_entries, 0)]
+            candidates = [(entry, self._live_tiles(entry)) for entry in old_entries if entry.state == "hot"]
+
+        for entry, live in candidates:
+            packed = self._pack(entry, live)
+            with self.lock:
+                if entry.state != "hot" or all(entry is not kept for kept in self.history):
+                    continue
+                for _, changes in entry.tile_changes:
+                    for key, (old_tile, new_tile) in changes.items():
+                        changes[key] = (packed.get(id(old_tile), old_tile), packed.get(id(new_tile), new_tile))
+                self._recount(entry, "compressed")
+
+        with self.lock:
+            self._spill()
+
+    def _compact_loop(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            self.compact()
+
+    @staticmethod
+    def _live_tiles(entry):
+        # Тайл, который всё ещё стоит в слое, сжимать бесполезно: память он не освободит.
+        # Вызывается под блокировкой; непрочитанный слой не грузится — его тайлов в истории нет
+        live = set()
+        for layer, changes in entry.tile_changes:
+            if not layer.loaded:
+                continue
+            tiles = layer.tiles
+            for key, (_, new_tile) in changes.items():
+                if new_tile is not None and tiles.get(key) is new_tile:
+                    live.add(id(new_tile))
+        return live
+
+    def _pack(self, entry, live):
+        packed = {}
+        for tile in entry.tiles():
+            if tile is None or isinstance(tile, PackedTile) or id(tile) in live or id(tile) in packed:
+                continue
+            packed[id(tile)] = PackedTile(tile.size, zlib.compress(tile.tobytes(), 1))
+        return packed
+
+    def _spill(self):
+        compressed = sum(entry.compressed_bytes for entry in self.history)
+        for entry in self.history:
+            if compressed <= self.spill_bytes:
+                break
+            if entry.state != "compressed":
+                continue
+            if self.scratch is None:
+                self.scratch = ScratchFile()
+            for tile in entry.tiles():
+                if isinstance(tile, PackedTile) and tile.data is not None:
+                    tile.offset = self.scratch.write(tile.data)
+                    tile.data = None
+            compressed -= entry.compressed_bytes
+            self._recount(entry, "spilled")
+
+    def _unpack(self, entry):
+        if entry.state == "hot":
+            return
+        spilled = entry.spilled_bytes
+        unpacked = {}
+        for _, changes in entry.tile_changes:
+            for key, tiles in changes.items():
+                changes[key] = tuple(self._unpack_tile(tile, unpacked) for tile in tiles)
+        self._recount(entry, "hot")
+        self._release_scratch(spilled)
+
+    def _unpack_tile(self, tile, unpacked):
+        if not isinstance(tile, PackedTile):
+            return tile
+        if id(tile) not in unpacked:
+            data = tile.data if tile.data is not None else self.scratch.read(tile.offset, tile.length)
+            unpacked[id(tile)] = Image.frombytes("RGBA", tile.size, zlib.decompress(data))
+        return unpacked[id(tile)]
+
+    def _recount(self, entry, state):
+        self.used_bytes -= entry.nbytes
+        entry.state = state
+        entry.count_bytes()
+        self.used_bytes += entry.nbytes
+
+    def _forget(self, entry):
+        # entry уже убран из history и redo_history
+        self.used_bytes -= entry.nbytes
+        self._release_scratch(entry.spilled_bytes)
+
+    def _release_scratch(self, length):
+        # Данные шага в файле подкачки больше не нужны: файл очищается, если в нём ничего не осталось,
+        # и переписывается, если мёртвых байтов стало слишком много
+        scratch = self.scratch
+        if scratch is None or not length:
+            return
+        scratch.dead += length
+        if not any(item.state == "spilled" for item in self.history + self.redo_history):
+            scratch.clear()
+        elif scratch.dead > scratch.size * self.SCRATCH_DEAD_RATIO:
+            self._rewrite_scratch()
+
+    def _rewrite_scratch(self):
+        # Живые тайлы переносятся в новый файл подряд, смещения обновляются
+        fresh = ScratchFile()
+        moved = set()
+        for entry in self.history + self.redo_history:
+            if entry.state != "spilled":
+                continue
+            for tile in entry.tiles():
+                if isinstance(tile, PackedTile) and tile.data is None and id(tile) not in moved:
+                    moved.add(id(tile))
+                    tile.offset = fresh.write(self.scratch.read(tile.offset, tile.length))
+        self.scratch.close()
+        self.scratch = fresh
+
+    def _begin(self):
+        canvas_manager = self.canvas_manager
+        layers = list(canvas_manager.layers)
+        for layer in layers:
+            layer.begin_journal()
+        self.pending = (layers, (canvas_manager.width, canvas_manager.height), canvas_manager.origin,
+                        canvas_manager.active_layer_index, [layer.properties() for layer in layers])
+
+    def _finish(self):
+        layers_before, size_before, origin_before, active_before, properties_before = self.pending
+        self.pending = None
+        property_changes = [(layer, before, layer.properties())
+                            for layer, before in zip(layers_before, properties_before)
+                            if before != layer.properties()]
+
+        tile_changes = []
+        for layer in layers_before:
+            journal = layer.end_journal()
+            changes = {key: (old_tile, layer.tiles.get(key)) for key, old_tile in journal.items()
+                       if old_tile is not layer.tiles.get(key)}
+            if changes:
+                tile_changes.append((layer, changes))
+
+        canvas_manager = self.canvas_manager
+        layers_after = list(canvas_manager.layers)
+        size_after = (canvas_manager.width, canvas_manager.height)
+        origin_after = canvas_manager.origin
+        active_after = canvas_manager.active_layer_index
+        # Простое переключение активного слоя шагом отмены не считается
+        structure_changed = (size_before != size_after or origin_before != origin_after
+                             or not self._same_layers(layers_before, layers_after))
+        if not tile_changes and not structure_changed and not property_changes:
+            return None
+
+        return HistoryEntry(tile_changes, layers_before, layers_after, size_before, size_after,
+                            active_before, active_after, property_changes, origin_before, origin_after)
+
+    def _apply(self, entry, undo):
+        canvas_manager = self.canvas_manager
+        self._unpack(entry)
+        # Журналы закрыты, чтобы откат сам не попал в историю
+        for layer in self.pending[0]:
+            layer.end_journal()
+
+        damaged_keys = set()
+        for layer, changes in entry.tile_changes:
+            for key, (old_tile, new_tile) in changes.items():
+                layer.set_tile(key, old_tile if undo else new_tile)
+                damaged_keys.add(key)
+        for layer, before, after in entry.property_changes:
+            layer.set_properties(before if undo else after)
+
+        layers = entry.layers_before if undo else entry.layers_after
+        size = entry.size_before if undo else entry.size_after
+        origin = entry.origin_before if undo else entry.origin_after
+        active = entry.active_before if undo else entry.active_after
+        moved = entry.origin_before != entry.origin_after
+        if entry.size_before != entry.size_after or moved:
+            for layer in layers:
+                layer.width, layer.height = size
+                layer.origin = origin
+
+        if (moved or size != (canvas_manager.width, canvas_manager.height)
+                or not self._same_layers(layers, canvas_manager.layers)):
+            canvas_manager.restore_layers(layers, size, active)
+        elif entry.property_changes:
+            canvas_manager.invalidate_composite()
+            canvas_manager.update_canvas()
+        else:
+            canvas_manager.invalidate_composite(damaged_keys)
+            for key in damaged_keys:
+                canvas_manager.update_canvas(layers[0].tile_box(key))
+        self._begin()
+
+    @staticmethod
+    def _same_layers(first, second):
+        return len(first) == len(second) and all(a is b for a, b in zip(first, second))
 
-            self.canvas_manager.update_draw()
-            self.canvas_manager.update_canvas()
+    def _evict(self):
+        # Самые старые шаги вытесняются, пока история не уложится в бюджет
+        while self.used_bytes > self.max_bytes and len(self.history) > 1:
+            self._forget(self.history.pop(0))
@@ -0,0 +1,161 @@
+import math
+import os
+import threading
+
+from PIL import Image
+
+from TiledLayer import TiledLayer
+
+
+class ImportJob:
+    # Одно открытие файла: слой, в который придут пиксели, и результат потока декодирования
+    def __init__(self, path, layer, as_layer, levels):
+        self.path = path
+        self.layer = layer
+        self.as_layer = as_layer
+        # Сетка и размер слоя на момент открытия: по ним поток режет тайлы
+        self.origin = layer.origin
+        self.size = layer.size
+        # До какого уровня мипмапа считать пирамиду (0 — не нужна)
+        self.levels = levels
+        self.tiles = None
+        self.mipmaps = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class ImageImporter:
+    # Открывает PNG/JPEG/BMP новым документом или новым слоем. Большой файл сначала показывается
+    # превью: JPEG декодируется сразу в уменьшенном размере (Image.draft), и им заполняется уровень
+    # мипмапа для масштаба «по окну». Полное изображение декодируется в фоновом потоке, там же
+    # режется на тайлы слоя и уменьшается в пирамиду, а в поток Tk попадают готовые тайлы.
+    # Пока слой загружается, рисовать в нём нельзя (is_loading)
+    POLL_MS = 50
+    # Изображения меньше этого числа пикселей открываются сразу, без превью и фона
+    BACKGROUND_PIXELS = 4_000_000
+
+    def __init__(self, canvas_manager, on_done=None):
+        self.canvas_manager = canvas_manager
+        # on_done(job) вызывается в потоке Tk, когда изображение загружено или не открылось
+        self.on_done = on_done
+        self.jobs = []
+        self.after_id = None
+
+    def is_loading(self, layer):
+        return any(job.layer is layer for job in self.jobs)
+
+    def open(self, path, as_layer=False):
+        canvas_manager = self.canvas_manager
+        image = Image.open(path)
+        name = os.path.splitext(os.path.basename(path))[0]
+        width, height = image.size
+
+        if as_layer:
+            canvas_manager.add_layer()
+            layer = canvas_manager.layers[canvas_manager.active_layer_index]
+            layer.name = name
+            zoom, levels = canvas_manager.zoom, 0
+        else:
+            layer = TiledLayer(width, height, canvas_manager.bg_color, name=name)
+            canvas_manager.restore_layers([layer], (width, height), 0)
+            # Новый документ открывается целиком в окне; пирамиду до этого масштаба считает поток импорта
+            zoom = canvas_manager.fit_zoom()
+            levels = round(math.log2(1 / zoom)) if canvas_manager.canvas is not None else 0
+
+        job = ImportJob(path, layer, as_layer, levels)
+        background = canvas_manager.canvas is not None and width * height > self.BACKGROUND_PIXELS
+        if not background:
+            image.close()
+            self._decode(job)
+            self._apply(job)
+            canvas_manager.set_zoom(zoom, 0, 0)
+            return job
+
+        if levels:
+            # До конца декодирования окно показывает превью, а не сводит пустые тайлы
+            self._show_preview(image, levels)
+            canvas_manager.set_zoom(zoom, 0, 0)
+        image.close()
+        self.jobs.append(job)
+        threading.Thread(target=self._decode, args=(job,), name="image-import", daemon=True).start()
+        self._poll()
+        return job
+
+    def _show_preview(self, image, level):
+        # JPEG умеет декодироваться сразу в 1/2, 1/4 или 1/8 размера — это доли секунды даже для 50 Мп.
+        # Остальные форматы так не умеют: до загрузки вместо превью заливка фоном
+        canvas_manager = self.canvas_manager
+        size = canvas_manager._level_size(level)
+        preview = Image.new("RGBA", size, canvas_manager.bg_color)
+        if image.format == "JPEG":
+            image.draft("RGB", size)
+            decoded = image.convert("RGBA")
+            preview = Image.new("RGBA", decoded.size, canvas_manager.bg_color)
+            preview.alpha_composite(decoded)
+        canvas_manager.seed_mipmaps({level: preview})
+
+    def _decode(self, job):
+        # Работает в фоновом потоке: общего состояния не трогает, только заполняет job
+        try:
+            with Image.open(job.path) as image:
+                has_alpha = "A" in image.getbands() or "transparency" in image.info
+                image = image.convert("RGBA")
+
+            if job.levels:
+                if has_alpha:
+                    reduced = Image.new("RGBA", image.size, self.canvas_manager.bg_color)
+                    reduced.alpha_composite(image)
+                    reduced = reduced.convert("RGB")
+                else:
+                    reduced = image.convert("RGB")
+                job.mipmaps = {}
+                for level in range(1, job.levels + 1):
+                    reduced = reduced.reduce(2)
+                    job.mipmaps[level] = reduced
+
+            # Тайлы режутся по сетке слоя, в который их потом поставят
+            tiled = TiledLayer(*job.size, job.layer.fill, job.layer.tile_size)
+            tiled.origin = job.origin
+            tiled.paste(image)
+            job.tiles = tiled.tiles
+        except Exception as error:
+            job.error = error
+        job.done.set()
+
+    def _poll(self):
+        self.after_id = None
+        for job in [job for job in self.jobs if job.done.is_set()]:
+            self.jobs.remove(job)
+            self._apply(job)
+        if self.jobs:
+            self.after_id = self.canvas_manager.canvas.after(self.POLL_MS, self._poll)
+
+    def _apply(self, job):
+        canvas_manager = self.canvas_manager
+        if job.error is not None:
+            if self.on_done is None:
+                raise job.error
+            self.on_done(job)
+            return
+
+        layer = job.layer
+        if (layer.origin, layer.size) != (job.origin, job.size):
+            # Холст изменили, пока файл декодировался: тайлы сдвигаются и обрезаются так же, как слой
+            tiled = TiledLayer(*job.size, layer.fill, layer.tile_size)
+            tiled.origin = job.origin
+            tiled.tiles = job.tiles
+            tiled.resize(layer.width, layer.height,
+                         layer.origin[0] - job.origin[0], layer.origin[1] - job.origin[1])
+            job.tiles = tiled.tiles
+        layer.adopt_tiles(job.tiles)
+        job.tiles = None
+        canvas_manager.invalidate_composite()
+        if job.mipmaps and canvas_manager.layers == [job.layer]:
+            # Пирамида уже посчитана в фоне: перерисовываются только видимые плитки
+            canvas_manager.mipmaps = {}
+            canvas_manager.seed_mipmaps(job.mipmaps)
+            job.mipmaps = None
+        else:
+            canvas_manager.update_canvas()
+        if self.on_done is not None:
+            self.on_done(job)
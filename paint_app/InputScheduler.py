@@ -0,0 +1,46 @@
+import time
+
+
+class InputScheduler:
+    # Копит точки <B1-Motion> и применяет их пачкой не чаще раза за кадр:
+    # каждая точка по-прежнему рисуется отдельным отрезком, а холст перерисовывается один раз
+    def __init__(self, root, canvas_manager, handler, fps=60):
+        self.root = root
+        self.canvas_manager = canvas_manager
+        self.handler = handler
+        self.points = []
+        self.after_id = None
+        self.last_flush = 0.0
+        self.frame_interval = 1.0 / 60
+        self.set_fps(fps)
+
+    def set_fps(self, fps):
+        self.frame_interval = 1.0 / max(1, fps)
+
+    def add_motion(self, x, y):
+        self.points.append((x, y))
+        if self.after_id is not None:
+            return
+
+        wait = self.last_flush + self.frame_interval - time.perf_counter()
+        if wait <= 0:
+            # Прошлый кадр был давно — рисуем сразу, без лишней задержки
+            self.flush()
+        else:
+            self.after_id = self.root.after(max(1, int(wait * 1000)), self.flush)
+
+    def flush(self):
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+        self.last_flush = time.perf_counter()
+        if not self.points:
+            return
+
+        points, self.points = self.points, []
+        self.canvas_manager.begin_batch()
+        try:
+            for x, y in points:
+                self.handler(x, y)
+        finally:
+            self.canvas_manager.end_batch()
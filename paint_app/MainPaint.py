@@ -1,14 +1,27 @@
 from tkinter import filedialog, colorchooser, messagebox, simpledialog
-from PIL import Image, ImageDraw
 from CanvasManager import CanvasManager
 from SelectionManager import SelectionManager
 from DrawingTools import DrawingTools
 from HistoryManager import HistoryManager
+from InputScheduler import InputScheduler
 from MenuBuilder import MenuBuilder
+from OperationLog import OperationLog
+from ExportWorker import ExportWorker
+from FilterEngine import gaussian_kernel
+from FilterExecutor import FilterExecutor
+from ImageImporter import ImageImporter
+from ProjectFile import ProjectFile
+from Profiler import Profiler
 
 
 class MainPaint:
-    def __init__(self, root):
+    # До скольких пикселей фильтр из меню считается сразу в потоке Tk (примерно полсекунды);
+    # области больше уходят в пул процессов с ходом работы и отменой. Гауссово размытие
+    # дорожает с длиной ядра, поэтому для него это пиксели, умноженные на длину ядра
+    # (при sigma 3 ядро из 19 отсчётов — тот же миллион пикселей)
+    FILTER_SYNC_PIXELS = {"grayscale": 20_000_000, "sharpen": 2_000_000, "gauss": 19_000_000}
+
+    def __init__(self, root, fps=60):
         self.menu_builder = None
         self.menu = None
         self.root = root
@@ -18,8 +31,33 @@ class MainPaint:
         self.drawing_tools = DrawingTools(self.canvas_manager)
         self.selection_manager = SelectionManager(self.canvas_manager, self.drawing_tools)
         self.history_manager = HistoryManager(self.canvas_manager)
+        self.input_scheduler = InputScheduler(root, self.canvas_manager, lambda x, y: self.apply_drag(x, y), fps)
+        # Все действия пишутся в журнал, чтобы сеанс можно было воспроизвести (main.py --replay)
+        self.operation_log = OperationLog(self.canvas_manager.width, self.canvas_manager.height, "white")
+        self.drawing_tools.operation_log = self.operation_log
 
         self.clipboard = None
+        self.pan_start = (0, 0)
+        self.export_worker = ExportWorker()
+        self.export_jobs = []
+        self.export_after_id = None
+        # Фильтры на больших областях считаются в пуле процессов; Esc отменяет их
+        self.filter_executor = FilterExecutor()
+        # (задание, слой, сетка, размер и тайлы слоя на момент запуска)
+        self.filter_jobs = []
+        self.filter_after_id = None
+        # Файл проекта, с которым связан документ: «Сохранить проект» дописывает в него изменения
+        self.project = None
+        # Большие изображения открываются с превью и догружаются в фоне
+        self.image_importer = ImageImporter(self.canvas_manager, self.on_image_loaded)
+        # Нажатие пришлось на ещё загружающийся слой: весь штрих до отпускания пропускается
+        self.stroke_blocked = False
+        # Кнопка мыши нажата: результат фильтра ждёт отпускания, чтобы не разрезать шаг отмены жеста
+        self.gesture_active = False
+        self.profiler = Profiler()
+        self.profiler_overlay = False
+        self.overlay_after_id = None
+        self.setup_profiler()
 
         self.setup_menu()
         self.setup_bindings()
@@ -29,57 +67,337 @@ class MainPaint:
         self.menu = self.menu_builder.build_main_menu()
 
     def setup_bindings(self):
-        self.canvas_manager.canvas.bind("<Button-1>", self.on_button_press)
-        self.canvas_manager.canvas.bind("<B1-Motion>", self.on_mouse_drag)
-        self.canvas_manager.canvas.bind("<ButtonRelease-1>", self.on_button_release)
+        # Обработчики ищутся при каждом событии, чтобы профайлер мог подменить их на время замеров
+        self.canvas_manager.canvas.bind("<Button-1>", lambda e: self.on_button_press(e))
+        self.canvas_manager.canvas.bind("<B1-Motion>", lambda e: self.on_mouse_drag(e))
+        self.canvas_manager.canvas.bind("<ButtonRelease-1>", lambda e: self.on_button_release(e))
+        # Средняя кнопка двигает окно просмотра, колесо прокручивает, Ctrl+колесо меняет масштаб
+        self.canvas_manager.canvas.bind("<ButtonPress-2>", lambda e: self.start_pan(e))
+        self.canvas_manager.canvas.bind("<B2-Motion>", lambda e: self.pan_view(e))
+        self.canvas_manager.canvas.bind("<MouseWheel>", lambda e: self.on_wheel(e, e.delta))
+        self.canvas_manager.canvas.bind("<Button-4>", lambda e: self.on_wheel(e, 120))
+        self.canvas_manager.canvas.bind("<Button-5>", lambda e: self.on_wheel(e, -120))
+        self.root.bind("<Control-equal>", lambda e: self.zoom_view(1))
+        self.root.bind("<Control-plus>", lambda e: self.zoom_view(1))
+        self.root.bind("<Control-minus>", lambda e: self.zoom_view(-1))
+        self.root.bind("<Control-0>", lambda e: self.zoom_view(0))
         self.root.bind("<Control-z>", self.undo)
+        self.root.bind("<Control-y>", self.redo)
         self.root.bind("<Control-s>", self.save_image)
+        self.root.bind("<Control-o>", lambda e: self.open_project())
         self.root.bind("<Control-x>", lambda e: self.cut_selection())
+        self.root.bind("<Escape>", lambda e: self.cancel_filters())
         self.root.bind("<Button-1>", self.handle_global_click, add="+")
 
+    def setup_profiler(self):
+        profiler = self.profiler
+        profiler.add_target(self, "on_button_press", "event.press")
+        profiler.add_target(self.input_scheduler, "add_motion", "event.motion")
+        profiler.add_target(self, "apply_drag", "event.drag")
+        profiler.add_target(self, "on_button_release", "event.release")
+        profiler.add_target(self.input_scheduler, "flush", Profiler.FRAME_STAGE)
+        for method_name in ["on_button_press", "on_mouse_drag", "on_button_release"]:
+            profiler.add_target(self.drawing_tools, method_name, lambda tools: "tool." + tools.current_tool)
+        profiler.add_target(self.selection_manager, "update_selection", "tool.selection")
+        profiler.add_target(self.canvas_manager, "update_canvas", "canvas.update")
+        profiler.add_target(self.canvas_manager, "_render_tile", "canvas.render_tile")
+        profiler.add_target(self.canvas_manager, "_composite_region", "canvas.composite")
+        profiler.add_target(self.canvas_manager, "_show_tile", "canvas.photo")
+        profiler.add_target(self.history_manager, "commit", "history.commit")
+
+    def toggle_profiler(self, enabled):
+        if enabled:
+            self.profiler.reset()
+            self.profiler.enable(self.root)
+            self.update_profiler_overlay()
+        else:
+            self.profiler.disable()
+            self.canvas_manager.overlay.hide("profiler")
+
+    def toggle_profiler_overlay(self, visible):
+        self.profiler_overlay = visible
+        self.canvas_manager.overlay.hide("profiler")
+        self.update_profiler_overlay()
+
+    def update_profiler_overlay(self):
+        # Пока профайлер включён, оверлей обновляется четыре раза в секунду
+        if self.overlay_after_id is not None:
+            self.root.after_cancel(self.overlay_after_id)
+            self.overlay_after_id = None
+        if not self.profiler.enabled or not self.profiler_overlay:
+            return
+        summary = self.profiler.frame_summary()
+        text = (f"кадр {summary['frame_ms']:.1f} мс (p95 {summary['frame_p95_ms']:.1f})\n"
+                f"событий/с {summary['events_per_second']:.0f}")
+        # Счётчик стоит в углу окна, а не документа: прокрутка и масштаб его не уводят
+        self.canvas_manager.overlay.show("profiler", "text", (8, 8), fixed=True, text=text, anchor="nw",
+                                         fill="red", font=("Courier", 10))
+        self.overlay_after_id = self.root.after(250, self.update_profiler_overlay)
+
+    def save_profile(self):
+        file_path = filedialog.asksaveasfilename(defaultextension='.json', filetypes=[("JSON", "*.json")])
+        if file_path:
+            self.profiler.dump(file_path)
+
     def handle_global_click(self, event):
         if (self.drawing_tools.current_tool == "text" and
                 self.drawing_tools.text_entry and
                 not self.drawing_tools.text_entry.winfo_containing(event.x_root, event.y_root)):
             self.drawing_tools.finish_text_input()
 
+    def start_pan(self, event):
+        self.pan_start = (event.x, event.y)
+
+    def pan_view(self, event):
+        x, y = self.pan_start
+        self.pan_start = (event.x, event.y)
+        self.canvas_manager.pan(x - event.x, y - event.y)
+
+    def on_wheel(self, event, delta):
+        if event.state & 0x4:
+            self.canvas_manager.zoom_step(1 if delta > 0 else -1, event.x, event.y)
+            return
+        step = -60 if delta > 0 else 60
+        if event.state & 0x1:
+            self.canvas_manager.pan(step, 0)
+        else:
+            self.canvas_manager.pan(0, step)
+
+    def zoom_view(self, step):
+        # step 0 — вернуть масштаб 1:1
+        if step == 0:
+            self.canvas_manager.set_zoom(1)
+        else:
+            self.canvas_manager.zoom_step(step)
+
     def on_button_press(self, event):
+        self.input_scheduler.flush()
+        self.gesture_active = True
+        active_layer = self.canvas_manager.layers[self.canvas_manager.active_layer_index]
+        self.stroke_blocked = self.layer_busy(active_layer)
+        if self.stroke_blocked:
+            return
+        x, y = self.canvas_manager.to_image(event.x, event.y)
+        self.operation_log.record("press", x, y)
         self.history_manager.save_state()
 
         if self.drawing_tools.current_tool == "selection":
-            if self.selection_manager.rect and self.selection_manager.point_in_selection(event.x, event.y):
-                self.selection_manager.start_dragging(event.x, event.y)
+            if self.selection_manager.rect and self.selection_manager.point_in_selection(x, y):
+                self.selection_manager.start_dragging(x, y)
             else:
-                self.selection_manager.start_selection(event.x, event.y)
+                self.selection_manager.start_selection(x, y)
         else:
-            self.drawing_tools.on_button_press(event.x, event.y)
+            self.drawing_tools.on_button_press(x, y)
 
     def on_mouse_drag(self, event):
+        if self.stroke_blocked:
+            return
+        # Точки переводятся в координаты изображения сразу: масштаб может смениться до кадра
+        self.input_scheduler.add_motion(*self.canvas_manager.to_image(event.x, event.y))
+
+    def apply_drag(self, x, y):
+        # В журнал попадают движения уже после объединения по кадрам — ровно те, что изменили холст
+        self.operation_log.record("drag", x, y)
         if self.drawing_tools.current_tool == "selection":
-            self.selection_manager.update_selection(event.x, event.y)
+            self.selection_manager.update_selection(x, y)
         else:
-            self.drawing_tools.on_mouse_drag(event.x, event.y)
+            self.drawing_tools.on_mouse_drag(x, y)
 
     def on_button_release(self, event):
+        self.input_scheduler.flush()
+        self.gesture_active = False
+        if self.stroke_blocked:
+            self.stroke_blocked = False
+            return
+        x, y = self.canvas_manager.to_image(event.x, event.y)
+        self.operation_log.record("release", x, y)
         if self.drawing_tools.current_tool == "selection":
-            self.selection_manager.end_selection(event.x, event.y)
+            self.selection_manager.end_selection(x, y)
         else:
-            self.drawing_tools.on_button_release(event.x, event.y)
+            self.drawing_tools.on_button_release(x, y)
+        self.history_manager.commit()
 
     def save_image(self, event=None):
         file_path = filedialog.asksaveasfilename(
             defaultextension='.png',
             filetypes=[("PNG files", "*.png"), ("JPEG files", "*.jpg"), ("BMP files", "*.bmp")])
         if file_path:
-            composited = self.canvas_manager.get_composited_image()
-            composited.save(file_path)
-            messagebox.showinfo("Сохранение...", "Сохранено!")
+            # Сведение и кодирование идут в фоне; рисовать можно, не дожидаясь конца
+            self.export_jobs.append(self.export_worker.submit(self.canvas_manager.snapshot(), file_path))
+            self.watch_export()
+
+    def open_project(self):
+        file_path = filedialog.askopenfilename(filetypes=[("Проект", "*.paint")])
+        if not file_path:
+            return
+        self.input_scheduler.flush()
+        self.selection_manager.cancel_selection()
+        try:
+            self.project = ProjectFile.open(file_path, self.canvas_manager)
+        except (OSError, ValueError) as error:
+            messagebox.showerror("Открытие проекта", str(error))
+            return
+        self.operation_log.record("open_project", file_path)
+        self.history_manager.reset()
+        self.menu_builder.refresh_layers()
+
+    def open_image(self, as_layer=False):
+        file_path = filedialog.askopenfilename(
+            filetypes=[("Изображения", "*.png *.jpg *.jpeg *.bmp"), ("Все файлы", "*.*")])
+        if not file_path:
+            return
+        self.input_scheduler.flush()
+        self.selection_manager.cancel_selection()
+        # Новым слоем — обычный шаг отмены; новым документом — история начинается заново
+        if as_layer:
+            self.history_manager.save_state()
+        try:
+            self.image_importer.open(file_path, as_layer)
+        except (OSError, ValueError) as error:
+            self.history_manager.commit()
+            messagebox.showerror("Открытие изображения", str(error))
+            return
+        self.operation_log.record("import", file_path, as_layer)
+        if as_layer:
+            self.history_manager.commit()
+        else:
+            self.project = None
+            self.history_manager.reset()
+        self.menu_builder.refresh_layers()
+
+    def on_image_loaded(self, job):
+        if job.error is not None:
+            messagebox.showerror("Открытие изображения", f"Не удалось открыть {job.path}: {job.error}")
+
+    def save_project(self):
+        if self.project is None:
+            self.save_project_as()
+            return
+        try:
+            self.project.save(self.canvas_manager)
+        except OSError as error:
+            messagebox.showerror("Сохранение проекта", str(error))
+
+    def save_project_as(self):
+        file_path = filedialog.asksaveasfilename(defaultextension='.paint', filetypes=[("Проект", "*.paint")])
+        if file_path:
+            self.project = ProjectFile(file_path)
+            self.save_project()
+
+    def watch_export(self):
+        # Ход сохранения — в заголовке окна; задания проверяются из потока Tk
+        if self.export_after_id is not None:
+            self.root.after_cancel(self.export_after_id)
+            self.export_after_id = None
+
+        finished = [job for job in self.export_jobs if not job.active]
+        self.export_jobs = [job for job in self.export_jobs if job.active]
+        if self.export_jobs:
+            progress = min(job.progress for job in self.export_jobs)
+            self.root.title(f"Графический редактор — сохранение {progress * 100:.0f}%")
+            self.export_after_id = self.root.after(100, self.watch_export)
+        else:
+            self.root.title("Графический редактор")
+
+        for job in finished:
+            if job.state == "done":
+                messagebox.showinfo("Сохранение...", f"Сохранено: {job.path}")
+            elif job.state == "failed":
+                messagebox.showerror("Сохранение...", f"Не удалось сохранить {job.path}: {job.error}")
+
+    def layer_busy(self, layer):
+        # Слой ещё загружается или под фильтром: рисование в нём пропало бы при вклейке результата
+        return self.image_importer.is_loading(layer) or any(entry[1] is layer for entry in self.filter_jobs)
+
+    def background_busy(self):
+        # Отмена и повтор заменяют слои и их тайлы целиком: пока что-то считается в фоне, они ждут
+        return bool(self.filter_jobs or self.image_importer.jobs)
+
+    def apply_filter(self, name):
+        # Фильтр на выделение, а без него — на весь активный слой. Небольшие области считаются
+        # сразу одним проходом, большие — в пуле процессов (run_filter); в обоих случаях это один шаг отмены
+        self.input_scheduler.flush()
+        layer = self.canvas_manager.layers[self.canvas_manager.active_layer_index]
+        if self.layer_busy(layer):
+            return
+        self.selection_manager.drop_floating()
+        box = layer.clip(self.selection_manager.get_selection_area() or (0, 0, layer.width, layer.height))
+        if box is None:
+            return
+        params = self.drawing_tools.filter_params(name)
+        cost = (box[2] - box[0]) * (box[3] - box[1])
+        if name == "gauss":
+            cost *= len(gaussian_kernel(params["sigma"]))
+        if cost > self.FILTER_SYNC_PIXELS[name]:
+            self.run_filter(name, box, **params)
+            return
+        self.operation_log.record("filter", self.canvas_manager.active_layer_index, name, list(box), params)
+        self.history_manager.save_state()
+        self.drawing_tools.filter_area(name, box)
+        self.history_manager.commit()
+
+    def run_filter(self, name, box=None, **params):
+        # Фильтр активного слоя (box — вся область слоя по умолчанию) в фоне; результат вклеивается
+        # одним шагом отмены, когда все тайлы посчитаны
+        layer = self.canvas_manager.layers[self.canvas_manager.active_layer_index]
+        box = layer.clip(box or (0, 0, layer.width, layer.height))
+        if box is None or self.layer_busy(layer):
+            return None
+        job = self.filter_executor.submit(layer, name, params, box)
+        self.filter_jobs.append((job, layer, layer.origin, layer.size, dict(layer.tiles)))
+        self.watch_filters()
+        return job
+
+    def cancel_filters(self):
+        for job, *_ in self.filter_jobs:
+            job.cancel()
+
+    def watch_filters(self):
+        if self.filter_after_id is not None:
+            self.root.after_cancel(self.filter_after_id)
+            self.filter_after_id = None
+
+        # Посреди жеста результат не вклеивается: save_state разрезал бы его шаг отмены, а журнал
+        # записал бы фильтр между его событиями. Готовые задания ждут отпускания кнопки
+        finished = [] if self.gesture_active else [entry for entry in self.filter_jobs if not entry[0].active]
+        self.filter_jobs = [entry for entry in self.filter_jobs if entry[0].active or self.gesture_active]
+        if self.filter_jobs:
+            progress = min(entry[0].progress for entry in self.filter_jobs)
+            self.root.title(f"Графический редактор — фильтр {progress * 100:.0f}% (Esc — отменить)")
+            self.filter_after_id = self.root.after(100, self.watch_filters)
+        else:
+            self.root.title("Графический редактор")
+
+        for job, layer, origin, size, tiles in finished:
+            if job.state == "failed":
+                messagebox.showerror("Фильтр", f"Не удалось применить фильтр: {job.error}")
+            # Слой удалён или холст изменён, пока фильтр считался: результат уже некуда вклеить
+            if job.state != "done" or layer not in self.canvas_manager.layers:
+                continue
+            if (layer.origin, layer.size) != (origin, size):
+                continue
+            # Тайлы слоя общие с копией фильтра, и любая правка заменила бы хоть один из них.
+            # Результат посчитан от прежних пикселей и вклеился бы поверх правки
+            if len(layer.tiles) != len(tiles) or any(layer.tiles.get(key) is not tile for key, tile in tiles.items()):
+                continue
+            # Вклейка в журнале — там же, где в окне: воспроизведение считает фильтр от тех же пикселей
+            self.operation_log.record("filter", self.canvas_manager.layers.index(layer), job.name, list(job.box),
+                                      job.params)
+            self.selection_manager.drop_floating()
+            self.history_manager.save_state()
+            layer.paste(job.result, job.box[:2])
+            self.canvas_manager.invalidate_composite(set(layer.tile_keys(job.box)))
+            self.canvas_manager.update_canvas(job.box)
+            self.history_manager.commit()
 
     def change_canvas_size(self):
-        width = simpledialog.askinteger("Ширина холста", "Введите ширину", minvalue=100, maxvalue=2000)
-        height = simpledialog.askinteger("Высота холста", "Введите высоту", minvalue=100, maxvalue=2000)
+        width = simpledialog.askinteger("Ширина холста", "Введите ширину", minvalue=100, maxvalue=10000)
+        height = simpledialog.askinteger("Высота холста", "Введите высоту", minvalue=100, maxvalue=10000)
         if width and height:
+            self.operation_log.record("resize", width, height)
+            self.history_manager.save_state()
             self.canvas_manager.resize_canvas(width, height)
+            self.history_manager.commit()
 
     def choose_color(self):
         color = colorchooser.askcolor()[1]
@@ -91,33 +409,133 @@ class MainPaint:
         if size:
             self.drawing_tools.set_size(size)
 
+    def input_brush_option(self, option):
+        title, prompt, minimum, maximum = {
+            "hardness": ("Жёсткость кисти", "От 0 (мягкий край) до 1 (жёсткий)", 0.0, 1.0),
+            "spacing": ("Интервал отпечатков", "Доля размера кисти между отпечатками", 0.02, 2.0),
+            "opacity": ("Непрозрачность мазка", "От 0 до 1", 0.0, 1.0),
+        }[option]
+        value = simpledialog.askfloat(title, prompt, initialvalue=getattr(self.drawing_tools, "brush_" + option),
+                                      minvalue=minimum, maxvalue=maximum)
+        if value is not None:
+            self.drawing_tools.set_brush_options(**{option: value})
+
+    def input_blur_sigma(self):
+        sigma = simpledialog.askfloat("Сила размытия", "Sigma гауссова ядра, пикселей",
+                                      initialvalue=self.drawing_tools.blur_sigma, minvalue=0.3, maxvalue=50)
+        if sigma:
+            self.drawing_tools.set_blur_sigma(sigma)
+
+    def input_fill_tolerance(self):
+        tolerance = simpledialog.askinteger("Допуск заливки", "Отличие по каналу (0-255)",
+                                            initialvalue=self.drawing_tools.fill_tolerance,
+                                            minvalue=0, maxvalue=255)
+        if tolerance is not None:
+            self.drawing_tools.set_fill_options(tolerance=tolerance)
+
     def fill_selection(self):
-        if self.selection_manager.rect:
+        layer = self.canvas_manager.layers[self.canvas_manager.active_layer_index]
+        if self.selection_manager.rect and not self.layer_busy(layer):
+            color = self.drawing_tools.current_color
+            self.operation_log.record("fill_selection", color)
             self.history_manager.save_state()
-            x1, y1, x2, y2 = self.selection_manager.get_selection_area()
-            temp_image = Image.new("RGBA", (abs(x2 - x1), abs(y2 - y1)), self.drawing_tools.current_color)
-            layer = self.canvas_manager.layers[self.canvas_manager.active_layer_index]
-            layer.paste(temp_image, (min(x1, x2), min(y1, y2)))
-            self.canvas_manager.update_draw()
-            self.canvas_manager.update_canvas()
-            self.selection_manager.cancel_selection()
+            self.selection_manager.fill_selection(color)
+            self.history_manager.commit()
 
     def cut_selection(self):
-        if self.selection_manager.rect:
+        layer = self.canvas_manager.layers[self.canvas_manager.active_layer_index]
+        if self.selection_manager.rect and not self.layer_busy(layer):
+            self.operation_log.record("cut_selection")
             self.history_manager.save_state()
-            x1, y1, x2, y2 = self.selection_manager.get_selection_area()
-            layer = self.canvas_manager.layers[self.canvas_manager.active_layer_index]
-            self.clipboard = layer.crop((x1, y1, x2, y2))
-            draw = ImageDraw.Draw(layer)
-            draw.rectangle([x1, y1, x2, y2],
-                           fill=self.canvas_manager.bg_color,
-                           outline=self.canvas_manager.bg_color)
-            self.canvas_manager.update_draw()
-            self.canvas_manager.update_canvas()
-            self.selection_manager.cancel_selection()
+            self.clipboard = self.selection_manager.cut_selection()
+            self.history_manager.commit()
+
+    def crop_to_selection(self):
+        # Холст обрезается по рамке выделения; пиксели не копируются, сдвигается только сетка тайлов
+        area = self.selection_manager.get_selection_area()
+        box = area and self.canvas_manager.clip_box(area)
+        if not box:
+            return
+        self.cancel_selection()
+        left, upper, right, lower = box
+        self.operation_log.record("resize", right - left, lower - upper, -left, -upper)
+        self.history_manager.save_state()
+        self.canvas_manager.resize_canvas(right - left, lower - upper, -left, -upper)
+        self.history_manager.commit()
+
+    def cancel_selection(self):
+        self.operation_log.record("cancel_selection")
+        self.selection_manager.cancel_selection()
+
+    def add_layer(self):
+        self.operation_log.record("layer_add")
+        self.history_manager.save_state()
+        self.canvas_manager.add_layer()
+        self.history_manager.commit()
+
+    def delete_layer(self):
+        index = self.canvas_manager.active_layer_index
+        self.operation_log.record("layer_delete", index)
+        self.history_manager.save_state()
+        self.canvas_manager.delete_layer(index)
+        self.history_manager.commit()
+
+    def switch_layer(self, index):
+        self.operation_log.record("layer_switch", index)
+        self.canvas_manager.switch_layer(index)
+        self.menu_builder.refresh_layers()
+
+    def set_layer_properties(self, **properties):
+        # Свойства активного слоя; изменение — отдельный шаг отмены
+        canvas_manager = self.canvas_manager
+        index = canvas_manager.active_layer_index
+        self.history_manager.save_state()
+        canvas_manager.set_layer_properties(index, **properties)
+        self.history_manager.commit()
+        self.operation_log.record("layer_properties", index, *canvas_manager.layers[index].properties())
+        self.menu_builder.refresh_layers()
+
+    def rename_layer(self):
+        layer = self.canvas_manager.layers[self.canvas_manager.active_layer_index]
+        name = simpledialog.askstring("Имя слоя", "Введите имя", initialvalue=layer.name)
+        if name:
+            self.set_layer_properties(name=name)
+
+    def input_layer_opacity(self):
+        layer = self.canvas_manager.layers[self.canvas_manager.active_layer_index]
+        percent = simpledialog.askinteger("Непрозрачность слоя", "От 0 до 100 %",
+                                          initialvalue=round(layer.opacity * 100), minvalue=0, maxvalue=100)
+        if percent is not None:
+            self.set_layer_properties(opacity=percent / 100)
 
     def undo(self, event=None):
+        if self.background_busy():
+            return
+        self.operation_log.record("undo")
         self.history_manager.undo()
+        self.menu_builder.refresh_layers()
+
+    def redo(self, event=None):
+        if self.background_busy():
+            return
+        self.operation_log.record("redo")
+        self.history_manager.redo()
+        self.menu_builder.refresh_layers()
+
+    def save_operation_log(self):
+        file_path = filedialog.asksaveasfilename(
+            defaultextension='.jsonl', filetypes=[("Журнал действий", "*.jsonl")])
+        if file_path:
+            self.operation_log.save(file_path)
+
+    def show_history_memory(self):
+        report = self.history_manager.memory_report()
+        megabyte = 1024 * 1024
+        messagebox.showinfo("Память истории", (
+            f"Шагов: {report['entries']}\n"
+            f"В памяти: {report['hot_bytes'] / megabyte:.1f} МБ\n"
+            f"Сжато: {report['compressed_bytes'] / megabyte:.1f} МБ\n"
+            f"В файле подкачки: {report['spilled_bytes'] / megabyte:.1f} МБ"))
 
     def add_text(self):
         self.drawing_tools.set_tool("text")
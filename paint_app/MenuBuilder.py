@@ -1,4 +1,14 @@
 import tkinter as tk
+from BlendEngine import BLEND_MODES
+
+# Подписи режимов в меню; режим из BlendEngine без подписи показывается под своим именем
+BLEND_MODE_LABELS = {
+    "normal": "Обычный",
+    "multiply": "Умножение",
+    "screen": "Экран",
+    "overlay": "Перекрытие",
+    "add": "Сложение",
+}
 
 
 class MenuBuilder:
@@ -7,11 +17,14 @@ class MenuBuilder:
         self.app = app
         self.layer_menu = None
         self.select_submenu = None
+        self.layer_visible = None
+        self.layer_blend_mode = None
 
     def build_main_menu(self):
         menu = tk.Menu(self.root)
         self.root.config(menu=menu)
         self._setup_file_menu(menu)
+        self._setup_edit_menu(menu)
         self._setup_selection_menu(menu)
         self._setup_size_menu(menu)
         self._setup_tools_menu(menu)
@@ -19,18 +32,35 @@ class MenuBuilder:
         self._setup_geometry_menu(menu)
         self._setup_text_menu(menu)
         self._setup_layer_menu(menu)
+        self._setup_view_menu(menu)
+        self._setup_debug_menu(menu)
 
         return menu
 
     def _setup_file_menu(self, menu):
         file_menu = tk.Menu(menu, tearoff=0)
         menu.add_cascade(label="Файл", menu=file_menu)
-        file_menu.add_command(label="Сохранить как...", command=self.app.save_image)
+        file_menu.add_command(label="Открыть изображение...", command=self.app.open_image)
+        file_menu.add_command(label="Импортировать как слой...", command=lambda: self.app.open_image(as_layer=True))
+        file_menu.add_command(label="Открыть проект...", accelerator="Ctrl+O", command=self.app.open_project)
+        file_menu.add_command(label="Сохранить проект", command=self.app.save_project)
+        file_menu.add_command(label="Сохранить проект как...", command=self.app.save_project_as)
+        file_menu.add_separator()
+        file_menu.add_command(label="Сохранить как...", accelerator="Ctrl+S", command=self.app.save_image)
+        file_menu.add_command(label="Сохранить журнал действий...", command=self.app.save_operation_log)
         file_menu.add_separator()
         file_menu.add_command(label="Размер холста", command=self.app.change_canvas_size)
         file_menu.add_separator()
         file_menu.add_command(label="Закрыть", command=self.app.root.quit)
 
+    def _setup_edit_menu(self, menu):
+        edit_menu = tk.Menu(menu, tearoff=0)
+        menu.add_cascade(label="Правка", menu=edit_menu)
+        edit_menu.add_command(label="Отменить", accelerator="Ctrl+Z", command=self.app.undo)
+        edit_menu.add_command(label="Повторить", accelerator="Ctrl+Y", command=self.app.redo)
+        edit_menu.add_separator()
+        edit_menu.add_command(label="Память истории", command=self.app.show_history_memory)
+
     def _setup_selection_menu(self, menu):
         selection_menu = tk.Menu(menu, tearoff=0)
         menu.add_cascade(label="Выделить", menu=selection_menu)
@@ -38,7 +68,8 @@ class MenuBuilder:
                                    command=lambda: self.app.drawing_tools.set_tool("selection"))
         selection_menu.add_command(label="Залить выделение", command=self.app.fill_selection)
         selection_menu.add_command(label="Вырезать выделение", command=self.app.cut_selection)
-        selection_menu.add_command(label="Отменить выделение", command=self.app.selection_manager.cancel_selection)
+        selection_menu.add_command(label="Отменить выделение", command=self.app.cancel_selection)
+        selection_menu.add_command(label="Обрезать по выделению", command=self.app.crop_to_selection)
 
     def _setup_size_menu(self, menu):
         size_menu = tk.Menu(menu, tearoff=0)
@@ -52,16 +83,42 @@ class MenuBuilder:
         menu.add_cascade(label="Инструменты", menu=tools_menu)
         tools_menu.add_command(label="Кисть", command=lambda: self.app.drawing_tools.set_tool("brush"))
         tools_menu.add_command(label="Ластик", command=lambda: self.app.drawing_tools.set_tool("eraser"))
+
+        brush_menu = tk.Menu(tools_menu, tearoff=0)
+        brush_menu.add_command(label="Жёсткость...", command=lambda: self.app.input_brush_option("hardness"))
+        brush_menu.add_command(label="Интервал отпечатков...", command=lambda: self.app.input_brush_option("spacing"))
+        brush_menu.add_command(label="Непрозрачность...", command=lambda: self.app.input_brush_option("opacity"))
+        tools_menu.add_cascade(label="Параметры кисти", menu=brush_menu)
         tools_menu.add_command(label="Заливка", command=lambda: self.app.drawing_tools.set_tool("fill"))
 
+        fill_menu = tk.Menu(tools_menu, tearoff=0)
+        fill_contiguous = tk.BooleanVar(value=True)
+        fill_sample_merged = tk.BooleanVar(value=False)
+        fill_menu.add_command(label="Допуск...", command=self.app.input_fill_tolerance)
+        fill_menu.add_checkbutton(label="Только связная область", variable=fill_contiguous,
+                                  command=lambda: self.app.drawing_tools.set_fill_options(
+                                      contiguous=fill_contiguous.get()))
+        fill_menu.add_checkbutton(label="Образец со всех слоёв", variable=fill_sample_merged,
+                                  command=lambda: self.app.drawing_tools.set_fill_options(
+                                      sample_merged=fill_sample_merged.get()))
+        tools_menu.add_cascade(label="Параметры заливки", menu=fill_menu)
+
         tools_menu.add_separator()
         tools_menu.add_command(label="Черно-белый", command=lambda: self.app.drawing_tools.set_tool("grayscale"))
         tools_menu.add_command(label="Повысить резкость", command=lambda: self.app.drawing_tools.set_tool("sharpen"))
 
         blur_menu = tk.Menu(tools_menu, tearoff=0)
         blur_menu.add_command(label="Гауссово размытие", command=lambda: self.app.drawing_tools.set_tool("gauss"))
+        blur_menu.add_command(label="Сила размытия...", command=self.app.input_blur_sigma)
         tools_menu.add_cascade(label="Размытие", menu=blur_menu)
 
+        # Фильтры целиком: на выделение, а без него — на весь активный слой
+        filter_menu = tk.Menu(tools_menu, tearoff=0)
+        filter_menu.add_command(label="Черно-белый", command=lambda: self.app.apply_filter("grayscale"))
+        filter_menu.add_command(label="Повысить резкость", command=lambda: self.app.apply_filter("sharpen"))
+        filter_menu.add_command(label="Гауссово размытие", command=lambda: self.app.apply_filter("gauss"))
+        tools_menu.add_cascade(label="Применить к слою или выделению", menu=filter_menu)
+
     def _setup_color_menu(self, menu):
         colour_menu = tk.Menu(menu, tearoff=0)
         menu.add_cascade(label="Цвет", menu=colour_menu)
@@ -80,6 +137,24 @@ class MenuBuilder:
         menu.add_cascade(label="Текст", menu=text_menu)
         text_menu.add_command(label="Добавить текст", command=self.app.add_text)
 
+    def _setup_view_menu(self, menu):
+        view_menu = tk.Menu(menu, tearoff=0)
+        menu.add_cascade(label="Вид", menu=view_menu)
+        view_menu.add_command(label="Увеличить", accelerator="Ctrl++", command=lambda: self.app.zoom_view(1))
+        view_menu.add_command(label="Уменьшить", accelerator="Ctrl+-", command=lambda: self.app.zoom_view(-1))
+        view_menu.add_command(label="Масштаб 1:1", accelerator="Ctrl+0", command=lambda: self.app.zoom_view(0))
+
+    def _setup_debug_menu(self, menu):
+        debug_menu = tk.Menu(menu, tearoff=0)
+        menu.add_cascade(label="Отладка", menu=debug_menu)
+        profiling = tk.BooleanVar(value=False)
+        overlay = tk.BooleanVar(value=False)
+        debug_menu.add_checkbutton(label="Профилирование", variable=profiling,
+                                   command=lambda: self.app.toggle_profiler(profiling.get()))
+        debug_menu.add_checkbutton(label="Показывать время кадра", variable=overlay,
+                                   command=lambda: self.app.toggle_profiler_overlay(overlay.get()))
+        debug_menu.add_command(label="Сохранить профиль...", command=self.app.save_profile)
+
     def _setup_layer_menu(self, menu):
         # Если меню уже есть — удаляем, чтобы пересоздать
         if self.layer_menu is not None:
@@ -93,23 +168,48 @@ class MenuBuilder:
                                     command=self._delete_layer_and_refresh)
 
         self.select_submenu = tk.Menu(self.layer_menu, tearoff=0)
-        self._refresh_layer_selection_menu()
         self.layer_menu.add_cascade(label="Переключить слой", menu=self.select_submenu)
 
+        # Свойства активного слоя
+        self.layer_menu.add_separator()
+        self.layer_visible = tk.BooleanVar(value=True)
+        self.layer_blend_mode = tk.StringVar(value="normal")
+        self.layer_menu.add_command(label="Переименовать...", command=self.app.rename_layer)
+        self.layer_menu.add_checkbutton(label="Показывать слой", variable=self.layer_visible,
+                                        command=lambda: self.app.set_layer_properties(
+                                            visible=self.layer_visible.get()))
+        self.layer_menu.add_command(label="Непрозрачность...", command=self.app.input_layer_opacity)
+        blend_menu = tk.Menu(self.layer_menu, tearoff=0)
+        for mode in BLEND_MODES:
+            blend_menu.add_radiobutton(label=BLEND_MODE_LABELS.get(mode, mode), value=mode, variable=self.layer_blend_mode,
+                                       command=lambda m=mode: self.app.set_layer_properties(blend_mode=m))
+        self.layer_menu.add_cascade(label="Режим наложения", menu=blend_menu)
+        self._refresh_layer_selection_menu()
+
     def _refresh_layer_selection_menu(self):
+        canvas_manager = self.app.canvas_manager
         self.select_submenu.delete(0, tk.END)
-        for i in range(len(self.app.canvas_manager.layers)):
+        for i, layer in enumerate(canvas_manager.layers):
+            label = layer.name or f"Слой {i + 1}"
+            if not layer.visible:
+                label += " (скрыт)"
+            if i == canvas_manager.active_layer_index:
+                label = "• " + label
             self.select_submenu.add_command(
-                label=f"Слой {i + 1}",
-                command=lambda index=i: self.app.canvas_manager.switch_layer(index)
+                label=label,
+                command=lambda index=i: self.app.switch_layer(index)
             )
+        active_layer = canvas_manager.layers[canvas_manager.active_layer_index]
+        self.layer_visible.set(active_layer.visible)
+        self.layer_blend_mode.set(active_layer.blend_mode)
+
+    def refresh_layers(self):
+        self._refresh_layer_selection_menu()
 
     def _add_layer_and_refresh(self):
-        self.app.canvas_manager.add_layer()
+        self.app.add_layer()
         self._refresh_layer_selection_menu()
-        self.app.canvas_manager.update_canvas()
 
     def _delete_layer_and_refresh(self):
-        self.app.canvas_manager.delete_layer(self.app.canvas_manager.active_layer_index)
+        self.app.delete_layer()
         self._refresh_layer_selection_menu()
-        self.app.canvas_manager.update_canvas()
@@ -0,0 +1,173 @@
+import json
+
+from CanvasManager import CanvasManager
+from DrawingTools import DrawingTools
+from FilterExecutor import filter_region
+from HistoryManager import HistoryManager
+from ImageImporter import ImageImporter
+from ProjectFile import ProjectFile
+from SelectionManager import SelectionManager
+
+LOG_VERSION = 1
+
+
+class OperationLog:
+    # Журнал действий пользователя: по нему документ восстанавливается заново без снимков пикселей.
+    # Событие — список [вид, аргументы...]; в файле первая строка — заголовок, дальше по событию на строку
+    def __init__(self, width, height, bg_color="white"):
+        self.width = width
+        self.height = height
+        self.bg_color = bg_color
+        self.events = []
+
+    def record(self, kind, *args):
+        self.events.append([kind, *args])
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as file:
+            header = {"version": LOG_VERSION, "width": self.width, "height": self.height,
+                      "bg_color": self.bg_color}
+            file.write(json.dumps(header) + "\n")
+            for event in self.events:
+                file.write(json.dumps(event, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as file:
+            header = json.loads(file.readline())
+            if header.get("version") != LOG_VERSION:
+                raise ValueError(f"Неподдерживаемая версия журнала: {header.get('version')}")
+            bg_color = header["bg_color"]
+            log = cls(header["width"], header["height"], tuple(bg_color) if isinstance(bg_color, list) else bg_color)
+            log.events = [json.loads(line) for line in file if line.strip()]
+        return log
+
+
+class LogReplayer:
+    # Проигрывает журнал без окна и без пауз: события разбираются так же, как в MainPaint,
+    # поэтому при одинаковом журнале получается тот же документ и та же история
+    def __init__(self, log):
+        self.log = log
+        self.canvas_manager = CanvasManager(None, log.width, log.height, log.bg_color)
+        self.drawing_tools = DrawingTools(self.canvas_manager)
+        self.selection_manager = SelectionManager(self.canvas_manager, self.drawing_tools)
+        self.history_manager = HistoryManager(self.canvas_manager, background=False)
+        self.clipboard = None
+
+    def run(self, limit=None):
+        # limit — сколько событий проиграть (для поиска шага, на котором появляется ошибка)
+        for event in self.log.events[:limit]:
+            self.apply(event)
+        self.history_manager.commit()
+        return self.canvas_manager
+
+    def apply(self, event):
+        kind, args = event[0], event[1:]
+        tools = self.drawing_tools
+        selection = self.selection_manager
+        history = self.history_manager
+        canvas_manager = self.canvas_manager
+
+        if kind == "press":
+            history.save_state()
+            if tools.current_tool == "selection":
+                if selection.rect and selection.point_in_selection(*args):
+                    selection.start_dragging(*args)
+                else:
+                    selection.start_selection(*args)
+            elif tools.current_tool != "text":
+                # Поле ввода текста — только интерфейс, сам текст приходит событием "text"
+                tools.on_button_press(*args)
+
+        elif kind == "drag":
+            if tools.current_tool == "selection":
+                selection.update_selection(*args)
+            else:
+                tools.on_mouse_drag(*args)
+
+        elif kind == "release":
+            if tools.current_tool == "selection":
+                selection.end_selection(*args)
+            else:
+                tools.on_button_release(*args)
+            history.commit()
+
+        elif kind == "tool":
+            tools.set_tool(*args)
+        elif kind == "color":
+            tools.set_color(*args)
+        elif kind == "size":
+            tools.set_size(*args)
+        elif kind == "brush_options":
+            tools.set_brush_options(*args)
+        elif kind == "blur_sigma":
+            tools.set_blur_sigma(*args)
+        elif kind == "fill_options":
+            tools.set_fill_options(*args)
+        elif kind == "text":
+            x, y, text, text_size = args
+            tools.current_text_size = text_size
+            tools.draw_text(x, y, text)
+
+        elif kind == "layer_add":
+            history.save_state()
+            canvas_manager.add_layer()
+            history.commit()
+        elif kind == "layer_delete":
+            history.save_state()
+            canvas_manager.delete_layer(*args)
+            history.commit()
+        elif kind == "layer_switch":
+            canvas_manager.switch_layer(*args)
+        elif kind == "filter":
+            # Фильтр на слой или выделение; посчитанный в фоне воспроизводится одним проходом — результат тот же
+            index, name, box, params = args
+            layer = canvas_manager.layers[index]
+            selection.drop_floating()
+            history.save_state()
+            layer.paste(filter_region(layer, name, params, box), box[:2])
+            canvas_manager.invalidate_composite(set(layer.tile_keys(box)))
+            canvas_manager.update_canvas(box)
+            history.commit()
+        elif kind == "open_project":
+            # Воспроизводится, только если файл проекта доступен по записанному пути
+            ProjectFile.open(*args, canvas_manager)
+            history.reset()
+        elif kind == "import":
+            # Без окна изображение декодируется сразу, превью и фонового потока нет
+            path, as_layer = args
+            if as_layer:
+                history.save_state()
+            ImageImporter(canvas_manager).open(path, as_layer)
+            if as_layer:
+                history.commit()
+            else:
+                history.reset()
+        elif kind == "layer_properties":
+            index, name, visible, opacity, blend_mode = args
+            history.save_state()
+            canvas_manager.set_layer_properties(index, name, visible, opacity, blend_mode)
+            history.commit()
+        elif kind == "resize":
+            history.save_state()
+            canvas_manager.resize_canvas(*args)
+            history.commit()
+
+        elif kind == "fill_selection":
+            history.save_state()
+            selection.fill_selection(*args)
+            history.commit()
+        elif kind == "cut_selection":
+            history.save_state()
+            self.clipboard = selection.cut_selection()
+            history.commit()
+        elif kind == "cancel_selection":
+            selection.cancel_selection()
+
+        elif kind == "undo":
+            history.undo()
+        elif kind == "redo":
+            history.redo()
+
+        else:
+            raise ValueError(f"Неизвестное событие журнала: {kind}")
@@ -0,0 +1,112 @@
+from PIL import Image, ImageTk
+
+
+class OverlayManager:
+    # Постоянные элементы холста поверх растра: предпросмотр фигур, рамка выделения,
+    # плавающее выделение, поле ввода текста. Элемент создаётся один раз по имени,
+    # дальше только двигается (coords/move) и перенастраивается (itemconfigure) —
+    # растр под ним не перерисовывается, и цена предпросмотра не зависит от размера холста
+    TAG = "overlay"
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        # Координаты передаются в пикселях изображения и умножаются на масштаб просмотра
+        self.scale = 1
+        # Имя -> [вид элемента, id элемента, текущие параметры, координаты в пикселях изображения,
+        # привязан ли элемент к окну]
+        self.items = {}
+        # Имя -> картинка в пикселях изображения для элементов show_image: при смене масштаба
+        # она увеличивается заново; PhotoImage держится в параметрах элемента
+        self.images = {}
+
+    def _scaled(self, coords, fixed=False):
+        # fixed — координаты в пикселях окна: элемент не уезжает при прокрутке и масштабе
+        if fixed:
+            return [self.canvas.canvasx(value) if index % 2 == 0 else self.canvas.canvasy(value)
+                    for index, value in enumerate(coords)]
+        return [value * self.scale for value in coords]
+
+    def set_scale(self, scale):
+        self.scale = scale
+        if self.canvas is None:
+            return
+        for _, item, _, coords, fixed in self.items.values():
+            self.canvas.coords(item, *self._scaled(coords, fixed))
+        for name, image in self.images.items():
+            _, item, options, _, _ = self.items[name]
+            # PhotoImage живёт, пока на него ссылаются параметры элемента
+            options["image"] = self._photo(image)
+            self.canvas.itemconfigure(item, image=options["image"])
+
+    def follow_view(self):
+        # Окно просмотра сдвинулось: элементы, привязанные к окну, переставляются следом
+        if self.canvas is None:
+            return
+        for _, item, _, coords, fixed in self.items.values():
+            if fixed:
+                self.canvas.coords(item, *self._scaled(coords, fixed))
+
+    def show(self, name, kind, coords, fixed=False, **options):
+        # kind — вид элемента Tk Canvas ("line", "rectangle", "oval", "image", "text", "window")
+        if self.canvas is None:
+            return None
+        options["state"] = "normal"
+        current = self.items.get(name)
+        if current is not None and current[0] != kind:
+            self.remove(name)
+            current = None
+
+        if current is None:
+            create = getattr(self.canvas, "create_" + kind)
+            item = create(*self._scaled(coords, fixed), tags=(self.TAG, name), **options)
+            self.items[name] = [kind, item, options, list(coords), fixed]
+            self.canvas.tag_raise(self.TAG)
+            return item
+
+        _, item, current_options, _, _ = current
+        current[3] = list(coords)
+        current[4] = fixed
+        self.canvas.coords(item, *self._scaled(coords, fixed))
+        changed = {key: value for key, value in options.items() if current_options.get(key) != value}
+        if changed:
+            self.canvas.itemconfigure(item, **changed)
+            current_options.update(changed)
+        return item
+
+    def show_image(self, name, coords, image):
+        # Картинка PIL с левым верхним углом в coords; она увеличивается под масштаб просмотра
+        # и заново — при каждой его смене
+        if self.canvas is None:
+            return None
+        self.images[name] = image
+        return self.show(name, "image", coords, image=self._photo(image), anchor="nw")
+
+    def _photo(self, image):
+        if self.scale != 1:
+            image = image.resize((max(1, round(image.width * self.scale)), max(1, round(image.height * self.scale))),
+                                 Image.NEAREST)
+        return ImageTk.PhotoImage(image)
+
+    def move(self, name, dx, dy):
+        current = self.items.get(name)
+        if current is not None and self.canvas is not None:
+            current[3] = [value + (dx if index % 2 == 0 else dy) for index, value in enumerate(current[3])]
+            self.canvas.move(current[1], dx * self.scale, dy * self.scale)
+
+    def hide(self, name):
+        # Элемент прячется, а не удаляется: следующий show снова использует его
+        current = self.items.get(name)
+        if current is None or self.canvas is None or current[2].get("state") == "hidden":
+            return
+        self.canvas.itemconfigure(current[1], state="hidden")
+        current[2]["state"] = "hidden"
+
+    def remove(self, name):
+        self.images.pop(name, None)
+        current = self.items.pop(name, None)
+        if current is not None and self.canvas is not None:
+            self.canvas.delete(current[1])
+
+    def is_visible(self, name):
+        current = self.items.get(name)
+        return current is not None and current[2].get("state") != "hidden"
@@ -0,0 +1,140 @@
+import json
+import time
+from bisect import bisect_left
+from collections import deque
+
+
+class StageStats:
+    # Гистограмма задержек одной стадии: границы корзин в мс, последняя корзина — всё, что дольше
+    BUCKETS_MS = (0.25, 0.5, 1, 2, 4, 8, 16, 33, 50, 100, 250, 500, 1000)
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.histogram = [0] * (len(self.BUCKETS_MS) + 1)
+        self.samples = deque(maxlen=4096)
+        self.recent = deque(maxlen=256)
+
+    def add(self, started, elapsed_ms):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.histogram[bisect_left(self.BUCKETS_MS, elapsed_ms)] += 1
+        self.samples.append(elapsed_ms)
+        self.recent.append(started)
+
+    def percentile(self, fraction):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+    def rate(self, now, window=1.0):
+        return sum(1 for started in self.recent if now - started <= window) / window
+
+    def report(self):
+        labels = [f"<={bound}" for bound in self.BUCKETS_MS] + [f">{self.BUCKETS_MS[-1]}"]
+        return {
+            "count": self.count,
+            "total_ms": round(self.total_ms, 3),
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(0.5), 3),
+            "p95_ms": round(self.percentile(0.95), 3),
+            "max_ms": round(self.max_ms, 3),
+            "histogram_ms": dict(zip(labels, self.histogram)),
+        }
+
+
+class Profiler:
+    # Замеры горячих путей по стадиям. Выключенный профайлер ничего не стоит: обёртки
+    # ставятся на методы объектов только при enable() и снимаются при disable().
+    # Стадии вложенные: время "event.drag" включает "tool.*", а та — "canvas.*"
+    FRAME_STAGE = "frame"
+    EVENT_STAGES = ("event.press", "event.motion", "event.release")
+
+    def __init__(self):
+        self.enabled = False
+        self.root = None
+        self.targets = []
+        self.originals = []
+        self.stages = {}
+        self.started = None
+
+    def add_target(self, obj, method_name, stage):
+        # stage — строка или функция obj -> строка (например, по текущему инструменту)
+        self.targets.append((obj, method_name, stage))
+        if self.enabled:
+            self._wrap(obj, method_name, stage)
+
+    def enable(self, root=None):
+        if self.enabled:
+            return
+        self.enabled = True
+        self.root = root
+        self.started = time.perf_counter()
+        for obj, method_name, stage in self.targets:
+            self._wrap(obj, method_name, stage)
+
+    def disable(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        for obj, method_name, original in reversed(self.originals):
+            if original is None:
+                delattr(obj, method_name)
+            else:
+                setattr(obj, method_name, original)
+        self.originals = []
+
+    def reset(self):
+        self.stages = {}
+        self.started = time.perf_counter()
+
+    def _wrap(self, obj, method_name, stage):
+        method = getattr(obj, method_name)
+        stage_name = stage if isinstance(stage, str) else None
+
+        def timed(*args, **kwargs):
+            name = stage_name or stage(obj)
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.record(name, started, (time.perf_counter() - started) * 1000)
+
+        self.originals.append((obj, method_name, obj.__dict__.get(method_name)))
+        setattr(obj, method_name, timed)
+
+    def record(self, stage, started, elapsed_ms):
+        stats = self.stages.get(stage)
+        if stats is None:
+            stats = self.stages[stage] = StageStats()
+        stats.add(started, elapsed_ms)
+        if stage == self.FRAME_STAGE and self.root is not None:
+            # Перерисовку Tk делает в простое после нашего кадра: задержка до простоя — её время
+            frame_end = time.perf_counter()
+            self.root.after_idle(lambda: self.record("tk.idle", frame_end, (time.perf_counter() - frame_end) * 1000))
+
+    def frame_summary(self):
+        # Для оверлея: среднее время последних кадров, p95 и число событий ввода в секунду
+        now = time.perf_counter()
+        frames = self.stages.get(self.FRAME_STAGE)
+        recent = list(frames.samples)[-30:] if frames else []
+        events = sum(self.stages[stage].rate(now) for stage in self.EVENT_STAGES if stage in self.stages)
+        return {
+            "frame_ms": sum(recent) / len(recent) if recent else 0.0,
+            "frame_p95_ms": frames.percentile(0.95) if frames else 0.0,
+            "events_per_second": events,
+        }
+
+    def report(self):
+        duration = time.perf_counter() - self.started if self.started is not None else 0.0
+        return {
+            "duration_s": round(duration, 3),
+            "stages": {stage: stats.report() for stage, stats in sorted(self.stages.items())},
+        }
+
+    def dump(self, path):
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.report(), file, indent=2, ensure_ascii=False)
@@ -0,0 +1,243 @@
+import json
+import os
+import struct
+import threading
+import weakref
+import zlib
+
+from PIL import Image
+
+from TiledLayer import TiledLayer
+
+
+# Все читатели кусков файлов проектов, в том числе слоёв вне документа: файл переписывается
+# только после того, как читатели его старых кусков отвязаны
+READERS = weakref.WeakSet()
+
+
+class LayerChunks:
+    # Где лежат сжатые тайлы ещё не прочитанного слоя: ключ тайла -> (смещение, длина) в файле проекта.
+    # Перед тем как файл переписывается без этого слоя (он удалён, но остался в истории, или это
+    # копия слоя в снимке для сохранения), куски читаются в память (detach) и дальше берутся оттуда
+    def __init__(self, project, locations, tile_size):
+        self.project = project
+        self.locations = locations
+        self.tile_size = tile_size
+        # Ключ тайла -> сжатый кусок, когда читатель отвязан от файла
+        self.data = None
+        # Снимок читается в потоке сохранения, а отвязывается читатель в потоке Tk
+        self.lock = threading.Lock()
+        READERS.add(self)
+
+    def __copy__(self):
+        # Копия слоя читает те же куски, но проект знает и о ней
+        with self.lock:
+            reader = LayerChunks(self.project, self.locations, self.tile_size)
+            reader.data = self.data
+        return reader
+
+    def attach(self, project, locations):
+        # Куски слоя записаны в project: читать их теперь оттуда
+        with self.lock:
+            self.project = project
+            self.locations = locations
+            self.data = None
+
+    def detach(self):
+        with self.lock:
+            if self.data is None:
+                self.data = {}
+                with open(self.project.path, "rb") as file:
+                    for key, (offset, length) in self.locations.items():
+                        file.seek(offset)
+                        self.data[key] = file.read(length)
+            self.project = None
+
+    def read(self, key):
+        with self.lock:
+            if self.data is not None:
+                return self.data[key]
+            offset, length = self.locations[key]
+            with open(self.project.path, "rb") as file:
+                file.seek(offset)
+                return file.read(length)
+
+    def _tile(self, data):
+        return Image.frombytes("RGBA", (self.tile_size, self.tile_size), zlib.decompress(data))
+
+    def load(self):
+        # Вызывается слоем при первом обращении к тайлам
+        with self.lock:
+            if self.data is not None:
+                return {key: self._tile(data) for key, data in self.data.items()}
+            tiles = {}
+            with open(self.project.path, "rb") as file:
+                for key, (offset, length) in self.locations.items():
+                    file.seek(offset)
+                    tile = self._tile(file.read(length))
+                    tiles[key] = tile
+                    self.project.remember(tile, (offset, length))
+            return tiles
+
+
+class ProjectFile:
+    # Собственный формат документа со всеми слоями. Файл — заголовок, сжатые zlib тайлы
+    # (по куску на тайл) и JSON-оглавление в конце: размеры, свойства слоёв, где лежит каждый тайл.
+    # Открытие читает только оглавление, тайлы слоя читаются при первом показе или правке.
+    # Сохранение дописывает в конец только изменившиеся тайлы и новое оглавление, а затем
+    # переписывает заголовок — до этого момента файл остаётся прежним документом
+    MAGIC = b"PAINTPRJ"
+    VERSION = 1
+    # Магия, версия, смещение и длина оглавления
+    HEADER = struct.Struct("<8sIQQ")
+    # Когда мёртвых кусков больше, чем живых, файл переписывается целиком
+    MAX_GARBAGE_RATIO = 1.0
+    COMPRESS_LEVEL = 1
+
+    def __init__(self, path):
+        self.path = path
+        # id тайла -> (тайл, (смещение, длина)): какие тайлы уже лежат в этом файле
+        self.chunks = {}
+
+    def remember(self, tile, location):
+        self.chunks[id(tile)] = (tile, location)
+
+    def _location(self, tile):
+        entry = self.chunks.get(id(tile))
+        if entry is not None and entry[0] is tile:
+            return entry[1]
+        return None
+
+    def _read_index(self, file):
+        header = file.read(self.HEADER.size)
+        if len(header) < self.HEADER.size:
+            raise ValueError(f"Не файл проекта: {self.path}")
+        magic, version, index_offset, index_length = self.HEADER.unpack(header)
+        if magic != self.MAGIC:
+            raise ValueError(f"Не файл проекта: {self.path}")
+        if version > self.VERSION:
+            raise ValueError(f"Файл проекта новее программы (версия {version})")
+        file.seek(index_offset)
+        return json.loads(file.read(index_length).decode("utf-8")), index_offset
+
+    @classmethod
+    def open(cls, path, canvas_manager):
+        # Документ из файла заменяет открытый в canvas_manager; возвращает ProjectFile для сохранений
+        project = cls(path)
+        with open(path, "rb") as file:
+            index, _ = project._read_index(file)
+
+        layers = []
+        for entry in index["layers"]:
+            layer = TiledLayer(index["width"], index["height"], tuple(entry["fill"]), entry["tile_size"])
+            layer.set_properties((entry["name"], entry["visible"], entry["opacity"], entry["blend_mode"]))
+            # В файлах без сдвига сетки он нулевой
+            layer.origin = tuple(entry.get("origin", (0, 0)))
+            locations = {(x, y): (offset, length) for x, y, offset, length in entry["tiles"]}
+            if locations:
+                layer.loader = LayerChunks(project, locations, entry["tile_size"])
+            layers.append(layer)
+
+        canvas_manager.bg_color = tuple(index["bg_color"])
+        canvas_manager.restore_layers(layers, (index["width"], index["height"]), index["active"])
+        return project
+
+    def save(self, canvas_manager):
+        # Дописывает изменения в существующий файл проекта или пишет файл заново
+        if not os.path.exists(self.path):
+            return self._rewrite(canvas_manager)
+        with open(self.path, "r+b") as file:
+            try:
+                self._read_index(file)
+            except ValueError:
+                return self._rewrite(canvas_manager)
+            file.seek(0, os.SEEK_END)
+            layers_index, live_bytes = self._write_chunks(file, canvas_manager, reuse=True)
+            if file.tell() - live_bytes > live_bytes * self.MAX_GARBAGE_RATIO + self.HEADER.size:
+                file.close()
+                return self._rewrite(canvas_manager)
+            self._finish(file, canvas_manager, layers_index)
+        self._attach_readers(canvas_manager, layers_index)
+        return "incremental"
+
+    def _rewrite(self, canvas_manager):
+        # Целиком во временный файл и замена; куски не прочитанных слоёв копируются без распаковки
+        temporary_path = self.path + ".part"
+        previous_chunks = self.chunks
+        self.chunks = {}
+        try:
+            with open(temporary_path, "wb") as file:
+                file.write(b"\0" * self.HEADER.size)
+                layers_index, _ = self._write_chunks(file, canvas_manager, reuse=False)
+                self._finish(file, canvas_manager, layers_index)
+        except Exception:
+            self.chunks = previous_chunks
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+        # Слои вне документа в новый файл не попали: их куски читаются в память, пока старый файл цел
+        kept = {id(layer.loader) for layer in canvas_manager.layers if not layer.loaded}
+        path = os.path.abspath(self.path)
+        for reader in list(READERS):
+            project = reader.project
+            if project is not None and os.path.abspath(project.path) == path and id(reader) not in kept:
+                reader.detach()
+        os.replace(temporary_path, self.path)
+        self._attach_readers(canvas_manager, layers_index)
+        return "full"
+
+    def _attach_readers(self, canvas_manager, layers_index):
+        # Не прочитанные слои документа теперь читаются из записанного файла
+        for layer, entry in zip(canvas_manager.layers, layers_index):
+            if not layer.loaded:
+                layer.loader.attach(self, {(x, y): (offset, length) for x, y, offset, length in entry["tiles"]})
+
+    def _write_chunks(self, file, canvas_manager, reuse):
+        # reuse — куски, уже лежащие в этом файле, не пишутся повторно.
+        # Возвращает оглавление слоёв и объём живых данных
+        layers_index = []
+        live_bytes = 0
+        for layer in canvas_manager.layers:
+            tiles = []
+            if not layer.loaded:
+                loader = layer.loader
+                for (x, y), location in loader.locations.items():
+                    if not (reuse and loader.project is self):
+                        data = loader.read((x, y))
+                        location = (file.tell(), len(data))
+                        file.write(data)
+                    tiles.append([x, y, *location])
+                    live_bytes += location[1]
+            else:
+                layer.share_tiles()
+                for (x, y), tile in layer.tiles.items():
+                    location = self._location(tile) if reuse else None
+                    if location is None:
+                        data = zlib.compress(tile.tobytes(), self.COMPRESS_LEVEL)
+                        location = (file.tell(), len(data))
+                        file.write(data)
+                        self.remember(tile, location)
+                    tiles.append([x, y, *location])
+                    live_bytes += location[1]
+            name, visible, opacity, blend_mode = layer.properties()
+            layers_index.append({"name": name, "visible": visible, "opacity": opacity, "blend_mode": blend_mode,
+                                 "fill": list(layer.fill), "tile_size": layer.tile_size,
+                                 "origin": list(layer.origin), "tiles": tiles})
+        return layers_index, live_bytes
+
+    def _finish(self, file, canvas_manager, layers_index):
+        index = {"width": canvas_manager.width, "height": canvas_manager.height,
+                 "bg_color": list(canvas_manager.bg_color), "active": canvas_manager.active_layer_index,
+                 "layers": layers_index}
+        data = json.dumps(index, ensure_ascii=False).encode("utf-8")
+        index_offset = file.tell()
+        file.write(data)
+        file.truncate()
+        file.flush()
+        # Заголовок пишется последним: пока он указывает на старое оглавление, файл цел
+        file.seek(0)
+        file.write(self.HEADER.pack(self.MAGIC, self.VERSION, index_offset, len(data)))
+        file.flush()
+        # Тайлы, которых больше нет в документе, забываются
+        live = {id(tile) for layer in canvas_manager.layers if layer.loaded for tile in layer.tiles.values()}
+        self.chunks = {key: value for key, value in self.chunks.items() if key in live}
@@ -1,24 +1,29 @@
-from PIL import ImageTk, ImageDraw
-import tkinter as tk
+from PIL import Image, ImageChops
 
 
 class SelectionManager:
+    # Выделение — прямоугольник rect и маска mask ("L", размером с rect) в активном слое.
+    # При перетаскивании пиксели под маской поднимаются в плавающее выделение (floating):
+    # в слое на их месте остаётся заливка слоя, а само выделение показывается элементом
+    # оверлея и только сдвигается. В слой оно вклеивается один раз — при отпускании
     def __init__(self, canvas_manager, drawing_tools):
         self.canvas_manager = canvas_manager
         self.drawing_tools = drawing_tools
         self.color = drawing_tools.current_color
         self.rect = None
+        self.mask = None
         self.start = None
-        self.end = None
         self.active = False
         self.dragging = False
-        self.selection_image = None
-        self.offset = (0, 0)
         self.drag_start = None
+        self.floating = None
+        self.floating_layer = None
 
     def start_selection(self, x, y):
+        self.drop_floating()
         self.start = (x, y)
         self.rect = (x, y, x, y)
+        self.mask = None
         self.active = True
         self.dragging = False
         self.update_selection_display()
@@ -31,50 +36,88 @@ class SelectionManager:
         elif self.dragging and self.rect:
             dx = x - self.drag_start[0]
             dy = y - self.drag_start[1]
-            x1, y1, x2, y2 = self.rect
-            self.rect = (x1 + dx, y1 + dy, x2 + dx, y2 + dy)
             self.drag_start = (x, y)
-            self.update_selection_display()
+            self._move(dx, dy)
 
     def end_selection(self, x, y):
+        if self.dragging:
+            self.update_selection(x, y)
+            self.dragging = False
+            self.drop_floating()
+            self.update_selection_display()
+            return
+
         if self.start:
             x1, y1 = self.start
-            x2, y2 = x, y
-            self.rect = (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+            self.rect = (min(x1, x), min(y1, y), max(x1, x), max(y1, y))
             self.active = False
-
-            if not self.dragging:
-                self._capture_selection()
-            else:
-                self._paste_selection()
-                self.dragging = False
-
+            if self.rect[0] == self.rect[2] or self.rect[1] == self.rect[3]:
+                self.cancel_selection()
+                return
+            self.mask = Image.new("L", (self.rect[2] - self.rect[0], self.rect[3] - self.rect[1]), 255)
             self.update_selection_display()
 
-    def _capture_selection(self):
-        if self.rect:
-            x1, y1, x2, y2 = self.get_selection_area()
-            self.selection_image = self.canvas_manager.image.crop((x1, y1, x2, y2))
-            self.offset = (x1, y1)
-
-    def _paste_selection(self):
-        if self.selection_image and self.rect:
-            x1, y1, x2, y2 = self.rect
-            self.canvas_manager.draw.rectangle(
-                [x1, y1, x2, y2],
-                fill=self.canvas_manager.bg_color,
-                outline=self.canvas_manager.bg_color)
-            self.canvas_manager.image.paste(self.selection_image, (x1, y1))
-            self.canvas_manager.draw = ImageDraw.Draw(self.canvas_manager.image)
-            self.offset = (x1, y1)
-
     def start_dragging(self, x, y):
-        if self.rect and self.point_in_selection(x, y):
+        if self.rect and self.mask is not None and self.point_in_selection(x, y):
             self.dragging = True
             self.drag_start = (x, y)
+            self._lift()
             return True
         return False
 
+    def _active_layer(self):
+        return self.canvas_manager.layers[self.canvas_manager.active_layer_index]
+
+    def _masked_crop(self, layer):
+        # Пиксели слоя под маской; вне маски — прозрачные
+        image = layer.crop(self.rect)
+        image.putalpha(ImageChops.multiply(image.getchannel("A"), self.mask))
+        return image
+
+    def _clear_masked(self, layer, color):
+        region = layer.crop(self.rect)
+        region.paste(color, mask=self.mask)
+        layer.paste(region, self.rect[:2])
+        self.canvas_manager.update_canvas(self.rect)
+
+    def _lift(self):
+        # Поднимает пиксели под маской в плавающее выделение; единственная перерисовка слоя до отпускания
+        layer = self._active_layer()
+        self.floating = self._masked_crop(layer)
+        self.floating_layer = layer
+        self._clear_masked(layer, layer.fill)
+
+        if self.canvas_manager.canvas is not None:
+            # Оверлей сам увеличивает картинку под масштаб, в том числе при его смене
+            self.canvas_manager.overlay.show_image("floating_selection", self.rect[:2], self.floating)
+            # Рамка остаётся над плавающими пикселями
+            self.canvas_manager.overlay.remove("marquee")
+            self.update_selection_display()
+
+    def _move(self, dx, dy):
+        # Перетаскивание стоит только сдвига элементов оверлея: слой и растр не трогаются
+        if not dx and not dy:
+            return
+        x1, y1, x2, y2 = self.rect
+        self.rect = (x1 + dx, y1 + dy, x2 + dx, y2 + dy)
+        self.canvas_manager.overlay.move("floating_selection", dx, dy)
+        self.canvas_manager.overlay.move("marquee", dx, dy)
+
+    def drop_floating(self):
+        # Вклеивает плавающее выделение в слой, из которого оно поднято, одной операцией
+        if self.floating is None:
+            return None
+        layer, floating = self.floating_layer, self.floating
+        self.floating = self.floating_layer = None
+        self.canvas_manager.overlay.remove("floating_selection")
+
+        box = self.rect
+        region = layer.crop(box)
+        region.alpha_composite(floating)
+        layer.paste(region, box[:2])
+        self.canvas_manager.update_canvas(box)
+        return box
+
     def point_in_selection(self, x, y):
         if not self.rect:
             return False
@@ -82,23 +125,39 @@ class SelectionManager:
         return x1 <= x <= x2 and y1 <= y <= y2
 
     def update_selection_display(self):
-        self.canvas_manager.update_canvas()
+        # Рамка выделения — постоянный элемент оверлея; растр при этом не перерисовывается
         if self.rect:
-            x1, y1, x2, y2 = self.rect
-            self.canvas_manager.canvas.create_rectangle(
-                x1, y1, x2, y2, outline="black", dash=(4, 4), tags="selection")
-            if self.selection_image and self.dragging:
-                selection_photo = ImageTk.PhotoImage(self.selection_image)
-                self.canvas_manager.canvas.create_image(
-                    x1, y1, image=selection_photo, anchor=tk.NW, tags="selection_img")
-                self.canvas_manager.canvas.selection_img = selection_photo
+            self.canvas_manager.overlay.show("marquee", "rectangle", self.rect, outline="black", dash=(4, 4))
+        else:
+            self.canvas_manager.overlay.hide("marquee")
 
     def cancel_selection(self):
+        self.drop_floating()
         self.rect = None
+        self.mask = None
+        self.start = None
         self.active = False
         self.dragging = False
-        self.selection_image = None
-        self.canvas_manager.update_canvas()
+        self.canvas_manager.overlay.hide("marquee")
+
+    def fill_selection(self, color):
+        if not self.rect or self.mask is None:
+            return
+        self.drop_floating()
+        self._clear_masked(self._active_layer(), color)
+        self.cancel_selection()
+
+    def cut_selection(self):
+        # Вырезанное возвращается для буфера обмена; на его месте остаётся заливка слоя
+        # (цвет фона у нижнего слоя, прозрачность у остальных)
+        if not self.rect or self.mask is None:
+            return None
+        self.drop_floating()
+        layer = self._active_layer()
+        clipboard = self._masked_crop(layer)
+        self._clear_masked(layer, layer.fill)
+        self.cancel_selection()
+        return clipboard
 
     def get_selection_area(self):
         if self.rect:
@@ -0,0 +1,297 @@
+import copy
+from functools import lru_cache
+from PIL import Image, ImageColor, ImageDraw
+
+
+@lru_cache(maxsize=64)
+def uniform_tile(size, color):
+    # Общий неизменяемый тайл одного цвета: им заменяются все невыделенные тайлы
+    return Image.new("RGBA", (size, size), color)
+
+
+class TiledLayer:
+    # Слой хранится разреженно: тайлы TILE_SIZE x TILE_SIZE выделяются только там,
+    # где что-то нарисовано, остальное считается залитым цветом fill.
+    # Тайлы разделяются между копиями слоя (copy-on-write), поэтому copy() дешёвый.
+    # Сетка тайлов привязана к origin — положению её угла в документе, — а слой занимает
+    # (0, 0, width, height) документа. Изменение холста сдвигает origin и границы, не трогая пиксели
+    TILE_SIZE = 256
+
+    def __init__(self, width, height, fill=(0, 0, 0, 0), tile_size=None, name=""):
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size or self.TILE_SIZE
+        if isinstance(fill, str):
+            fill = ImageColor.getcolor(fill, "RGBA")
+        elif len(fill) == 3:
+            fill = tuple(fill) + (255,)
+        self.fill = tuple(fill)
+        self.mode = "RGBA"
+        # Угол тайла (0, 0) в координатах документа; у всех слоёв документа одинаковый
+        self.origin = (0, 0)
+        # Свойства слоя для сведения: имя, видимость, непрозрачность (0..1), режим смешения (BLEND_MODES)
+        self.name = name
+        self.visible = True
+        self.opacity = 1.0
+        self.blend_mode = "normal"
+        self._tiles = {}
+        # Слой из файла проекта: тайлы читаются при первом обращении (см. ProjectFile)
+        self.loader = None
+        # Тайлы, которые принадлежат только этому слою и могут меняться на месте
+        self._owned = set()
+        # Журнал для истории: ключ тайла -> тайл до первого изменения (None — не был выделен)
+        self.journal = None
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    @property
+    def tiles(self):
+        if self.loader is not None:
+            loader, self.loader = self.loader, None
+            self._tiles = loader.load()
+        return self._tiles
+
+    @tiles.setter
+    def tiles(self, tiles):
+        self.loader = None
+        self._tiles = tiles
+
+    @property
+    def loaded(self):
+        return self.loader is None
+
+    @property
+    def nbytes(self):
+        # Ещё не прочитанный слой памяти не занимает
+        if not self.loaded:
+            return 0
+        return len(self._tiles) * self.tile_size * self.tile_size * 4
+
+    def adopt_tiles(self, tiles):
+        # Тайлы, собранные заранее (например, в потоке импорта), ставятся мимо журнала истории:
+        # это исходное содержимое слоя, а не правка
+        self.tiles.update(tiles)
+
+    def share_tiles(self):
+        # Все тайлы становятся общими: дальше тайл меняется только через копию,
+        # и сохранённый где-то ещё объект тайла остаётся прежним
+        self._owned = set()
+
+    def copy(self, tiles=True, lazy=False):
+        # tiles=False — пустая копия с теми же размерами и свойствами.
+        # lazy — не прочитанный слой не читается: у копии свой читатель тех же кусков файла
+        layer = TiledLayer(self.width, self.height, self.fill, self.tile_size)
+        layer.origin = self.origin
+        layer.set_properties(self.properties())
+        if not tiles:
+            return layer
+        if lazy and not self.loaded:
+            layer.loader = copy.copy(self.loader)
+            return layer
+        layer.tiles = dict(self.tiles)
+        self.share_tiles()
+        return layer
+
+    def properties(self):
+        return self.name, self.visible, self.opacity, self.blend_mode
+
+    def set_properties(self, properties):
+        self.name, self.visible, self.opacity, self.blend_mode = properties
+
+    def clip(self, box):
+        left, upper, right, lower = box
+        left, upper = max(int(left), 0), max(int(upper), 0)
+        right, lower = min(int(right), self.width), min(int(lower), self.height)
+        if left >= right or upper >= lower:
+            return None
+        return left, upper, right, lower
+
+    def tile_keys(self, box):
+        # box — в координатах документа, ключи — в сетке тайлов
+        size = self.tile_size
+        left, upper, right, lower = box
+        left, right = left - self.origin[0], right - self.origin[0]
+        upper, lower = upper - self.origin[1], lower - self.origin[1]
+        for tile_y in range(upper // size, (lower - 1) // size + 1):
+            for tile_x in range(left // size, (right - 1) // size + 1):
+                yield tile_x, tile_y
+
+    def tile_box(self, key):
+        size = self.tile_size
+        left, upper = key[0] * size + self.origin[0], key[1] * size + self.origin[1]
+        return left, upper, left + size, upper + size
+
+    def _crosses_edge(self, box):
+        left, upper, right, lower = box
+        return left < 0 or upper < 0 or right > self.width or lower > self.height
+
+    def get_tile(self, key):
+        tile = self.tiles.get(key)
+        if tile is None:
+            return uniform_tile(self.tile_size, self.fill)
+        return tile
+
+    def has_content(self, key):
+        return key in self.tiles or self.fill[3] != 0
+
+    def begin_journal(self):
+        # После начала журнала ни один тайл не меняется на месте: старые остаются в журнале
+        self.journal = {}
+        self.share_tiles()
+
+    def end_journal(self):
+        journal, self.journal = self.journal, None
+        return journal or {}
+
+    def set_tile(self, key, tile):
+        # Ставит готовый (возможно, общий) тайл; None освобождает место
+        self._replace_tile(key, tile, owned=False)
+
+    def _replace_tile(self, key, tile, owned=True):
+        if self.journal is not None and key not in self.journal:
+            self.journal[key] = self.tiles.get(key)
+        if tile is None:
+            self.tiles.pop(key, None)
+            self._owned.discard(key)
+            return
+        self.tiles[key] = tile
+        if owned:
+            self._owned.add(key)
+        else:
+            self._owned.discard(key)
+
+    def _writable_tile(self, key):
+        tile = self.tiles.get(key)
+        if tile is not None and key in self._owned:
+            return tile
+        tile = tile.copy() if tile is not None else Image.new("RGBA", (self.tile_size,) * 2, self.fill)
+        self._replace_tile(key, tile)
+        return tile
+
+    def _matches_fill(self, image):
+        return image.getextrema() == tuple((channel, channel) for channel in self.fill)
+
+    def _store_tile(self, key, tile):
+        # Тайл, целиком совпадающий с заливкой, не хранится
+        self._replace_tile(key, None if self._matches_fill(tile) else tile)
+
+    def _clear_outside(self, key, tile):
+        # Пиксели за границей слоя в крайних тайлах всегда равны заливке
+        left, upper, right, lower = self.tile_box(key)
+        if left < 0:
+            tile.paste(self.fill, (0, 0, -left, self.tile_size))
+        if upper < 0:
+            tile.paste(self.fill, (0, 0, self.tile_size, -upper))
+        if right > self.width:
+            tile.paste(self.fill, (self.width - left, 0, self.tile_size, self.tile_size))
+        if lower > self.height:
+            tile.paste(self.fill, (0, self.height - upper, self.tile_size, self.tile_size))
+
+    def getpixel(self, xy):
+        x, y = xy[0] - self.origin[0], xy[1] - self.origin[1]
+        tile = self.get_tile((x // self.tile_size, y // self.tile_size))
+        return tile.getpixel((x % self.tile_size, y % self.tile_size))
+
+    def crop(self, box):
+        left, upper, right, lower = (int(value) for value in box)
+        result = Image.new("RGBA", (right - left, lower - upper), (0, 0, 0, 0))
+        inner = self.clip(box)
+        if inner is None:
+            return result
+
+        if self.fill[3] != 0:
+            result.paste(self.fill, (inner[0] - left, inner[1] - upper, inner[2] - left, inner[3] - upper))
+        for key in self.tile_keys(inner):
+            tile = self.tiles.get(key)
+            if tile is None:
+                continue
+            tile_left, tile_upper = self.tile_box(key)[:2]
+            part = (max(inner[0], tile_left) - tile_left, max(inner[1], tile_upper) - tile_upper,
+                    min(inner[2], tile_left + self.tile_size) - tile_left,
+                    min(inner[3], tile_upper + self.tile_size) - tile_upper)
+            result.paste(tile.crop(part), (tile_left + part[0] - left, tile_upper + part[1] - upper))
+        return result
+
+    def to_image(self):
+        return self.crop((0, 0, self.width, self.height))
+
+    def paste(self, image, box=(0, 0)):
+        # Как Image.paste без маски: пиксели заменяются, а не смешиваются
+        if image.mode != "RGBA":
+            image = image.convert("RGBA")
+        left, upper = int(box[0]), int(box[1])
+        inner = self.clip((left, upper, left + image.width, upper + image.height))
+        if inner is None:
+            return None
+
+        for key in self.tile_keys(inner):
+            tile_left, tile_upper = self.tile_box(key)[:2]
+            part = (max(inner[0], tile_left), max(inner[1], tile_upper),
+                    min(inner[2], tile_left + self.tile_size), min(inner[3], tile_upper + self.tile_size))
+            piece = image.crop((part[0] - left, part[1] - upper, part[2] - left, part[3] - upper))
+
+            if key not in self.tiles:
+                if self._matches_fill(piece):
+                    continue
+                tile = Image.new("RGBA", (self.tile_size,) * 2, self.fill)
+                self._replace_tile(key, tile)
+            else:
+                tile = self._writable_tile(key)
+            tile.paste(piece, (part[0] - tile_left, part[1] - tile_upper))
+        return inner
+
+    def fill_tile(self, key, color, mask=None):
+        # Заливает цветом пиксели тайла под маской ("L" размером с тайл; None — весь тайл в границах слоя).
+        # Тайл, залитый целиком, становится общим одноцветным, а не выделяется заново
+        tile_box = self.tile_box(key)
+        if mask is None and not self._crosses_edge(tile_box):
+            self._replace_tile(key, None if tuple(color) == self.fill else uniform_tile(self.tile_size, tuple(color)),
+                               owned=False)
+            return
+        tile = self._writable_tile(key)
+        if mask is None:
+            tile.paste(color, (0, 0, self.tile_size, self.tile_size))
+            self._clear_outside(key, tile)
+        else:
+            tile.paste(color, (0, 0, self.tile_size, self.tile_size), mask)
+
+    def draw(self, bbox, paint):
+        # paint(draw, dx, dy) рисует через ImageDraw в тайле; координаты фигуры
+        # нужно сдвинуть на (dx, dy). Возвращает задетый прямоугольник слоя
+        inner = self.clip(bbox)
+        if inner is None:
+            return None
+
+        for key in self.tile_keys(inner):
+            tile_box = self.tile_box(key)
+            if key in self.tiles:
+                tile = self._writable_tile(key)
+                paint(ImageDraw.Draw(tile), -tile_box[0], -tile_box[1])
+                if self._crosses_edge(tile_box):
+                    self._clear_outside(key, tile)
+            else:
+                tile = Image.new("RGBA", (self.tile_size,) * 2, self.fill)
+                paint(ImageDraw.Draw(tile), -tile_box[0], -tile_box[1])
+                if self._crosses_edge(tile_box):
+                    self._clear_outside(key, tile)
+                self._store_tile(key, tile)
+        return inner
+
+    def resize(self, width, height, left=0, top=0):
+        # Старый угол слоя оказывается в точке (left, top) нового; отрицательные значения обрезают
+        # слой слева и сверху. Пиксели не копируются: сдвигается сетка тайлов, тайлы за новой
+        # границей освобождаются, а новая область выделится, только когда в ней начнут рисовать
+        self.width = width
+        self.height = height
+        self.origin = (self.origin[0] + left, self.origin[1] + top)
+        for key in list(self.tiles):
+            tile_box = self.tile_box(key)
+            tile_left, tile_upper, tile_right, tile_lower = tile_box
+            if tile_left >= width or tile_upper >= height or tile_right <= 0 or tile_lower <= 0:
+                self._replace_tile(key, None)
+            elif self._crosses_edge(tile_box):
+                tile = self._writable_tile(key)
+                self._clear_outside(key, tile)
+                self._store_tile(key, tile)
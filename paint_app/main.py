@@ -1,14 +1,67 @@
 import tkinter as tk
-from MainPaint import MainPaint
 import argparse
+import glob
+import os
+import sys
+import time
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Графический растровый редактор")
     parser.add_argument('--batch', action='store_true',
                         help="Запуск в пакетном режиме")
+    parser.add_argument('--fps', type=int, default=60,
+                        help="Максимальная частота перерисовки при рисовании")
+    parser.add_argument('--replay', metavar='LOG',
+                        help="Воспроизвести журнал действий без окна и сохранить результат в --output")
+    parser.add_argument('inputs', nargs='*',
+                        help="Пакетный режим: входные изображения (можно маски вида *.png)")
+    parser.add_argument('--ops',
+                        help="Пакетный режим: JSON-файл со списком операций")
+    parser.add_argument('--output', default="output",
+                        help="Пакетный режим: папка для результатов")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Пакетный режим: число процессов (по умолчанию — по числу ядер)")
+    parser.add_argument('--format', default=None,
+                        help="Пакетный режим: расширение результата, например .png")
     args = parser.parse_args()
+    if args.replay:
+        from OperationLog import OperationLog, LogReplayer
+
+        started = time.perf_counter()
+        log = OperationLog.load(args.replay)
+        result = LogReplayer(log).run().get_composited_image()
+        output_path = args.output
+        if not os.path.splitext(output_path)[1]:
+            os.makedirs(output_path, exist_ok=True)
+            name = os.path.splitext(os.path.basename(args.replay))[0]
+            output_path = os.path.join(output_path, name + (args.format or ".png"))
+        result.save(output_path)
+        elapsed = time.perf_counter() - started
+        print(f"Воспроизведено {len(log.events)} событий за {elapsed:.2f} с: {output_path}")
+        sys.exit(0)
+
     if args.batch:
+        from BatchProcessor import load_operations, run_batch
+
         print("Запуск в пакетном режиме...")
+        paths = [path for pattern in args.inputs for path in sorted(glob.glob(pattern))]
+        if not paths or not args.ops:
+            parser.error("для --batch нужны входные файлы и --ops")
+
+        started = time.perf_counter()
+        results = run_batch(paths, load_operations(args.ops), args.output, args.workers, args.format)
+        failed = [(path, error) for path, _, error in results if error]
+        for path, error in failed:
+            print(f"{path}: {error}", file=sys.stderr)
+        elapsed = time.perf_counter() - started
+        print(f"Обработано {len(results) - len(failed)} из {len(results)} файлов за {elapsed:.1f} с")
+        sys.exit(1 if failed else 0)
+
+    from MainPaint import MainPaint
+
     root = tk.Tk()
-    app = MainPaint(root)
+    app = MainPaint(root, fps=args.fps)
     root.mainloop()
+    # Начатые сохранения дописываются после закрытия окна, недосчитанные фильтры отменяются
+    app.filter_executor.shutdown()
+    app.export_worker.wait()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Модули приложения импортируют друг друга по короткому имени (как при запуске из paint_app)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "paint_app"))
@@ -0,0 +1,44 @@
+import pytest
+from PIL import Image
+from paint_app.BatchProcessor import process_image, run_batch
+
+
+OPERATIONS = [
+    {"op": "brush", "points": [[5, 5], [30, 5]], "color": "red", "size": 3},
+    {"op": "rectangle", "start": [40, 40], "end": [60, 60], "color": "blue"},
+    {"op": "fill", "point": [50, 50], "color": "green"},
+    {"op": "text", "position": [5, 70], "text": "42", "color": "black"},
+    {"op": "grayscale", "points": [[14, 5], [15, 5]], "size": 10},
+    {"op": "resize", "width": 120, "height": 90},
+]
+
+
+def test_process_image_applies_operations_without_tk():
+    result = process_image(Image.new("RGB", (100, 100), "white"), OPERATIONS)
+
+    assert result.size == (120, 90)
+    assert result.getpixel((50, 50)) == (0, 128, 0)
+    assert result.getpixel((25, 5)) == (255, 0, 0)
+    gray = result.getpixel((15, 5))
+    assert gray[0] == gray[1] == gray[2] != 255
+    assert result.crop((5, 70, 25, 85)).getextrema()[0][0] < 128
+
+
+def test_unknown_operation_is_reported():
+    with pytest.raises(ValueError):
+        process_image(Image.new("RGB", (10, 10)), [{"op": "explode"}])
+
+
+def test_run_batch_spreads_files_over_pool(tmp_path):
+    inputs = []
+    for index in range(4):
+        path = tmp_path / f"in_{index}.png"
+        Image.new("RGB", (100, 100), (index * 40, 0, 0)).save(path)
+        inputs.append(str(path))
+
+    results = run_batch(inputs, OPERATIONS[:3], str(tmp_path / "out"), workers=2, extension=".bmp")
+
+    assert [error for _, _, error in results] == [None] * 4
+    for _, output_path, _ in results:
+        with Image.open(output_path) as image:
+            assert image.format == "BMP" and image.getpixel((50, 50)) == (0, 128, 0)
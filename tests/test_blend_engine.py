@@ -0,0 +1,54 @@
+import pytest
+from PIL import Image
+from paint_app.BlendEngine import BlendEngine
+from paint_app.CanvasManager import CanvasManager
+
+
+def blend(backdrop, color, mode, opacity=1.0):
+    base = Image.new("RGBA", (2, 2), backdrop)
+    tile = Image.new("RGBA", (2, 2), color)
+    return BlendEngine.composite(base, tile, opacity=opacity, mode=mode).getpixel((0, 0))
+
+
+def test_normal_mode_matches_alpha_composite():
+    base = Image.new("RGBA", (4, 4), (10, 200, 30, 255))
+    tile = Image.new("RGBA", (4, 4), (250, 20, 90, 100))
+    expected = Image.alpha_composite(base, tile)
+    assert BlendEngine.composite(base.copy(), tile).tobytes() == expected.tobytes()
+
+
+@pytest.mark.parametrize("mode, expected", [
+    ("multiply", (100, 50, 0, 255)),
+    ("screen", (228, 178, 200, 255)),
+    ("add", (255, 228, 200, 255)),
+    ("overlay", (200, 100, 0, 255)),
+])
+def test_blend_modes(mode, expected):
+    assert blend((200, 100, 0, 255), (128, 128, 200, 255), mode) == \
+        pytest.approx(expected, abs=1)
+
+
+def test_opacity_scales_layer_alpha():
+    assert blend("white", (255, 0, 0, 255), "normal", opacity=0.5) == (255, 128, 128, 255)
+    assert blend("white", (0, 0, 0, 255), "multiply", opacity=0) == (255, 255, 255, 255)
+
+
+def test_transparent_backdrop_takes_layer_color():
+    assert blend((0, 0, 0, 0), (40, 80, 120, 200), "multiply") == (40, 80, 120, 200)
+
+
+def test_hidden_layers_are_skipped_and_modes_apply_above_active():
+    manager = CanvasManager(None, 64, 64, "white")
+    manager.layers[0].paste(Image.new("RGBA", (64, 64), (200, 100, 0, 255)))
+    manager.add_layer()
+    manager.layers[1].paste(Image.new("RGBA", (64, 64), (128, 128, 200, 255)))
+    manager.add_layer()
+    manager.layers[2].paste(Image.new("RGBA", (8, 8), "blue"))
+
+    manager.set_layer_properties(2, visible=False)
+    manager.set_layer_properties(1, blend_mode="multiply")
+    manager.switch_layer(0)
+    assert manager.get_composited_image().getpixel((0, 0)) == pytest.approx((100, 50, 0), abs=1)
+
+    manager.set_layer_properties(1, opacity=0)
+    assert manager.get_composited_image().getpixel((0, 0)) == (200, 100, 0)
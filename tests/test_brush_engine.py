@@ -0,0 +1,83 @@
+import numpy as np
+from paint_app.BrushEngine import BrushStroke, dab_stamp
+from paint_app.CanvasManager import CanvasManager
+from paint_app.DrawingTools import DrawingTools
+from paint_app.TiledLayer import TiledLayer
+
+
+def test_stamps_are_cached_and_anti_aliased():
+    stamp = dab_stamp(20, 0.8)
+    assert dab_stamp(20, 0.8) is stamp
+    assert stamp.max() == 1.0
+    edge = stamp[(stamp > 0) & (stamp < 1)]
+    assert edge.size > 0
+
+    soft = dab_stamp(20, 0.0)
+    assert soft.sum() < stamp.sum()
+
+
+def stroke_image(points, **options):
+    layer = TiledLayer(200, 60, "white", tile_size=64)
+    stroke = BrushStroke(layer, "black", 12, **options)
+    for x, y in points:
+        stroke.add_point(x, y)
+        stroke.flush()
+    stroke.finish()
+    return layer.to_image()
+
+
+def test_dab_spacing_does_not_depend_on_event_count():
+    slow = stroke_image([(x, 30) for x in range(20, 181)])
+    fast = stroke_image([(20, 30), (100, 30), (180, 30)])
+    assert slow.tobytes() == fast.tobytes()
+    assert slow.getpixel((100, 30)) == (0, 0, 0, 255)
+
+
+def test_opacity_limits_the_whole_stroke_not_each_dab():
+    image = stroke_image([(20, 30), (180, 30)], opacity=0.5, spacing=0.05)
+    values = np.asarray(image)[30, 30:170, 0]
+    assert values.min() == values.max() == 128
+
+
+def test_dabs_of_a_frame_batch_are_blended_once():
+    canvas_manager = CanvasManager(None, 200, 100, "white")
+    tools = DrawingTools(canvas_manager)
+    tools.set_size(8)
+    tools.on_button_press(10, 50)
+
+    calls = []
+    original_flush = tools.brush_stroke.flush
+    tools.brush_stroke.flush = lambda: calls.append(1) or original_flush()
+
+    canvas_manager.begin_batch()
+    for x in range(20, 120, 10):
+        tools.on_mouse_drag(x, 50)
+    assert canvas_manager.layers[0].getpixel((60, 50)) == (255, 255, 255, 255)
+    canvas_manager.end_batch()
+
+    assert calls == [1]
+    assert canvas_manager.layers[0].getpixel((60, 50)) == (0, 0, 0, 255)
+
+
+def test_coverage_is_kept_only_in_touched_blocks():
+    class SmallBlocks(BrushStroke):
+        COVERAGE_BLOCK = 16
+
+    images = []
+    for stroke_class in (BrushStroke, SmallBlocks):
+        layer = TiledLayer(200, 60, "white", tile_size=64)
+        stroke = stroke_class(layer, "black", 12, opacity=0.5, spacing=0.05)
+        for x, y in [(20, 30), (100, 20), (180, 40), (20, 30)]:
+            stroke.add_point(x, y)
+            stroke.flush()
+        stroke.finish()
+        images.append(layer.to_image().tobytes())
+    # Швы между блоками покрытия не видны: результат тот же, что при других блоках
+    assert images[0] == images[1]
+
+    layer = TiledLayer(10000, 10000, "white")
+    stroke = BrushStroke(layer, "black", 20)
+    stroke.add_point(5000, 5000)
+    stroke.add_point(5300, 5000)
+    stroke.finish()
+    assert 0 < len(stroke.coverage) <= 8
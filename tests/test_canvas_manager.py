@@ -0,0 +1,129 @@
+import pytest
+from unittest.mock import Mock, MagicMock
+from PIL import Image
+import paint_app.CanvasManager as canvas_module
+from paint_app.CanvasManager import CanvasManager
+
+
+class FakePhotoImage:
+    def __init__(self, image):
+        self.image = image
+        self.pastes = 0
+
+    def paste(self, image):
+        self.image = image
+        self.pastes += 1
+
+
+@pytest.fixture
+def canvas_manager(monkeypatch):
+    monkeypatch.setattr(canvas_module.tk, "Canvas", lambda *args, **kwargs: MagicMock())
+    monkeypatch.setattr(canvas_module.ImageTk, "PhotoImage", FakePhotoImage)
+    manager = CanvasManager(Mock(), 300, 200, "white")
+    manager.update_canvas()
+    return manager
+
+
+def test_full_update_creates_tile_grid(canvas_manager):
+    assert sorted(canvas_manager.display_tiles) == [(0, 0), (0, 1), (1, 0), (1, 1), (2, 0), (2, 1)]
+    assert canvas_manager.display_tiles[(2, 1)].image.size == (300 - 256, 200 - 128)
+
+
+def test_dirty_update_repaints_only_touched_tile(canvas_manager):
+    canvas_manager.layers[0].paste(Image.new("RGBA", (11, 11), "red"), (140, 10))
+    canvas_manager.update_canvas((140, 10, 151, 21))
+
+    pasted = {key: tile.pastes for key, tile in canvas_manager.display_tiles.items() if tile.pastes}
+    assert pasted == {(1, 0): 1}
+    assert canvas_manager.display_tiles[(1, 0)].image.getpixel((145 - 128, 15)) == (255, 0, 0)
+
+
+def test_dirty_update_outside_canvas_is_ignored(canvas_manager):
+    canvas_manager.update_canvas((400, 400, 500, 500))
+    assert all(tile.pastes == 0 for tile in canvas_manager.display_tiles.values())
+
+
+def test_composite_shows_layers_above_and_below_active():
+    manager = CanvasManager(None, 50, 50, "white")
+    manager.add_layer()
+    manager.add_layer()
+    manager.layers[0].paste(Image.new("RGBA", (1, 1), "red"), (5, 5))
+    manager.layers[2].paste(Image.new("RGBA", (1, 1), "blue"), (6, 6))
+    manager.switch_layer(1)
+
+    image = manager.get_composited_image()
+    assert image.getpixel((5, 5)) == (255, 0, 0)
+    assert image.getpixel((6, 6)) == (0, 0, 255)
+    assert image.getpixel((7, 7)) == (255, 255, 255)
+
+
+def test_drawing_on_active_layer_keeps_composite_cache():
+    manager = CanvasManager(None, 50, 50, "white")
+    manager.add_layer()
+    manager.add_layer()
+    manager.switch_layer(1)
+    manager.get_composited_image()
+    below, above = dict(manager.below_cache), dict(manager.above_cache)
+
+    manager.layers[1].paste(Image.new("RGBA", (1, 1), "green"), (10, 10))
+    assert manager.get_composited_image().getpixel((10, 10)) == (0, 128, 0)
+    assert manager.below_cache == below and manager.above_cache == above
+
+    manager.switch_layer(2)
+    assert manager.below_cache == {}
+
+
+@pytest.fixture
+def large_manager(monkeypatch):
+    monkeypatch.setattr(canvas_module.tk, "Canvas", lambda *args, **kwargs: MagicMock())
+    monkeypatch.setattr(canvas_module.ImageTk, "PhotoImage", FakePhotoImage)
+    manager = CanvasManager(Mock(), 4000, 3000, "white")
+    manager.update_canvas()
+    return manager
+
+
+def test_only_visible_tiles_are_rendered(large_manager):
+    # Окно 1200x800: 10x7 плиток вместо 32x24 на весь документ
+    assert len(large_manager.display_tiles) == 10 * 7
+    large_manager.layers[0].paste(Image.new("RGBA", (10, 10), "red"), (3000, 2000))
+    large_manager.update_canvas((3000, 2000, 3010, 2010))
+    assert all(tile.pastes == 0 for tile in large_manager.display_tiles.values())
+
+
+def test_pan_renders_only_exposed_tiles(large_manager):
+    before = set(large_manager.display_tiles)
+    large_manager.pan(128, 0)
+    after = set(large_manager.display_tiles)
+    assert after - before == {(10, y) for y in range(7)}
+    assert before - after == {(0, y) for y in range(7)}
+    assert large_manager.to_image(0, 0) == (128, 0)
+
+
+def test_zoom_out_uses_incrementally_updated_mipmap(large_manager):
+    large_manager.layers[0].paste(Image.new("RGBA", (400, 400), "blue"), (0, 0))
+    large_manager.set_zoom(1 / 4, 0, 0)
+    assert large_manager.scaled_size() == (1000, 750)
+    assert large_manager.display_tiles[(0, 0)].image.getpixel((50, 50)) == (0, 0, 255)
+    assert large_manager.display_tiles[(0, 0)].image.getpixel((110, 110)) == (255, 255, 255)
+    before = {level: dict(tiles) for level, tiles in large_manager.mipmaps.items()}
+
+    large_manager.layers[0].paste(Image.new("RGBA", (40, 40), "red"), (800, 800))
+    large_manager.update_canvas((800, 800, 840, 840))
+    # Пересчитана только одна плитка на каждом уровне
+    changed = {level: [key for key, tile in tiles.items() if before[level].get(key) is not tile]
+               for level, tiles in large_manager.mipmaps.items()}
+    assert changed == {1: [(3, 3)], 2: [(1, 1)]}
+    tile = large_manager.display_tiles[(1, 1)]
+    assert tile.pastes == 1
+    assert tile.image.getpixel((205 - 128, 205 - 128)) == (255, 0, 0)
+    assert len(large_manager.mipmaps[2]) == len(large_manager.display_tiles)
+
+
+def test_zoom_in_maps_screen_to_image(large_manager):
+    large_manager.layers[0].paste(Image.new("RGBA", (1, 1), "red"), (105, 52))
+    large_manager.set_zoom(2, 0, 0)
+    large_manager.scroll_to(200, 100)
+    assert large_manager.to_image(11, 5) == (105, 52)
+    tile = large_manager.display_tiles[(1, 0)]
+    assert tile.image.getpixel((210 - 128, 104)) == (255, 0, 0)
+    assert tile.image.getpixel((212 - 128, 104)) == (255, 255, 255)
@@ -1,17 +1,20 @@
 import pytest
 from unittest.mock import Mock, MagicMock
+from PIL import Image
 from paint_app.DrawingTools import DrawingTools
-from PIL import Image, ImageDraw
+from paint_app.TiledLayer import TiledLayer
 
 
 @pytest.fixture
 def mock_canvas_manager():
-    image = Image.new("RGB", (100, 100), "white")
+    image = TiledLayer(100, 100, "white", tile_size=32)
     canvas_manager = Mock()
     canvas_manager.image = image
+    canvas_manager.layers = [image]
+    canvas_manager.active_layer_index = 0
     canvas_manager.bg_color = "white"
-    canvas_manager.draw = ImageDraw.Draw(image)
     canvas_manager.update_canvas = MagicMock()
+    canvas_manager.defer = lambda callback: callback()
     canvas_manager.canvas = Mock()
     return canvas_manager
 
@@ -44,7 +47,7 @@ def test_drawing_line(mock_canvas_manager):
     drawing_tools.draw_line(20, 20)
 
     pixels = [mock_canvas_manager.image.getpixel((x, x)) for x in range(10, 21)]
-    assert any(p != (255, 255, 255) for p in pixels)
+    assert any(p != (255, 255, 255, 255) for p in pixels)
 
 
 def test_eraser(mock_canvas_manager):
@@ -63,7 +66,19 @@ def test_eraser(mock_canvas_manager):
     drawing_tools.on_mouse_drag(20, 20)
 
     pixels = [mock_canvas_manager.image.getpixel((x, x)) for x in range(10, 21)]
-    assert all(p == (255, 255, 255) for p in pixels)
+    # стёртые пиксели прозрачны, сквозь них виден фон холста
+    assert all(p[3] == 0 for p in pixels)
+
+
+def test_brush_reports_segment_bbox(mock_canvas_manager):
+    drawing_tools = DrawingTools(mock_canvas_manager)
+    drawing_tools.set_size(4)
+    drawing_tools.last_x, drawing_tools.last_y = 10, 30
+    drawing_tools.on_mouse_drag(20, 25)
+
+    left, upper, right, lower = mock_canvas_manager.update_canvas.call_args.args[0]
+    assert left <= 8 and upper <= 23 and right >= 22 and lower >= 32
+    assert right - left < 30 and lower - upper < 30
 
 
 def test_fill(mock_canvas_manager):
@@ -73,7 +88,7 @@ def test_fill(mock_canvas_manager):
 
     drawing_tools.on_button_press(50, 50)
     pixel = mock_canvas_manager.image.getpixel((50, 50))
-    assert pixel == (0, 0, 255)
+    assert pixel == (0, 0, 255, 255)
 
 
 def test_gauss_blur(mock_canvas_manager):
@@ -140,7 +155,7 @@ def test_on_button_release(mock_canvas_manager):
     tools.on_button_release(30, 40)
 
     pixel = mock_canvas_manager.image.getpixel((20, 30))
-    assert pixel != (255, 255, 255)  # белый фон
+    assert pixel != (255, 255, 255, 255)  # белый фон
 
 
 def test_draw_rectangle(mock_canvas_manager):
@@ -151,7 +166,7 @@ def test_draw_rectangle(mock_canvas_manager):
     tools.draw_rectangle(30, 30)
 
     pixel = mock_canvas_manager.image.getpixel((10, 10))
-    assert pixel != (255, 255, 255)
+    assert pixel != (255, 255, 255, 255)
 
 
 def test_draw_circle(mock_canvas_manager):
@@ -162,4 +177,120 @@ def test_draw_circle(mock_canvas_manager):
     tools.draw_circle(60, 50)
 
     pixel = mock_canvas_manager.image.getpixel((60, 50))
-    assert pixel != (255, 255, 255)
+    assert pixel != (255, 255, 255, 255)
+
+
+def test_fill_reports_bbox_and_samples_merged(mock_canvas_manager):
+    drawing_tools = DrawingTools(mock_canvas_manager)
+    drawing_tools.set_tool("fill")
+    drawing_tools.set_color("black")
+    drawing_tools.set_size(3)
+    drawing_tools.start_x, drawing_tools.start_y = 10, 10
+    drawing_tools.draw_rectangle(30, 30)
+    drawing_tools.set_color("red")
+
+    assert drawing_tools.flood_fill(20, 20) == (13, 13, 28, 28)
+    assert mock_canvas_manager.update_canvas.call_args.args[0] == (13, 13, 28, 28)
+
+    # Сведённое изображение запрашивается по тайлам
+    mock_canvas_manager.get_composited_image.side_effect = (
+        lambda box: Image.new("RGB", (box[2] - box[0], box[3] - box[1]), "white"))
+    drawing_tools.set_fill_options(sample_merged=True)
+    drawing_tools.set_color("blue")
+    assert drawing_tools.flood_fill(20, 20) == (0, 0, 100, 100)
+
+
+def test_fill_grows_over_tiles_without_whole_layer_image(mock_canvas_manager, monkeypatch):
+    from PIL import ImageChops, ImageDraw
+
+    layer = TiledLayer(100, 100, "white", tile_size=32)
+    image = Image.new("RGBA", (100, 100), "white")
+    ImageDraw.Draw(image).ellipse([10, 20, 90, 70], outline="black")
+    layer.paste(image)
+    # Сетка сдвинута, как после обрезки холста слева и сверху
+    layer.resize(90, 85, -7, -11)
+    mock_canvas_manager.layers = [layer]
+    before = layer.to_image()
+    expected = before.copy()
+    ImageDraw.floodfill(expected, (40, 30), (0, 0, 255, 255))
+    monkeypatch.setattr(TiledLayer, "to_image", Mock(side_effect=AssertionError("слой собран целиком")))
+
+    drawing_tools = DrawingTools(mock_canvas_manager)
+    drawing_tools.set_color("blue")
+    bbox = drawing_tools.flood_fill(40, 30)
+    assert layer.crop((0, 0, 90, 85)).tobytes() == expected.tobytes()
+    assert bbox == ImageChops.difference(before, expected).convert("RGB").getbbox()
+
+
+def test_fill_of_blank_tiles_shares_one_uniform_tile():
+    from paint_app.CanvasManager import CanvasManager
+
+    canvas_manager = CanvasManager(None, 3000, 3000, "white")
+    drawing_tools = DrawingTools(canvas_manager)
+    drawing_tools.set_color("red")
+    assert drawing_tools.flood_fill(5, 5) == (0, 0, 3000, 3000)
+
+    layer = canvas_manager.layers[0]
+    inner = [layer.tiles[(x, y)] for x in range(11) for y in range(11)]
+    assert all(tile is inner[0] for tile in inner)
+    assert layer.getpixel((2999, 2999)) == (255, 0, 0, 255)
+    assert layer.tiles[(11, 11)].getpixel((255, 255)) == (255, 255, 255, 255)
+
+
+def blur_stroke_result(points):
+    from paint_app.CanvasManager import CanvasManager
+
+    canvas_manager = CanvasManager(None, 120, 60, "white")
+    tools = DrawingTools(canvas_manager)
+    tools.set_color("black")
+    tools.set_size(3)
+    for x in range(0, 120, 8):
+        tools.start_x, tools.start_y = x, 0
+        tools.draw_line(x, 59)
+    tools.set_tool("gauss")
+    tools.set_size(20)
+    tools.on_button_press(*points[0])
+    for x, y in points[1:]:
+        tools.on_mouse_drag(x, y)
+    tools.on_button_release(*points[-1])
+    return canvas_manager.layers[0].to_image()
+
+
+def test_gauss_stroke_does_not_depend_on_mouse_speed():
+    slow = blur_stroke_result([(x, 30) for x in range(20, 101)])
+    fast = blur_stroke_result([(20, 30), (60, 30), (100, 30)])
+    # Проход туда и обратно не размывает одни и те же пиксели второй раз
+    back_and_forth = blur_stroke_result([(20, 30), (100, 30), (20, 30), (100, 30)])
+
+    assert slow.tobytes() == fast.tobytes() == back_and_forth.tobytes()
+    assert slow.getpixel((60, 30)) != (0, 0, 0, 255)
+    assert slow.getpixel((60, 5)) in [(0, 0, 0, 255), (255, 255, 255, 255)]
+
+
+def test_gauss_stroke_tracks_only_touched_blocks():
+    from paint_app.CanvasManager import CanvasManager
+
+    canvas_manager = CanvasManager(None, 10000, 10000, "white")
+    tools = DrawingTools(canvas_manager)
+    tools.set_tool("gauss")
+    tools.set_size(20)
+    tools.on_button_press(5000, 5000)
+    tools.on_mouse_drag(5200, 5000)
+    # Отметки размытых пикселей — маски блоков вдоль мазка, а не массив на весь документ
+    done_blocks = tools.blur_stroke[2]
+    assert 0 < len(done_blocks) <= 10
+    assert all(mask.shape == (tools.BLUR_BLOCK_SIZE, tools.BLUR_BLOCK_SIZE) for mask in done_blocks.values())
+
+
+def test_filter_area_covers_whole_layer_or_box(mock_canvas_manager):
+    tools = DrawingTools(mock_canvas_manager)
+    layer = mock_canvas_manager.image
+    layer.paste(Image.new("RGBA", (100, 100), (200, 40, 10, 255)), (0, 0))
+
+    assert tools.filter_area("grayscale", (10, 10, 30, 30)) == (10, 10, 30, 30)
+    assert layer.getpixel((20, 20)) == (84, 84, 84, 255)
+    assert layer.getpixel((40, 40)) == (200, 40, 10, 255)
+    mock_canvas_manager.update_canvas.assert_called_with((10, 10, 30, 30))
+
+    assert tools.filter_area("grayscale") == (0, 0, 100, 100)
+    assert layer.getpixel((99, 99)) == (84, 84, 84, 255)
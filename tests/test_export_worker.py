@@ -0,0 +1,62 @@
+import threading
+from PIL import Image
+from paint_app.CanvasManager import CanvasManager
+from paint_app.ExportWorker import ExportWorker
+
+
+class BlockingDocument:
+    # Документ, сведение которого стоит, пока тест не разрешит продолжить
+    width = height = 8
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def iter_composited_bands(self, band_height):
+        for top in range(0, self.height, 4):
+            self.started.set()
+            self.release.wait(5)
+            yield top, Image.new("RGB", (self.width, 4), "red")
+
+
+def test_export_uses_snapshot_while_painting_continues(tmp_path):
+    manager = CanvasManager(None, 300, 600, "white")
+    manager.layers[0].paste(Image.new("RGBA", (10, 10), "red"), (5, 500))
+    snapshot = manager.snapshot()
+    manager.layers[0].paste(Image.new("RGBA", (10, 10), "blue"), (5, 500))
+
+    worker = ExportWorker()
+    job = worker.submit(snapshot, str(tmp_path / "out.png"))
+    assert job.finished.wait(5)
+    assert job.state == "done" and job.progress == 1.0
+    with Image.open(tmp_path / "out.png") as saved:
+        assert saved.size == (300, 600)
+        assert saved.getpixel((8, 505)) == (255, 0, 0)
+    assert manager.layers[0].getpixel((8, 505)) == (0, 0, 255, 255)
+    assert not (tmp_path / "out.png.part").exists()
+
+
+def test_saves_to_the_same_file_are_coalesced(tmp_path):
+    worker = ExportWorker()
+    blocking = BlockingDocument()
+    first = worker.submit(blocking, str(tmp_path / "a.png"))
+    assert blocking.started.wait(5)
+
+    queued = worker.submit(BlockingDocument(), str(tmp_path / "b.png"))
+    latest = worker.submit(CanvasManager(None, 8, 8, "white"), str(tmp_path / "b.png"))
+    restarted = worker.submit(CanvasManager(None, 8, 8, "green"), str(tmp_path / "a.png"))
+    assert queued.state == "cancelled"
+
+    blocking.release.set()
+    assert worker.wait(5)
+    assert first.state == "cancelled"
+    assert latest.state == "done" and restarted.state == "done"
+    with Image.open(tmp_path / "a.png") as saved:
+        assert saved.getpixel((0, 0)) == (0, 128, 0)
+
+
+def test_failed_export_reports_error(tmp_path):
+    worker = ExportWorker()
+    job = worker.submit(CanvasManager(None, 8, 8, "white"), str(tmp_path / "missing" / "out.png"))
+    assert job.finished.wait(5)
+    assert job.state == "failed" and job.error is not None
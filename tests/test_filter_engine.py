@@ -0,0 +1,105 @@
+import random
+
+import numpy as np
+import pytest
+from PIL import Image
+from paint_app.FilterEngine import FilterEngine, grayscale_table
+
+
+# Эталон: прежние попиксельные реализации фильтров из DrawingTools
+def reference_grayscale(region):
+    result = region.copy()
+    pixels = result.load()
+    for i in range(result.width):
+        for j in range(result.height):
+            r, g, b, a = pixels[i, j]
+            gray = int(0.299 * r + 0.587 * g + 0.114 * b)
+            pixels[i, j] = (gray, gray, gray, a)
+    return result
+
+
+def reference_sharpen(region, amount=1.5):
+    pixels = region.convert("RGB").load()
+    width, height = region.size
+    result = Image.new("RGB", (width, height))
+    for i in range(width):
+        for j in range(height):
+            r, g, b = pixels[i, j]
+            neighbors = [pixels[nx, ny] for nx, ny in ((i - 1, j), (i + 1, j), (i, j - 1), (i, j + 1))
+                         if 0 <= nx < width and 0 <= ny < height]
+            if neighbors:
+                nr, ng, nb = (sum(n[c] for n in neighbors) / len(neighbors) for c in range(3))
+            else:
+                nr, ng, nb = r, g, b
+            result.putpixel((i, j), tuple(max(0, min(255, int(v + amount * (v - n))))
+                                          for v, n in ((r, nr), (g, ng), (b, nb))))
+    return result
+
+
+def random_region(width, height, seed):
+    rng = random.Random(seed)
+    return Image.frombytes("RGBA", (width, height), bytes(rng.randrange(256) for _ in range(width * height * 4)))
+
+
+@pytest.mark.parametrize("size", [(1, 1), (17, 23), (40, 40)])
+def test_grayscale_matches_reference(size):
+    region = random_region(*size, seed=7)
+    result = FilterEngine.grayscale(region)
+    assert result.mode == "RGBA"
+    assert result.tobytes() == reference_grayscale(region).tobytes()
+
+
+@pytest.mark.parametrize("size", [(1, 1), (17, 23), (40, 40)])
+def test_grayscale_table_matches_reference(size, monkeypatch):
+    monkeypatch.setattr(FilterEngine, "GRAYSCALE_TABLE_PIXELS", 0)
+    region = random_region(*size, seed=7)
+    assert FilterEngine.grayscale(region).tobytes() == reference_grayscale(region).tobytes()
+    rgb = region.convert("RGB")
+    assert FilterEngine.grayscale(rgb).tobytes() == reference_grayscale(region).convert("RGB").tobytes()
+
+
+def test_brush_sized_grayscale_does_not_build_the_table():
+    grayscale_table.cache_clear()
+    FilterEngine.grayscale(random_region(40, 40, seed=3))
+    assert grayscale_table.cache_info().currsize == 0
+
+
+@pytest.mark.parametrize("size", [(1, 1), (1, 5), (17, 23), (40, 40)])
+def test_sharpen_matches_reference(size):
+    region = random_region(*size, seed=11)
+    assert FilterEngine.sharpen(region).tobytes() == reference_sharpen(region).tobytes()
+
+
+def reference_gaussian_blur(region, sigma):
+    # Прямая двумерная свёртка с тем же ядром и повтором крайних пикселей
+    from paint_app.FilterEngine import gaussian_kernel
+
+    pixels = np.asarray(region.convert("RGB"), dtype=np.float64)
+    kernel = gaussian_kernel(float(sigma)).astype(np.float64)
+    radius = len(kernel) // 2
+    padded = np.pad(pixels, ((radius, radius), (radius, radius), (0, 0)), mode="edge")
+    result = np.zeros_like(pixels)
+    height, width = pixels.shape[:2]
+    for dy, wy in enumerate(kernel):
+        for dx, wx in enumerate(kernel):
+            result += wy * wx * padded[dy:dy + height, dx:dx + width]
+    return np.rint(result)
+
+
+@pytest.mark.parametrize("sigma", [0.8, 2.0, 4.5])
+def test_gaussian_blur_matches_direct_convolution(sigma):
+    region = random_region(30, 21, seed=5).convert("RGB")
+    result = np.asarray(FilterEngine.gaussian_blur(region, sigma), dtype=np.float64)
+    assert np.abs(result - reference_gaussian_blur(region, sigma)).max() <= 1
+
+
+def test_gaussian_blur_keeps_uniform_and_ignores_transparent_colour():
+    uniform = Image.new("RGBA", (20, 20), (10, 200, 30, 255))
+    assert FilterEngine.gaussian_blur(uniform, 3).tobytes() == uniform.tobytes()
+
+    # Прозрачные пиксели с чёрным цветом не должны затемнять непрозрачные соседние
+    region = Image.new("RGBA", (20, 20), (0, 0, 0, 0))
+    region.paste((255, 255, 255, 255), (0, 0, 10, 20))
+    result = FilterEngine.gaussian_blur(region, 2)
+    assert result.getpixel((9, 10))[:3] == (255, 255, 255)
+    assert 0 < result.getpixel((9, 10))[3] < 255
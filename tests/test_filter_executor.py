@@ -0,0 +1,72 @@
+import os
+import pytest
+from PIL import Image
+from paint_app.FilterExecutor import FilterExecutor, filter_region
+from paint_app.TiledLayer import TiledLayer
+
+
+@pytest.fixture
+def executor():
+    executor = FilterExecutor(workers=2)
+    executor.TILE_SIZE = 64
+    yield executor
+    executor.shutdown()
+
+
+def make_layer():
+    layer = TiledLayer(300, 200, "white")
+    layer.paste(Image.effect_noise((300, 200), 60).convert("RGBA"), (0, 0))
+    layer.paste(Image.new("RGBA", (80, 50), (255, 0, 0, 128)), (100, 60))
+    return layer
+
+
+def shared_segments():
+    # Только буферы SharedMemory: семафоры пула (forkserver) живут, пока жив пул
+    if not os.path.isdir("/dev/shm"):
+        return set()
+    return {name for name in os.listdir("/dev/shm") if name.startswith("psm_")}
+
+
+@pytest.mark.parametrize("name, params", [("gauss", {"sigma": 2.0}), ("grayscale", {}), ("sharpen", {})])
+def test_tiled_result_matches_single_pass(executor, name, params):
+    layer = make_layer()
+    box = (20, 10, 290, 190)
+    before = shared_segments()
+    job = executor.submit(layer, name, params, box)
+    assert job.finished.wait(30)
+    assert job.state == "done" and job.progress == 1.0
+    assert job.result.tobytes() == filter_region(layer, name, params, box).tobytes()
+    # Снимок слоя отдан, общая память освобождена
+    assert job.layer is None
+    assert shared_segments() <= before
+
+
+def test_layer_changes_after_submit_do_not_leak_into_result(executor):
+    layer = make_layer()
+    expected = filter_region(layer, "grayscale", {}, (0, 0, 300, 200))
+    job = executor.submit(layer, "grayscale", {}, (0, 0, 300, 200))
+    layer.paste(Image.new("RGBA", (300, 200), "blue"), (0, 0))
+    assert job.finished.wait(30)
+    assert job.result.tobytes() == expected.tobytes()
+
+
+def test_cancelled_job_has_no_result(executor):
+    layer = make_layer()
+    first = executor.submit(layer, "gauss", {"sigma": 3.0}, (0, 0, 300, 200))
+    second = executor.submit(layer, "sharpen", {}, (0, 0, 300, 200))
+    first.cancel()
+    second.cancel()
+    assert executor.wait(30)
+    assert first.state == second.state == "cancelled"
+    assert first.result is None and second.result is None
+
+
+def test_unknown_filter_is_rejected(executor):
+    with pytest.raises(ValueError):
+        executor.submit(make_layer(), "emboss", {}, (0, 0, 10, 10))
+
+
+def test_pool_processes_are_not_forked_from_the_threaded_process(executor):
+    job = executor.submit(make_layer(), "grayscale", {}, (0, 0, 100, 100))
+    assert job.finished.wait(30) and job.state == "done"
+    assert executor.pool._mp_context.get_start_method() in ("forkserver", "spawn")
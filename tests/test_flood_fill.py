@@ -0,0 +1,98 @@
+import random
+
+import numpy as np
+from PIL import Image, ImageDraw
+from paint_app.FloodFill import FloodFill
+
+
+def make_maze(size=64, seed=3):
+    rng = random.Random(seed)
+    image = Image.new("RGBA", (size, size), (255, 255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    for _ in range(40):
+        x, y = rng.randrange(size), rng.randrange(size)
+        draw.line([x, y, x + rng.randrange(-20, 20), y + rng.randrange(-20, 20)], fill=(0, 0, 0, 255), width=2)
+    return image
+
+
+def fill_with(image, x, y, color, **options):
+    pixels = np.array(image)
+    mask, bbox = FloodFill.region(pixels, x, y, **options)
+    region = pixels[bbox[1]:bbox[3], bbox[0]:bbox[2]]
+    region[mask] = color
+    return Image.fromarray(pixels, "RGBA"), bbox
+
+
+def test_matches_imagedraw_floodfill_exactly():
+    image = make_maze()
+    for x, y in [(0, 0), (31, 31), (63, 10)]:
+        if image.getpixel((x, y)) != (255, 255, 255, 255):
+            continue
+        expected = image.copy()
+        ImageDraw.floodfill(expected, (x, y), (255, 0, 0, 255))
+        result, bbox = fill_with(image, x, y, (255, 0, 0, 255))
+
+        assert np.array_equal(np.array(result), np.array(expected))
+        changed = Image.fromarray((np.array(result) != np.array(image)).any(axis=2))
+        assert changed.getbbox() == bbox
+
+
+def test_tolerance_covers_all_rgba_channels():
+    image = Image.new("RGBA", (10, 1), (100, 100, 100, 255))
+    image.putpixel((3, 0), (108, 100, 100, 255))
+    image.putpixel((6, 0), (100, 100, 100, 240))
+
+    _, exact = fill_with(image, 0, 0, (0, 0, 0, 255))
+    assert exact == (0, 0, 3, 1)
+    _, loose = fill_with(image, 0, 0, (0, 0, 0, 255), tolerance=10)
+    assert loose == (0, 0, 6, 1)
+    _, looser = fill_with(image, 0, 0, (0, 0, 0, 255), tolerance=15)
+    assert looser == (0, 0, 10, 1)
+
+
+def test_non_contiguous_fills_every_match():
+    image = Image.new("RGBA", (20, 20), (255, 255, 255, 255))
+    ImageDraw.Draw(image).rectangle([5, 0, 6, 19], fill=(0, 0, 0, 255))
+
+    result, bbox = fill_with(image, 0, 0, (0, 0, 255, 255), contiguous=False)
+    assert bbox == (0, 0, 20, 20)
+    assert result.getpixel((15, 10)) == (0, 0, 255, 255)
+    assert result.getpixel((5, 10)) == (0, 0, 0, 255)
+
+    result, bbox = fill_with(image, 0, 0, (0, 0, 255, 255))
+    assert bbox == (0, 0, 5, 20)
+    assert result.getpixel((15, 10)) == (255, 255, 255, 255)
+
+
+def test_seed_outside_image_does_nothing():
+    assert FloodFill.region(np.zeros((5, 5, 4), dtype=np.uint8), 7, 2) is None
+
+
+def test_tiled_region_matches_whole_image_region():
+    image = make_maze(size=100, seed=5)
+    pixels = np.array(image)
+    size = 16
+    # Сетка сдвинута: область начинается не на границе тайла
+    offset = 5
+    grid = np.zeros((128, 128, 4), dtype=np.uint8)
+    grid[offset:offset + 100, offset:offset + 100] = pixels
+
+    def read_tile(key):
+        return grid[key[1] * size:(key[1] + 1) * size, key[0] * size:(key[0] + 1) * size]
+
+    area = (offset, offset, offset + 100, offset + 100)
+    for x, y, options in [(0, 0, {}), (50, 50, {}), (99, 7, {"tolerance": 30}), (3, 3, {"contiguous": False})]:
+        expected = FloodFill.region(pixels, x, y, **options)
+        found = FloodFill.tiled_region(read_tile, size, area, x + offset, y + offset, **options)
+        if expected is None:
+            assert found is None
+            continue
+        mask, bbox = expected
+        masks, tiled_bbox = found
+        assert tiled_bbox == (bbox[0] + offset, bbox[1] + offset, bbox[2] + offset, bbox[3] + offset)
+        assembled = np.zeros((128, 128), dtype=bool)
+        for (tile_x, tile_y), tile_mask in masks.items():
+            assembled[tile_y * size:(tile_y + 1) * size, tile_x * size:(tile_x + 1) * size] = tile_mask
+        full = np.zeros((128, 128), dtype=bool)
+        full[tiled_bbox[1]:tiled_bbox[3], tiled_bbox[0]:tiled_bbox[2]] = mask
+        assert np.array_equal(assembled, full)
@@ -0,0 +1,53 @@
+from unittest.mock import Mock
+from PIL import Image, ImageDraw
+from paint_app.DrawingTools import DrawingTools
+from paint_app.FontCache import FontCache, FONT_PATHS
+from paint_app.TiledLayer import TiledLayer
+
+
+def test_cached_text_matches_imagedraw_text():
+    cache = FontCache()
+    tools = DrawingTools(Mock())
+    layer = TiledLayer(200, 100, "white", tile_size=64)
+    tools.canvas_manager.layers = [layer]
+    tools.canvas_manager.active_layer_index = 0
+    tools.font_cache = cache
+    tools.set_color("blue")
+    tools.current_text_size = 20
+
+    for _ in range(2):
+        bbox = tools.draw_text(37, 41, "Подпись 42")
+    expected = Image.new("RGBA", (200, 100), "white")
+    for _ in range(2):
+        ImageDraw.Draw(expected).text((37, 41), "Подпись 42", fill="blue", font=cache.font(20))
+    assert layer.to_image().tobytes() == expected.tobytes()
+    # Перерисовывается только рамка надписи
+    assert bbox == cache.text_bbox(37, 41, "Подпись 42", 20)
+    tools.canvas_manager.update_canvas.assert_called_with(bbox)
+    assert (cache.misses, cache.hits) == (1, 2)
+
+
+def test_caches_evict_least_recently_used():
+    cache = FontCache(max_fonts=2, max_layouts=2)
+    first = cache.font(10)
+    cache.font(11)
+    assert cache.font(10) is first
+    cache.font(12)
+    assert [size for _, size in cache.fonts] == [10, 12]
+
+    cache.layout("a", 10)
+    cache.layout("b", 10)
+    cache.layout("a", 10)
+    cache.layout("c", 10)
+    assert [text for _, _, text in cache.layouts] == ["a", "c"]
+
+
+def test_font_paths_from_environment_come_first(monkeypatch, tmp_path):
+    missing = str(tmp_path / "missing.ttf")
+    monkeypatch.setenv("PAINT_FONTS", missing)
+    cache = FontCache()
+    assert cache.font_paths == [missing] + FONT_PATHS
+    # Ненайденные пути пропускаются; без единого найденного — встроенный шрифт
+    fallback = FontCache([missing])
+    assert fallback.font(16).getbbox("Ag")[3] > 10
+    assert fallback.default_face is None
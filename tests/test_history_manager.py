@@ -0,0 +1,197 @@
+from PIL import Image
+from paint_app.CanvasManager import CanvasManager
+from paint_app.DrawingTools import DrawingTools
+from paint_app.HistoryManager import HistoryManager
+
+
+def make_history(width=1000, height=1000, **kwargs):
+    canvas_manager = CanvasManager(None, width, height, "white")
+    return canvas_manager, HistoryManager(canvas_manager, **kwargs)
+
+
+def paint(canvas_manager, color, position, size=(10, 10)):
+    layer = canvas_manager.layers[canvas_manager.active_layer_index]
+    layer.paste(Image.new("RGBA", size, color), position)
+
+
+def test_entry_stores_only_touched_tiles():
+    canvas_manager, history = make_history(4000, 4000)
+    history.save_state()
+    paint(canvas_manager, "red", (10, 10))
+    history.commit()
+
+    entry = history.history[-1]
+    assert [list(changes) for _, changes in entry.tile_changes] == [[(0, 0)]]
+    assert entry.nbytes == 256 * 256 * 4
+
+
+def test_undo_and_redo_restore_pixels():
+    canvas_manager, history = make_history()
+    history.save_state()
+    paint(canvas_manager, "red", (10, 10))
+    history.save_state()
+    paint(canvas_manager, "blue", (10, 10))
+    history.commit()
+
+    history.undo()
+    assert canvas_manager.layers[0].getpixel((15, 15)) == (255, 0, 0, 255)
+    history.undo()
+    assert canvas_manager.layers[0].getpixel((15, 15)) == (255, 255, 255, 255)
+    history.redo()
+    history.redo()
+    assert canvas_manager.layers[0].getpixel((15, 15)) == (0, 0, 255, 255)
+
+
+def test_new_edit_clears_redo():
+    canvas_manager, history = make_history()
+    paint(canvas_manager, "red", (10, 10))
+    history.undo()
+    paint(canvas_manager, "blue", (500, 500))
+    history.commit()
+
+    assert history.redo_history == []
+    history.redo()
+    assert canvas_manager.layers[0].getpixel((15, 15)) == (255, 255, 255, 255)
+
+
+def test_layer_add_and_resize_are_undoable():
+    canvas_manager, history = make_history()
+    canvas_manager.add_layer()
+    paint(canvas_manager, "red", (990, 990))
+    history.commit()
+    canvas_manager.resize_canvas(500, 500)
+    history.commit()
+
+    history.undo()
+    assert (canvas_manager.width, canvas_manager.height) == (1000, 1000)
+    assert canvas_manager.layers[1].getpixel((995, 995)) == (255, 0, 0, 255)
+    history.undo()
+    assert len(canvas_manager.layers) == 1
+    history.redo()
+    assert len(canvas_manager.layers) == 2 and canvas_manager.active_layer_index == 1
+
+
+def test_byte_budget_evicts_oldest_entries():
+    canvas_manager, history = make_history(2000, 2000, max_bytes=3 * 256 * 256 * 4)
+    for index in range(5):
+        paint(canvas_manager, "red", (index * 300, 0))
+        history.commit()
+
+    assert len(history.history) == 3
+    assert history.used_bytes <= history.max_bytes
+    assert history.used_bytes == sum(entry.nbytes for entry in history.history)
+
+
+def test_old_entries_are_compressed_and_spilled():
+    canvas_manager, history = make_history(2000, 2000, hot_entries=1, spill_bytes=0, background=False)
+    colors = ["red", "green", "blue"]
+    for color in colors:
+        paint(canvas_manager, color, (10, 10))
+        history.commit()
+
+    history.compact()
+    report = history.memory_report()
+    assert [entry.state for entry in history.history] == ["spilled", "spilled", "hot"]
+    assert report["spilled_bytes"] > 0 and report["compressed_bytes"] == 0
+    assert report["hot_bytes"] == history.history[-1].hot_bytes
+    assert history.used_bytes == sum(entry.nbytes for entry in history.history)
+
+    history.undo()
+    history.undo()
+    assert canvas_manager.layers[0].getpixel((15, 15)) == (255, 0, 0, 255)
+    history.undo()
+    assert canvas_manager.layers[0].getpixel((15, 15)) == (255, 255, 255, 255)
+    history.redo()
+    assert canvas_manager.layers[0].getpixel((15, 15)) == (255, 0, 0, 255)
+
+
+def test_scratch_file_is_rewritten_when_mostly_dead():
+    canvas_manager, history = make_history(2000, 2000, hot_entries=1, spill_bytes=0, background=False)
+    colors = ["red", "green", "blue"]
+    for index in range(30):
+        # Три шага, сжатие и две отмены: отменённые шаги забываются следующей правкой
+        for color in colors:
+            paint(canvas_manager, color, (index * 37 % 1500, index * 53 % 1500), size=(300, 300))
+            history.commit()
+        history.compact()
+        history.undo()
+        history.undo()
+        # Файл подкачки не растёт вслед за сеансом: мёртвых байтов в нём не больше половины
+        report = history.memory_report()
+        assert history.scratch.dead <= report["scratch_file_bytes"] * history.SCRATCH_DEAD_RATIO
+        assert report["scratch_file_bytes"] - history.scratch.dead == report["spilled_bytes"]
+    assert history.memory_report()["spilled_bytes"] > 0
+
+    # После переписывания смещения тайлов по-прежнему верные
+    final = canvas_manager.layers[0].to_image().tobytes()
+    steps = len(history.history)
+    for _ in range(steps):
+        history.undo()
+    for _ in range(steps):
+        history.redo()
+    assert canvas_manager.layers[0].to_image().tobytes() == final
+
+
+def test_compression_reduces_memory_of_old_entries():
+    canvas_manager, history = make_history(2000, 2000, hot_entries=1, background=False)
+    for color in ["red", "blue", "green"]:
+        paint(canvas_manager, color, (0, 0), size=(1024, 256))
+        history.commit()
+    old_bytes = history.used_bytes - history.history[-1].nbytes
+
+    history.compact()
+    assert history.memory_report()["compressed_bytes"] > 0
+    assert history.used_bytes - history.history[-1].nbytes < old_bytes / 10
+
+
+def test_layer_property_change_is_undoable():
+    canvas_manager, history = make_history(100, 100, background=False)
+    canvas_manager.add_layer()
+    history.commit()
+
+    canvas_manager.set_layer_properties(1, name="Тени", opacity=0.4, blend_mode="multiply")
+    history.commit()
+    assert canvas_manager.layers[1].properties() == ("Тени", True, 0.4, "multiply")
+
+    history.undo()
+    assert canvas_manager.layers[1].properties() == ("Слой 2", True, 1.0, "normal")
+    history.redo()
+    assert canvas_manager.layers[1].properties() == ("Тени", True, 0.4, "multiply")
+
+
+def test_crop_from_top_left_is_undoable():
+    canvas_manager, history = make_history()
+    paint(canvas_manager, "red", (300, 300))
+    history.commit()
+    canvas_manager.add_layer()
+    history.commit()
+    canvas_manager.resize_canvas(400, 400, -290, -290)
+    history.commit()
+    assert canvas_manager.get_composited_image().getpixel((15, 15)) == (255, 0, 0)
+    assert canvas_manager.layers[0].nbytes == 256 * 256 * 4
+
+    history.undo()
+    assert (canvas_manager.width, canvas_manager.height, canvas_manager.origin) == (1000, 1000, (0, 0))
+    assert canvas_manager.get_composited_image().getpixel((305, 305)) == (255, 0, 0)
+    history.redo()
+    assert canvas_manager.origin == (-290, -290)
+    # Новый слой рисует по той же сетке
+    canvas_manager.add_layer()
+    paint(canvas_manager, "blue", (0, 0))
+    assert canvas_manager.get_composited_image().getpixel((5, 5)) == (0, 0, 255)
+
+
+def test_whole_layer_filter_is_one_undo_step():
+    canvas_manager, history = make_history(600, 600)
+    paint(canvas_manager, "red", (0, 0), (600, 600))
+    history.commit()
+    tools = DrawingTools(canvas_manager)
+    history.save_state()
+    tools.filter_area("grayscale")
+    history.commit()
+    assert canvas_manager.layers[0].getpixel((599, 599)) == (76, 76, 76, 255)
+
+    history.undo()
+    assert canvas_manager.layers[0].getpixel((599, 599)) == (255, 0, 0, 255)
+    history.redo()
+    assert canvas_manager.layers[0].getpixel((0, 0)) == (76, 76, 76, 255)
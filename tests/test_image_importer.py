@@ -0,0 +1,115 @@
+import threading
+import pytest
+from unittest.mock import Mock, MagicMock
+from PIL import Image
+import paint_app.CanvasManager as canvas_module
+from paint_app.CanvasManager import CanvasManager
+from paint_app.ImageImporter import ImageImporter
+
+
+class FakePhotoImage:
+    def __init__(self, image):
+        self.image = image
+
+    def paste(self, image):
+        self.image = image
+
+
+def close_to(pixel, expected, tolerance=8):
+    return all(abs(a - b) <= tolerance for a, b in zip(pixel, expected))
+
+
+def test_headless_open_replaces_document(tmp_path):
+    path = str(tmp_path / "photo.png")
+    image = Image.new("RGB", (700, 300), "blue")
+    image.paste(Image.new("RGB", (100, 100), "red"), (600, 200))
+    image.save(path)
+
+    manager = CanvasManager(None, 800, 600, "white")
+    job = ImageImporter(manager).open(path)
+    assert (manager.width, manager.height) == (700, 300)
+    assert [layer.name for layer in manager.layers] == ["photo"]
+    assert job.layer is manager.layers[0]
+    composite = manager.get_composited_image()
+    assert composite.getpixel((10, 10)) == (0, 0, 255)
+    assert composite.getpixel((650, 250)) == (255, 0, 0)
+
+
+def test_import_as_layer_keeps_document_size(tmp_path):
+    path = str(tmp_path / "stamp.png")
+    Image.new("RGBA", (50, 40), (255, 0, 0, 128)).save(path)
+
+    manager = CanvasManager(None, 300, 200, "white")
+    ImageImporter(manager).open(path, as_layer=True)
+    assert (manager.width, manager.height) == (300, 200)
+    assert len(manager.layers) == 2 and manager.layers[1].name == "stamp"
+    composite = manager.get_composited_image()
+    assert close_to(composite.getpixel((10, 10)), (255, 127, 127), 1)
+    assert composite.getpixel((100, 100)) == (255, 255, 255)
+
+
+@pytest.fixture
+def windowed_manager(monkeypatch):
+    monkeypatch.setattr(canvas_module.tk, "Canvas", lambda *args, **kwargs: MagicMock())
+    monkeypatch.setattr(canvas_module.ImageTk, "PhotoImage", FakePhotoImage)
+    manager = CanvasManager(Mock(), 800, 600, "white")
+    manager.update_canvas()
+    return manager
+
+
+def test_large_jpeg_shows_draft_preview_then_loads_in_background(tmp_path, windowed_manager):
+    path = str(tmp_path / "large.jpg")
+    image = Image.new("RGB", (3000, 2000), (200, 30, 30))
+    image.paste(Image.new("RGB", (1500, 2000), (30, 30, 200)), (1500, 0))
+    image.save(path, quality=90)
+
+    importer = ImageImporter(windowed_manager)
+    # Поток декодирования ждёт, пока тест не проверит превью
+    release = threading.Event()
+    decode = importer._decode
+    importer._decode = lambda job: (release.wait(), decode(job))
+    job = importer.open(path)
+
+    manager = windowed_manager
+    assert (manager.width, manager.height) == (3000, 2000)
+    # 3000x2000 в окне 800x600 — масштаб 1/4, второй уровень мипмапа уже заполнен превью
+    assert manager.zoom == 1 / 4 and job.levels == 2
+    assert importer.is_loading(manager.layers[0])
+    assert manager.layers[0].nbytes == 0
+    assert close_to(manager.display_tiles[(0, 0)].image.getpixel((10, 10)), (200, 30, 30))
+    assert close_to(manager.display_tiles[(5, 0)].image.getpixel((100, 10)), (30, 30, 200))
+
+    release.set()
+    job.done.wait(10)
+    importer._poll()
+    assert not importer.is_loading(manager.layers[0])
+    assert job.error is None
+    assert close_to(manager.layers[0].getpixel((2900, 1900)), (30, 30, 200, 255))
+    # Пирамида пришла из потока импорта целиком, без сведения в потоке Tk
+    assert set(manager.mipmaps) == {1, 2}
+    assert manager.mipmaps[1][(0, 0)].size == (128, 128)
+    assert close_to(manager.display_tiles[(0, 0)].image.getpixel((10, 10)), (200, 30, 30))
+
+
+def test_canvas_resized_while_loading_moves_the_imported_tiles(tmp_path, windowed_manager):
+    path = str(tmp_path / "large.png")
+    image = Image.new("RGB", (2500, 2000), "red")
+    image.paste(Image.new("RGB", (100, 100), "blue"), (1000, 1000))
+    image.save(path)
+
+    importer = ImageImporter(windowed_manager)
+    job = importer.open(path)
+    job.done.wait(10)
+
+    manager = windowed_manager
+    # Тайлы уже нарезаны, но ещё не вклеены, а холст обрезают слева и сверху на 300x200
+    manager.resize_canvas(1000, 1000, -300, -200)
+    importer._poll()
+
+    layer = manager.layers[0]
+    assert job.error is None
+    assert layer.getpixel((699, 799)) == (255, 0, 0, 255)
+    assert layer.getpixel((700, 800)) == (0, 0, 255, 255)
+    assert layer.getpixel((799, 899)) == (0, 0, 255, 255)
+    assert layer.getpixel((800, 900)) == (255, 0, 0, 255)
+    assert all(layer.tile_box(key)[0] < 1000 and layer.tile_box(key)[1] < 1000 for key in layer.tiles)
@@ -0,0 +1,57 @@
+from unittest.mock import Mock
+from paint_app.CanvasManager import CanvasManager
+from paint_app.DrawingTools import DrawingTools
+from paint_app.InputScheduler import InputScheduler
+
+
+class FakeRoot:
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, delay, callback):
+        self.scheduled.append(callback)
+        return len(self.scheduled)
+
+    def after_cancel(self, after_id):
+        self.scheduled[after_id - 1] = None
+
+
+def make_scheduler(fps=60):
+    canvas_manager = CanvasManager(None, 300, 300, "white")
+    canvas_manager.canvas = Mock()
+    canvas_manager._render_tile = Mock()
+    tools = DrawingTools(canvas_manager)
+    tools.set_color("black")
+    tools.on_button_press(10, 10)
+    return canvas_manager, tools, InputScheduler(FakeRoot(), canvas_manager, tools.on_mouse_drag, fps=fps)
+
+
+def test_motion_within_a_frame_is_coalesced_into_one_render():
+    canvas_manager, _, scheduler = make_scheduler(fps=1)
+    scheduler.add_motion(20, 20)
+    canvas_manager._render_tile.reset_mock()
+
+    for x in range(21, 60):
+        scheduler.add_motion(x, 20)
+    assert canvas_manager._render_tile.call_count == 0
+    assert len(scheduler.points) == 39
+
+    scheduler.root.scheduled[-1]()
+    assert scheduler.points == []
+    assert sorted(call.args for call in canvas_manager._render_tile.call_args_list) == [(0, 0)]
+
+
+def test_batched_stroke_matches_per_event_stroke():
+    canvas_manager, _, scheduler = make_scheduler()
+    reference_manager = CanvasManager(None, 300, 300, "white")
+    reference = DrawingTools(reference_manager)
+    reference.set_color("black")
+    reference.on_button_press(10, 10)
+
+    path = [(10 + step * 7, 10 + (step * step) % 90) for step in range(30)]
+    for x, y in path:
+        scheduler.add_motion(x, y)
+        reference.on_mouse_drag(x, y)
+    scheduler.flush()
+
+    assert canvas_manager.layers[0].to_image().tobytes() == reference_manager.layers[0].to_image().tobytes()
@@ -0,0 +1,95 @@
+from PIL import ImageChops
+from paint_app.OperationLog import OperationLog, LogReplayer
+
+
+def make_log():
+    log = OperationLog(120, 80)
+    log.record("color", "red")
+    log.record("size", 4)
+    for kind, x, y in [("press", 10, 10), ("drag", 40, 10), ("drag", 60, 30), ("release", 60, 30)]:
+        log.record(kind, x, y)
+    log.record("tool", "rectangle")
+    log.record("color", "#0000ff")
+    log.record("press", 70, 40)
+    log.record("drag", 90, 60)
+    log.record("release", 100, 70)
+    log.record("layer_add")
+    log.record("layer_switch", 0)
+    log.record("tool", "fill")
+    log.record("color", "green")
+    log.record("press", 85, 55)
+    log.record("release", 85, 55)
+    log.record("text", 5, 50, "Hi", 12)
+    return log
+
+
+def test_replay_draws_recorded_session():
+    manager = LogReplayer(make_log()).run()
+    image = manager.get_composited_image()
+
+    assert image.getpixel((25, 10)) == (255, 0, 0)
+    assert image.getpixel((70, 55)) == (0, 0, 255)
+    assert image.getpixel((85, 55)) == (0, 128, 0)
+    assert image.getpixel((110, 75)) == (255, 255, 255)
+    assert len(manager.layers) == 2
+
+
+def test_replay_is_deterministic_and_survives_save_load(tmp_path):
+    log = make_log()
+    path = tmp_path / "session.jsonl"
+    log.save(path)
+    loaded = OperationLog.load(path)
+
+    assert loaded.events == log.events
+    first = LogReplayer(log).run().get_composited_image()
+    second = LogReplayer(loaded).run().get_composited_image()
+    assert ImageChops.difference(first, second).getbbox() is None
+
+
+def test_replay_undo_and_selection_cut():
+    log = OperationLog(60, 60)
+    log.record("color", "black")
+    log.record("size", 10)
+    for kind in ("press", "drag", "release"):
+        log.record(kind, 5 if kind == "press" else 55, 30)
+    log.record("tool", "selection")
+    log.record("press", 0, 0)
+    log.record("drag", 20, 59)
+    log.record("release", 20, 59)
+    log.record("cut_selection")
+    log.record("undo")
+
+    replayer = LogReplayer(log)
+    image = replayer.run().get_composited_image()
+
+    assert replayer.clipboard.getpixel((10, 30))[:3] == (0, 0, 0)
+    assert image.getpixel((10, 30)) == (0, 0, 0)
+
+
+def test_replay_limit_stops_early():
+    manager = LogReplayer(make_log()).run(limit=2)
+    assert manager.get_composited_image().getextrema() == ((255, 255),) * 3
+
+
+def test_replay_layer_properties_and_undo():
+    log = make_log()
+    log.record("layer_properties", 0, "Фон", False, 1.0, "normal")
+    replayer = LogReplayer(log)
+    manager = replayer.run()
+    assert manager.get_composited_image().getpixel((25, 10)) == (255, 255, 255)
+
+    replayer.apply(["undo"])
+    assert manager.layers[0].visible
+    assert manager.get_composited_image().getpixel((25, 10)) == (255, 0, 0)
+
+
+def test_replay_background_filter_as_one_undo_step():
+    log = make_log()
+    log.record("filter", 0, "grayscale", [0, 0, 40, 40], {})
+    replayer = LogReplayer(log)
+    manager = replayer.run()
+    red, _, _ = manager.get_composited_image().getpixel((25, 10))
+    assert manager.get_composited_image().getpixel((25, 10)) == (red, red, red)
+
+    replayer.apply(["undo"])
+    assert manager.get_composited_image().getpixel((25, 10)) == (255, 0, 0)
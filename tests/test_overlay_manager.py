@@ -0,0 +1,82 @@
+from unittest.mock import MagicMock
+from paint_app.CanvasManager import CanvasManager
+from paint_app.DrawingTools import DrawingTools
+from paint_app.OverlayManager import OverlayManager
+
+
+def test_item_is_created_once_and_updated_in_place():
+    canvas = MagicMock()
+    overlay = OverlayManager(canvas)
+    overlay.show("shape", "rectangle", (0, 0, 10, 10), outline="red", width=2)
+    overlay.show("shape", "rectangle", (0, 0, 20, 20), outline="red", width=2)
+    overlay.show("shape", "rectangle", (0, 0, 30, 30), outline="blue", width=2)
+
+    canvas.create_rectangle.assert_called_once()
+    assert canvas.coords.call_count == 2
+    canvas.itemconfigure.assert_called_once_with(canvas.create_rectangle.return_value, outline="blue")
+
+
+def test_hide_keeps_item_for_reuse_and_kind_change_recreates():
+    canvas = MagicMock()
+    overlay = OverlayManager(canvas)
+    overlay.show("shape", "oval", (0, 0, 10, 10))
+    overlay.hide("shape")
+    overlay.hide("shape")
+    assert not overlay.is_visible("shape")
+    assert canvas.itemconfigure.call_count == 1
+
+    overlay.show("shape", "oval", (1, 1, 5, 5))
+    assert overlay.is_visible("shape")
+    canvas.create_oval.assert_called_once()
+    canvas.delete.assert_not_called()
+
+    overlay.show("shape", "line", (1, 1, 5, 5))
+    canvas.delete.assert_called_once_with(canvas.create_oval.return_value)
+    canvas.create_line.assert_called_once()
+
+
+def test_shape_preview_does_not_touch_the_raster():
+    canvas_manager = CanvasManager(None, 2000, 2000, "white")
+    canvas_manager.canvas = MagicMock()
+    canvas_manager.overlay = OverlayManager(canvas_manager.canvas)
+    canvas_manager.update_canvas = MagicMock()
+    tools = DrawingTools(canvas_manager)
+    tools.set_tool("rectangle")
+
+    tools.on_button_press(100, 100)
+    for x in range(110, 1500, 10):
+        tools.on_mouse_drag(x, x)
+    canvas_manager.update_canvas.assert_not_called()
+    canvas_manager.canvas.create_rectangle.assert_called_once()
+
+    tools.on_button_release(1500, 1500)
+    canvas_manager.update_canvas.assert_called_once()
+    assert not canvas_manager.overlay.is_visible("temp_shape")
+
+
+def test_without_canvas_overlay_does_nothing():
+    overlay = OverlayManager(None)
+    assert overlay.show("shape", "line", (0, 0, 1, 1)) is None
+    overlay.move("shape", 1, 1)
+    overlay.hide("shape")
+    assert not overlay.is_visible("shape")
+
+
+def test_fixed_item_stays_in_the_window_corner():
+    canvas_manager = CanvasManager(None, 4000, 4000, "white")
+    canvas = canvas_manager.canvas = MagicMock()
+    canvas_manager._render_tile = MagicMock()
+    canvas.canvasx.side_effect = lambda x: x + canvas_manager.view_x
+    canvas.canvasy.side_effect = lambda y: y + canvas_manager.view_y
+    canvas_manager.overlay = OverlayManager(canvas)
+    canvas_manager.overlay.show("profiler", "text", (8, 8), fixed=True, text="кадр")
+    canvas_manager.overlay.show("marquee", "rectangle", (100, 100, 200, 200))
+    item = canvas.create_text.return_value
+    assert canvas.create_text.call_args.args == (8, 8)
+
+    canvas_manager.pan(300, 500)
+    assert canvas.coords.call_args_list[-1].args == (item, 308, 508)
+    canvas_manager.set_zoom(2, 0, 0)
+    positions = {call.args[0]: call.args[1:] for call in canvas.coords.call_args_list[-2:]}
+    assert positions[item] == (608, 1008)
+    assert positions[canvas.create_rectangle.return_value] == (200, 200, 400, 400)
@@ -0,0 +1,58 @@
+import json
+from paint_app.CanvasManager import CanvasManager
+from paint_app.DrawingTools import DrawingTools
+from paint_app.Profiler import Profiler
+
+
+def make_profiled():
+    canvas_manager = CanvasManager(None, 200, 200, "white")
+    tools = DrawingTools(canvas_manager)
+    profiler = Profiler()
+    profiler.add_target(canvas_manager, "update_canvas", "canvas.update")
+    profiler.add_target(tools, "on_mouse_drag", lambda t: "tool." + t.current_tool)
+    return canvas_manager, tools, profiler
+
+
+def test_disabled_profiler_leaves_methods_untouched():
+    canvas_manager, tools, profiler = make_profiled()
+
+    assert "update_canvas" not in vars(canvas_manager)
+    tools.on_button_press(10, 10)
+    tools.on_mouse_drag(50, 50)
+    assert profiler.stages == {}
+
+
+def test_enabled_profiler_records_nested_stages_and_restores_on_disable():
+    canvas_manager, tools, profiler = make_profiled()
+    profiler.enable()
+    tools.on_button_press(10, 10)
+    for x in range(20, 60, 10):
+        tools.on_mouse_drag(x, 30)
+    tools.set_tool("eraser")
+    tools.on_mouse_drag(70, 30)
+    profiler.disable()
+
+    assert profiler.stages["tool.brush"].count == 4
+    assert profiler.stages["tool.eraser"].count == 1
+    # Нажатие, четыре движения, конец мазка при смене инструмента и два отпечатка ластика
+    assert profiler.stages["canvas.update"].count == 8
+    assert sum(profiler.stages["tool.brush"].histogram) == 4
+    assert "update_canvas" not in vars(canvas_manager) and "on_mouse_drag" not in vars(tools)
+
+    tools.on_mouse_drag(80, 30)
+    assert profiler.stages["tool.eraser"].count == 1
+
+
+def test_dump_writes_stage_report(tmp_path):
+    canvas_manager, _, profiler = make_profiled()
+    profiler.enable()
+    canvas_manager.update_canvas((0, 0, 10, 10))
+    profiler.disable()
+
+    path = tmp_path / "profile.json"
+    profiler.dump(path)
+    report = json.loads(path.read_text(encoding="utf-8"))
+    stage = report["stages"]["canvas.update"]
+    assert stage["count"] == 1
+    assert stage["p95_ms"] <= stage["max_ms"]
+    assert sum(stage["histogram_ms"].values()) == 1
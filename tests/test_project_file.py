@@ -0,0 +1,165 @@
+import os
+import pytest
+from PIL import Image
+from paint_app.CanvasManager import CanvasManager
+from paint_app.HistoryManager import HistoryManager
+from paint_app.ProjectFile import ProjectFile
+
+
+def make_document():
+    manager = CanvasManager(None, 600, 400, "white")
+    manager.layers[0].paste(Image.new("RGBA", (50, 50), "red"), (10, 10))
+    manager.add_layer()
+    manager.layers[1].paste(Image.new("RGBA", (20, 20), (0, 0, 255, 128)), (300, 300))
+    manager.set_layer_properties(1, name="Тени", opacity=0.5, blend_mode="multiply")
+    manager.add_layer()
+    manager.layers[2].paste(Image.new("RGBA", (400, 300), "green"), (0, 0))
+    manager.set_layer_properties(2, visible=False)
+    manager.switch_layer(1)
+    return manager
+
+
+def test_round_trip_keeps_layers_and_loads_them_lazily(tmp_path):
+    path = str(tmp_path / "doc.paint")
+    manager = make_document()
+    assert ProjectFile(path).save(manager) == "full"
+
+    opened = CanvasManager(None, 10, 10, "white")
+    ProjectFile.open(path, opened)
+    assert (opened.width, opened.height, opened.active_layer_index) == (600, 400, 1)
+    assert [layer.properties() for layer in opened.layers] == [layer.properties() for layer in manager.layers]
+    assert not any(layer.loaded for layer in opened.layers[1:])
+
+    assert opened.get_composited_image().tobytes() == manager.get_composited_image().tobytes()
+    # Скрытый слой для показа не нужен и остаётся непрочитанным
+    assert opened.layers[1].loaded and not opened.layers[2].loaded
+    assert opened.layers[2].getpixel((5, 5)) == (0, 128, 0, 255)
+
+
+def test_snapshot_of_opened_project_reads_nothing_on_the_caller_thread(tmp_path):
+    path = str(tmp_path / "doc.paint")
+    manager = make_document()
+    ProjectFile(path).save(manager)
+    opened = CanvasManager(None, 10, 10, "white")
+    ProjectFile.open(path, opened)
+
+    snapshot = opened.snapshot()
+    assert not any(layer.loaded for layer in opened.layers[1:])
+    # Скрытый слой попадает в снимок пустым и не читается вовсе
+    assert snapshot.layers[2].loaded and not snapshot.layers[2].tiles
+    assert snapshot.get_composited_image().tobytes() == manager.get_composited_image().tobytes()
+    assert not any(layer.loaded for layer in opened.layers[1:])
+
+
+def test_incremental_save_appends_only_changed_tiles(tmp_path):
+    path = str(tmp_path / "doc.paint")
+    manager = make_document()
+    project = ProjectFile(path)
+    project.save(manager)
+    size = os.path.getsize(path)
+
+    assert project.save(manager) == "incremental"
+    unchanged_growth = os.path.getsize(path) - size
+
+    manager.layers[0].paste(Image.new("RGBA", (5, 5), "black"), (520, 10))
+    size = os.path.getsize(path)
+    project.save(manager)
+    growth = os.path.getsize(path) - size
+    # Один новый тайл (сжатый) и оглавление
+    assert unchanged_growth < growth < unchanged_growth + 4096
+
+    opened = CanvasManager(None, 10, 10, "white")
+    ProjectFile.open(path, opened)
+    assert opened.layers[0].getpixel((522, 12)) == (0, 0, 0, 255)
+    assert opened.get_composited_image().tobytes() == manager.get_composited_image().tobytes()
+
+
+def test_unread_layers_survive_save_to_another_file_and_compaction(tmp_path):
+    source = str(tmp_path / "a.paint")
+    ProjectFile(source).save(make_document())
+    opened = CanvasManager(None, 10, 10, "white")
+    project = ProjectFile.open(source, opened)
+
+    copy_path = str(tmp_path / "b.paint")
+    ProjectFile(copy_path).save(opened)
+    assert not opened.layers[2].loaded
+
+    # Перезапись одних и тех же тайлов копит мёртвые куски, пока файл не будет переписан
+    results = []
+    for index in range(6):
+        opened.layers[0].paste(Image.new("RGBA", (600, 400), (index * 40, 0, 0, 255)))
+        results.append(project.save(opened))
+    assert "full" in results
+    assert not opened.layers[2].loaded
+    assert opened.layers[2].getpixel((5, 5)) == (0, 128, 0, 255)
+
+    reopened = CanvasManager(None, 10, 10, "white")
+    ProjectFile.open(copy_path, reopened)
+    assert reopened.layers[2].getpixel((5, 5)) == (0, 128, 0, 255)
+
+
+def test_unread_layers_outside_the_document_survive_full_rewrite(tmp_path):
+    path = str(tmp_path / "doc.paint")
+    manager = make_document()
+    ProjectFile(path).save(manager)
+    opened = CanvasManager(None, 10, 10, "white")
+    project = ProjectFile.open(path, opened)
+    history = HistoryManager(opened, background=False)
+
+    # Снимок для сохранения и удалённый слой в истории держат читателей старого файла
+    snapshot = opened.snapshot()
+    history.save_state()
+    opened.delete_layer(1)
+    history.commit()
+    results = []
+    for index in range(6):
+        opened.layers[0].paste(Image.new("RGBA", (600, 400), (index * 40, 0, 0, 255)))
+        results.append(project.save(opened))
+    assert "full" in results
+
+    expected = manager.get_composited_image().tobytes()
+    assert snapshot.get_composited_image().tobytes() == expected
+    # Первый шаг отмены — перекраска нижнего слоя, второй возвращает удалённый слой
+    history.undo()
+    history.undo()
+    assert len(opened.layers) == 3 and not opened.layers[1].loaded
+    assert opened.layers[1].getpixel((305, 305)) == (0, 0, 255, 128)
+    assert opened.layers[2].getpixel((5, 5)) == (0, 128, 0, 255)
+
+    # Вернувшийся слой снова сохраняется в файл проекта
+    project.save(opened)
+    reopened = CanvasManager(None, 10, 10, "white")
+    ProjectFile.open(path, reopened)
+    assert reopened.layers[1].getpixel((305, 305)) == (0, 0, 255, 128)
+
+
+def test_not_a_project_file(tmp_path):
+    path = tmp_path / "image.png"
+    Image.new("RGB", (4, 4)).save(path)
+    with pytest.raises(ValueError):
+        ProjectFile.open(str(path), CanvasManager(None, 10, 10, "white"))
+
+
+def test_replayed_open_project_resets_history(tmp_path):
+    from paint_app.OperationLog import OperationLog, LogReplayer
+
+    path = str(tmp_path / "doc.paint")
+    ProjectFile(path).save(make_document())
+    log = OperationLog(100, 100)
+    log.record("layer_add")
+    log.record("open_project", path)
+    log.record("undo")
+    manager = LogReplayer(log).run()
+    assert (manager.width, len(manager.layers)) == (600, 3)
+
+
+def test_grid_origin_survives_round_trip(tmp_path):
+    path = str(tmp_path / "doc.paint")
+    manager = make_document()
+    manager.resize_canvas(500, 350, -100, -50)
+    ProjectFile(path).save(manager)
+
+    opened = CanvasManager(None, 10, 10, "white")
+    ProjectFile.open(path, opened)
+    assert opened.origin == (-100, -50)
+    assert opened.get_composited_image().tobytes() == manager.get_composited_image().tobytes()
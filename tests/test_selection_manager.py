@@ -0,0 +1,96 @@
+from unittest.mock import MagicMock, patch
+from PIL import Image
+from paint_app.CanvasManager import CanvasManager
+from paint_app.DrawingTools import DrawingTools
+from paint_app.OverlayManager import OverlayManager
+from paint_app.SelectionManager import SelectionManager
+
+
+def make_selection():
+    canvas_manager = CanvasManager(None, 100, 100, "white")
+    canvas_manager.layers[0].paste(Image.new("RGBA", (20, 20), (255, 0, 0, 255)), (10, 10))
+    selection = SelectionManager(canvas_manager, DrawingTools(canvas_manager))
+    selection.start_selection(10, 10)
+    selection.update_selection(30, 30)
+    selection.end_selection(30, 30)
+    return canvas_manager, selection
+
+
+def test_drag_moves_floating_pixels_and_commits_once():
+    canvas_manager, selection = make_selection()
+    canvas_manager.canvas = MagicMock()
+    canvas_manager.overlay = OverlayManager(canvas_manager.canvas)
+    layer = canvas_manager.layers[0]
+
+    with patch("paint_app.OverlayManager.ImageTk.PhotoImage"):
+        assert selection.start_dragging(15, 15)
+    assert canvas_manager.overlay.is_visible("floating_selection")
+    # Поднятые пиксели ушли из слоя, на их месте цвет фона
+    assert layer.getpixel((15, 15)) == (255, 255, 255, 255)
+
+    canvas_manager.update_canvas = MagicMock()
+    for x in range(16, 56):
+        selection.update_selection(x, x)
+    assert canvas_manager.update_canvas.call_count == 0
+    assert canvas_manager.canvas.move.call_count == 80
+    assert layer.getpixel((60, 60)) == (255, 255, 255, 255)
+
+    selection.end_selection(55, 55)
+    canvas_manager.update_canvas.assert_called_once_with((50, 50, 70, 70))
+    assert layer.getpixel((60, 60)) == (255, 0, 0, 255)
+    assert layer.getpixel((15, 15)) == (255, 255, 255, 255)
+    assert selection.floating is None
+    assert not canvas_manager.overlay.is_visible("floating_selection")
+
+
+def test_zoom_rescales_floating_pixels_with_the_outline():
+    canvas_manager, selection = make_selection()
+    canvas = canvas_manager.canvas = MagicMock()
+    canvas_manager._render_tile = MagicMock()
+    canvas_manager.overlay = OverlayManager(canvas)
+
+    with patch("paint_app.OverlayManager.ImageTk.PhotoImage") as photo:
+        selection.start_dragging(15, 15)
+        assert photo.call_args.args[0].size == (20, 20)
+        canvas_manager.set_zoom(2, 0, 0)
+    assert photo.call_args.args[0].size == (40, 40)
+    item = canvas.create_image.return_value
+    canvas.itemconfigure.assert_any_call(item, image=photo.return_value)
+    positions = {call.args[0]: call.args[1:] for call in canvas.coords.call_args_list[-2:]}
+    assert positions[item] == (20, 20)
+    assert positions[canvas.create_rectangle.return_value] == (20, 20, 60, 60)
+
+
+def test_lift_on_upper_layer_leaves_transparency():
+    canvas_manager, selection = make_selection()
+    canvas_manager.add_layer()
+    canvas_manager.layers[1].paste(Image.new("RGBA", (20, 20), (0, 0, 255, 128)), (10, 10))
+
+    selection.start_dragging(20, 20)
+    assert canvas_manager.layers[1].getpixel((20, 20)) == (0, 0, 0, 0)
+    selection.update_selection(25, 20)
+    selection.end_selection(25, 20)
+
+    assert canvas_manager.layers[1].getpixel((34, 20)) == (0, 0, 255, 128)
+    assert canvas_manager.layers[0].getpixel((20, 20)) == (255, 0, 0, 255)
+
+
+def test_fill_and_cut_use_the_mask():
+    canvas_manager, selection = make_selection()
+    selection.fill_selection("green")
+    assert canvas_manager.layers[0].getpixel((29, 29)) == (0, 128, 0, 255)
+    assert canvas_manager.layers[0].getpixel((30, 30)) == (255, 255, 255, 255)
+    assert selection.rect is None
+
+    selection.start_selection(10, 10)
+    selection.end_selection(20, 20)
+    clipboard = selection.cut_selection()
+    assert clipboard.size == (10, 10) and clipboard.getpixel((5, 5)) == (0, 128, 0, 255)
+    assert canvas_manager.layers[0].getpixel((15, 15)) == (255, 255, 255, 255)
+
+
+def test_click_without_drag_creates_no_selection():
+    _, selection = make_selection()
+    selection.start_selection(50, 50)
+    selection.end_selection(50, 50)
+    assert selection.rect is None
@@ -0,0 +1,75 @@
+from PIL import Image
+from paint_app.TiledLayer import TiledLayer
+
+
+def test_empty_layer_allocates_no_tiles():
+    layer = TiledLayer(10000, 10000)
+    assert layer.nbytes == 0
+    assert layer.crop((5000, 5000, 5010, 5010)).getextrema() == ((0, 0),) * 4
+
+
+def test_paste_allocates_only_touched_tiles():
+    layer = TiledLayer(10000, 10000)
+    layer.paste(Image.new("RGBA", (20, 20), "red"), (250, 250))
+    assert sorted(layer.tiles) == [(0, 0), (0, 1), (1, 0), (1, 1)]
+    assert layer.getpixel((260, 260)) == (255, 0, 0, 255)
+    assert layer.crop((240, 240, 280, 280)).getpixel((15, 15)) == (255, 0, 0, 255)
+
+
+def test_paste_of_fill_colour_keeps_layer_sparse():
+    layer = TiledLayer(1000, 1000, "white")
+    layer.paste(Image.new("RGBA", (600, 600), "white"), (0, 0))
+    assert layer.tiles == {}
+
+
+def test_draw_shifts_into_tile_coordinates():
+    layer = TiledLayer(600, 600)
+    bbox = layer.draw((290, 10, 311, 31), lambda draw, dx, dy: draw.rectangle(
+        [300 + dx, 20 + dy, 301 + dx, 21 + dy], fill="blue"))
+    assert bbox == (290, 10, 311, 31)
+    assert list(layer.tiles) == [(1, 0)]
+    assert layer.getpixel((300, 20)) == (0, 0, 255, 255)
+
+
+def test_copy_shares_tiles_until_written():
+    layer = TiledLayer(512, 512)
+    layer.paste(Image.new("RGBA", (4, 4), "red"), (0, 0))
+    snapshot = layer.copy()
+    assert snapshot.tiles[(0, 0)] is layer.tiles[(0, 0)]
+
+    layer.paste(Image.new("RGBA", (4, 4), "blue"), (0, 0))
+    assert snapshot.getpixel((0, 0)) == (255, 0, 0, 255)
+    assert layer.getpixel((0, 0)) == (0, 0, 255, 255)
+
+
+def test_shrinking_drops_tiles_and_clears_edge():
+    layer = TiledLayer(600, 600)
+    layer.paste(Image.new("RGBA", (600, 600), "red"), (0, 0))
+    layer.resize(300, 300)
+    assert sorted(layer.tiles) == [(0, 0), (0, 1), (1, 0), (1, 1)]
+
+    layer.resize(600, 600)
+    assert layer.getpixel((299, 299)) == (255, 0, 0, 255)
+    assert layer.getpixel((300, 100)) == (0, 0, 0, 0)
+    assert layer.getpixel((500, 500)) == (0, 0, 0, 0)
+
+
+def test_growing_and_cropping_at_top_left_moves_grid_without_copying():
+    layer = TiledLayer(600, 600)
+    layer.paste(Image.new("RGBA", (600, 600), "red"), (0, 0))
+    tiles = dict(layer.tiles)
+
+    layer.resize(700, 650, 100, 50)
+    assert layer.origin == (100, 50)
+    assert all(layer.tiles[key] is tile for key, tile in tiles.items())
+    assert layer.getpixel((99, 300)) == (0, 0, 0, 0)
+    assert layer.getpixel((100, 50)) == (255, 0, 0, 255)
+
+    # Обрезка за первый ряд тайлов освобождает их сразу
+    layer.resize(300, 300, -400, -400)
+    assert layer.origin == (-300, -350)
+    assert sorted(layer.tiles) == [(1, 1), (1, 2), (2, 1), (2, 2)]
+    assert layer.getpixel((0, 0)) == (255, 0, 0, 255)
+    assert layer.getpixel((199, 199)) == (255, 0, 0, 255)
+    assert layer.getpixel((250, 250)) == (0, 0, 0, 0)
+    assert layer.crop((190, 190, 210, 210)).getpixel((9, 9)) == (255, 0, 0, 255)